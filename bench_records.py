@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Geheugenbenchmark: snapshot als losse dicts vs. slotted records.
+
+Bouwt een synthetische Magister snapshot (zelfde vorm als de JSON van
+magister.py), laadt hem in een vers proces en meet de RSS-groei.
+
+    python3 bench_records.py [--kinderen 4] [--schaal 10]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+
+sys.path.append('custom_components/magister_school')
+
+VAKKEN = ["ne", "en", "wi", "bi", "gs", "ak", "na", "sk", "lo", "du", "fa"]
+LOKALEN = [f"L{n:03d}" for n in range(1, 40)]
+TYPES = ["", "hw", "T!", "TT", "SO"]
+
+
+def _ts(i):
+    return f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {8 + i % 8:02d}:{(i * 7) % 60:02d}:00"
+
+
+def make_snapshot(kinderen, schaal):
+    rnd = random.Random(42)
+    data = {"last_update": "2025-01-01T00:00:00", "kinderen": {}, "cijfers": {},
+            "absenties": {}, "opdrachten": {}, "studiewijzers": {}, "activiteiten": {}}
+    for k in range(kinderen):
+        naam = f"Kind {k}"
+        data["kinderen"][naam] = {
+            "naam": naam, "stamnummer": str(1000 + k), "geboortedatum": "2010-01-01",
+            "aanmeldingen": [{"start": _ts(i), "einde": _ts(i + 1), "lesperiode": "2425",
+                              "studie": "havo 3"} for i in range(3)],
+            "afspraken": [{"start": _ts(i), "einde": _ts(i + 1), "type": rnd.choice(TYPES),
+                           "lokaal": rnd.choice(LOKALEN), "omschrijving": f"{rnd.choice(VAKKEN)} - abc - 3h",
+                           "inhoud": "lees hoofdstuk 4" if i % 3 else None, "vak": rnd.choice(VAKKEN),
+                           "is_huiswerk": i % 3 == 0, "is_uitval": i % 17 == 0,
+                           "id": 10_000 * k + i, "is_afgerond": i % 6 == 0}
+                          for i in range(80 * schaal)],
+            "wijzigingen": [{"start": _ts(i), "einde": _ts(i + 1), "type": rnd.choice(TYPES),
+                             "lokaal": rnd.choice(LOKALEN), "omschrijving": "uitval", "inhoud": None,
+                             "id": 20_000 * k + i}
+                            for i in range(5 * schaal)],
+        }
+        data["cijfers"][naam] = [{"vak": rnd.choice(VAKKEN), "omschrijving": f"toets {i}",
+                                  "waarde": f"{rnd.randint(3, 9)},{rnd.randint(0, 9)}",
+                                  "weegfactor": rnd.choice([1, 2, 3]), "ingevoerd_op": _ts(i),
+                                  "id": 30_000 * k + i}
+                                 for i in range(50)]
+        data["absenties"][naam] = [{"start": _ts(i), "einde": _ts(i + 1), "omschrijving": "Te laat",
+                                    "afspraak": f"{rnd.choice(VAKKEN)} - abc", "id": 40_000 * k + i}
+                                   for i in range(120 * schaal)]
+        data["opdrachten"][naam] = [{"titel": f"opdracht {i}", "vak": rnd.choice(VAKKEN),
+                                     "inleveren_voor": _ts(i), "ingeleverd_op": "?",
+                                     "omschrijving": "maak de opgaven", "id": 50_000 * k + i,
+                                     "bijlagen": [{"naam": "opdracht.pdf", "content_type": "application/pdf",
+                                                   "grootte": 12345, "href": f"/api/bijlage/{i}", "id": i}]}
+                                    for i in range(10 * schaal)]
+        data["activiteiten"][naam] = [{"titel": f"activiteit {i}", "zichtbaar_vanaf": _ts(i),
+                                       "zichtbaar_tot": _ts(i + 1)} for i in range(5)]
+        data["studiewijzers"][naam] = [{"titel": f"sw {i}", "van": _ts(i), "tot_en_met": _ts(i + 1),
+                                        "onderdelen": [{"titel": f"week {j}", "omschrijving": "lezen",
+                                                        "bijlagen": []}
+                                                       for j in range(10)]}
+                                       for i in range(2 * schaal)]
+    return data
+
+
+def _rss_kb():
+    with open("/proc/self/statm") as fh:
+        pages = int(fh.read().split()[1])
+    import resource
+    return pages * resource.getpagesize() // 1024
+
+
+def run_child(mode, path):
+    import gc
+    # Ook bij "dicts" importeren: import-kosten buiten de meting houden
+    from records import loads_snapshot
+    with open(path) as fh:
+        raw = fh.read()
+    gc.collect()
+    before = _rss_kb()
+    snapshot = loads_snapshot(raw) if mode == "records" else json.loads(raw)
+    del raw
+    gc.collect()
+    after = _rss_kb()
+    # De snapshot leeft tot na de meting
+    print(json.dumps({"mode": mode, "rss_kb": after - before, "secties": len(snapshot)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Magister records geheugenbenchmark")
+    parser.add_argument("--kinderen", type=int, default=4)
+    parser.add_argument("--schaal", type=int, default=10)
+    parser.add_argument("--child", choices=["dicts", "records"], help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file)
+        return
+
+    import tempfile
+    data = make_snapshot(args.kinderen, args.schaal)
+    aantal = sum(len(v) for s in ("cijfers", "absenties", "opdrachten", "activiteiten", "studiewijzers")
+                 for v in data[s].values())
+    aantal += sum(len(k["afspraken"]) + len(k["wijzigingen"]) + len(k["aanmeldingen"])
+                  for k in data["kinderen"].values())
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fh:
+        json.dump(data, fh)
+        path = fh.name
+
+    results = {}
+    for mode in ("dicts", "records"):
+        out = subprocess.run([sys.executable, __file__, "--child", mode, "--file", path],
+                             capture_output=True, text=True, check=True)
+        results[mode] = json.loads(out.stdout)["rss_kb"]
+    os.unlink(path)
+
+    print(f"records in snapshot: {aantal}")
+    print(f"dicts:   {results['dicts']:>8} kB RSS")
+    print(f"records: {results['records']:>8} kB RSS")
+    if results["dicts"]:
+        print(f"besparing: {100 * (1 - results['records'] / results['dicts']):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
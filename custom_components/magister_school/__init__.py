@@ -1,16 +1,82 @@
 import logging
+import os
+import shutil
+from functools import partial
+
+import voluptuous as vol
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import entity_registry as er
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError, ServiceValidationError
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN
-from .coordinator import MagisterDataUpdateCoordinator
+from .attributes import DEFAULT_ATTRIBUTE_BUDGET
+from .attachments import AttachmentCache
+from .const import (
+    DOMAIN, HANDOFF, WORKER, SERVICE_DOWNLOAD_BIJLAGE, SERVICE_LEES_BERICHT,
+    SERVICE_MARKEER_HUISWERK, SERVICE_ZOEK_HISTORIE, SERVICE_ZOEK, CONF_ATTRIBUTE_BUDGET, CONF_MIN_INTERVAL, CONF_MAX_INTERVAL, CONF_SCHEDULE_WEEKS,
+    CONF_KINDEREN, CONF_SHARD_SIZE, CONF_HISTORY_DAYS, CONF_ALLE_KINDEREN,
+)
+from .coordinator import (
+    MagisterDataUpdateCoordinator, archive_store, attachments_path, history_path, inbox_store, session_path,
+)
+from .history import DEFAULT_HISTORY_DAYS, DEFAULT_QUERY_LIMIT, TABLES, History
+from .media_source import MagisterBijlageView, bijlage_url
+from .schedule import DEFAULT_SCHEDULE_WEEKS
+from .search import DEFAULT_LIMIT, ONDERDELEN
+from .polling import DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL
+from .websocket import async_setup_websocket
+from .shards import AUTO_KINDEREN, DEFAULT_SHARD_SIZE
 
 _LOGGER = logging.getLogger(__name__)
 
+PLATFORMS = ["sensor", "calendar"]
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
 # Suffixes die we willen opruimen
 SUFFIXES_TO_CLEAN = ["_1", "_2", "_3", "_4", "_5"]
 
+DOWNLOAD_BIJLAGE_SCHEMA = vol.Schema({
+    vol.Required("bijlage_id"): cv.string,
+    vol.Optional("map"): cv.string,
+})
+
+LEES_BERICHT_SCHEMA = vol.Schema({
+    vol.Required("bericht_id"): cv.positive_int,
+})
+
+MARKEER_HUISWERK_SCHEMA = vol.Schema({
+    vol.Required("afspraak_id"): cv.positive_int,
+    vol.Optional("afgerond", default=True): cv.boolean,
+})
+
+ZOEK_HISTORIE_SCHEMA = vol.Schema({
+    vol.Required("onderdeel"): vol.In(list(TABLES)),
+    vol.Optional("kind"): cv.string,
+    vol.Optional("vak"): cv.string,
+    vol.Optional("van"): cv.date,
+    vol.Optional("tot"): cv.date,
+    vol.Optional("limit", default=DEFAULT_QUERY_LIMIT): vol.All(int, vol.Range(min=1, max=10000)),
+})
+
+ZOEK_SCHEMA = vol.Schema({
+    vol.Required("tekst"): cv.string,
+    vol.Optional("kind"): cv.string,
+    vol.Optional("vak"): cv.string,
+    vol.Optional("onderdeel"): vol.In(ONDERDELEN),
+    vol.Optional("limit", default=DEFAULT_LIMIT): vol.All(int, vol.Range(min=1, max=100)),
+})
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Bijlage-view, websocket en services: eenmalig, los van de config entries."""
+    hass.data.setdefault(DOMAIN, {})
+    hass.http.register_view(MagisterBijlageView(hass))
+    async_setup_websocket(hass)
+    _async_setup_services(hass)
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Magister from a config entry."""
     hass.data.setdefault(DOMAIN, {})
@@ -22,8 +88,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         entry.data["user"],
         entry.data["pass"],
         totp_secret=entry.data.get("totp_secret"),
+        entry_id=entry.entry_id,
+        attribute_budget=entry.options.get(CONF_ATTRIBUTE_BUDGET, DEFAULT_ATTRIBUTE_BUDGET),
+        min_interval=entry.options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+        max_interval=entry.options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+        schedule_weeks=entry.options.get(CONF_SCHEDULE_WEEKS, DEFAULT_SCHEDULE_WEEKS),
+        kinderen=entry.options.get(CONF_KINDEREN) or None,
+        shard_size=entry.options.get(CONF_SHARD_SIZE, DEFAULT_SHARD_SIZE),
+        history_days=entry.options.get(CONF_HISTORY_DAYS, DEFAULT_HISTORY_DAYS),
+        max_kinderen=None if entry.options.get(CONF_ALLE_KINDEREN) else AUTO_KINDEREN,
     )
     
+    # Login uit de config/reauth flow overnemen: eerste refresh zonder nieuwe login
+    if auth := hass.data[DOMAIN].get(HANDOFF, {}).pop(entry.unique_id, None):
+        coordinator.api.prime(auth)
+
     # Store coordinator
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
@@ -33,11 +112,135 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Cleanup entities with suffixes (e.g. after HACS update)
     await _cleanup_suffix_entities(hass)
 
-    # Forward setup to sensor platform
-    await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+    # Forward setup to sensor and calendar platforms
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    # Gewijzigde opties pas na een herlaad actief
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
     
     return True
 
+def _coordinators(hass: HomeAssistant):
+    return [c for c in hass.data[DOMAIN].values() if isinstance(c, MagisterDataUpdateCoordinator)]
+
+def _async_setup_services(hass: HomeAssistant):
+    """
+    Services voor alle entries. Welke entry een aanroep betreft volgt uit de
+    aanroep zelf (bijlage, bericht, afspraak, kind); zonder geladen entry
+    geven ze een foutmelding.
+    """
+    async def _async_download_bijlage(call: ServiceCall) -> ServiceResponse:
+        key = call.data["bijlage_id"]
+        for entry_id, coordinator in hass.data[DOMAIN].items():
+            if not isinstance(coordinator, MagisterDataUpdateCoordinator) or coordinator.view.bijlage(key) is None:
+                continue
+            try:
+                path, meta = await coordinator.async_get_bijlage(key)
+            except Exception as err:
+                raise HomeAssistantError(f"Bijlage {key} downloaden mislukt: {err}") from err
+
+            if doel := call.data.get("map"):
+                if not hass.config.is_allowed_path(doel):
+                    raise ServiceValidationError(f"Map {doel} staat niet in allowlist_external_dirs")
+                path = await hass.async_add_executor_job(_copy_bijlage, path, doel, meta["naam"] or key)
+            return {
+                "pad": path,
+                "naam": meta["naam"],
+                "content_type": meta["content_type"],
+                "grootte": meta["size"],
+                "url": bijlage_url(entry_id, key),
+            }
+        raise ServiceValidationError(f"Onbekende bijlage: {key}")
+
+    async def _async_lees_bericht(call: ServiceCall) -> ServiceResponse:
+        bericht_id = call.data["bericht_id"]
+        for coordinator in _coordinators(hass):
+            try:
+                bericht = await coordinator.async_get_bericht(bericht_id)
+            except Exception as err:
+                raise HomeAssistantError(f"Bericht {bericht_id} ophalen mislukt: {err}") from err
+            if bericht is not None:
+                return bericht.as_dict()
+        raise ServiceValidationError(f"Onbekend bericht: {bericht_id}")
+
+    async def _async_markeer_huiswerk(call: ServiceCall) -> ServiceResponse:
+        afspraak_id = call.data["afspraak_id"]
+        for coordinator in _coordinators(hass):
+            try:
+                afspraak = await coordinator.async_set_huiswerk_afgerond(afspraak_id, call.data["afgerond"])
+            except Exception as err:
+                raise HomeAssistantError(f"Huiswerk van afspraak {afspraak_id} bijwerken mislukt: {err}") from err
+            if afspraak is not None:
+                return afspraak.as_dict()
+        raise ServiceValidationError(f"Onbekende afspraak: {afspraak_id}")
+
+    async def _async_zoek_historie(call: ServiceCall) -> ServiceResponse:
+        items = []
+        for coordinator in _coordinators(hass):
+            if coordinator.history is None:
+                continue
+            try:
+                items += await hass.async_add_executor_job(partial(
+                    coordinator.history.query,
+                    call.data["onderdeel"],
+                    kind=call.data.get("kind"),
+                    van=call.data.get("van"),
+                    tot=call.data.get("tot"),
+                    vak=call.data.get("vak"),
+                    limit=call.data["limit"],
+                ))
+            except ValueError as err:
+                raise ServiceValidationError(str(err)) from err
+        # Meerdere accounts: samen op datum, nieuwste eerst
+        datum_veld = TABLES[call.data["onderdeel"]][0]
+        items.sort(key=lambda item: item.get(datum_veld) or "", reverse=True)
+        return {"items": items[:call.data["limit"]]}
+
+    async def _async_zoek(call: ServiceCall) -> ServiceResponse:
+        resultaten = []
+        for coordinator in _coordinators(hass):
+            resultaten += coordinator.search_index.search(
+                call.data["tekst"],
+                kind=call.data.get("kind"),
+                vak=call.data.get("vak"),
+                onderdeel=call.data.get("onderdeel"),
+                limit=call.data["limit"],
+            )
+        # Meerdere accounts: samen op score
+        resultaten.sort(key=lambda resultaat: resultaat["score"], reverse=True)
+        return {"resultaten": resultaten[:call.data["limit"]]}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_DOWNLOAD_BIJLAGE, _async_download_bijlage,
+        schema=DOWNLOAD_BIJLAGE_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_LEES_BERICHT, _async_lees_bericht,
+        schema=LEES_BERICHT_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_MARKEER_HUISWERK, _async_markeer_huiswerk,
+        schema=MARKEER_HUISWERK_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_ZOEK_HISTORIE, _async_zoek_historie,
+        schema=ZOEK_HISTORIE_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_ZOEK, _async_zoek,
+        schema=ZOEK_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+def _copy_bijlage(path, doel, naam):
+    """Kopieer een bijlage uit de cache naar `doel` onder zijn eigen naam."""
+    os.makedirs(doel, exist_ok=True)
+    target = os.path.join(doel, os.path.basename(naam))
+    shutil.copyfile(path, target)
+    return target
+
+async def _async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def _cleanup_suffix_entities(hass: HomeAssistant):
     """Hernoem entities met _1, _2, etc. suffixes als het doel-ID vrij is."""
     registry = er.async_get(hass)
@@ -88,8 +291,44 @@ async def _cleanup_suffix_entities(hass: HomeAssistant):
             blocking=False
         )
 
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migreer een config entry naar de huidige versie."""
+    if entry.version > 1:
+        # Nieuwere versie (downgrade): niet te migreren
+        return False
+    if entry.minor_version < 2:
+        # Bestaande installaties hielden alle kinderen bij; de AUTO_KINDEREN
+        # grens geldt alleen voor nieuwe entries
+        hass.config_entries.async_update_entry(
+            entry, options={**entry.options, CONF_ALLE_KINDEREN: True}, minor_version=2,
+        )
+    return True
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    if unload_ok := await hass.config_entries.async_unload_platforms(entry, ["sensor"]):
-        hass.data[DOMAIN].pop(entry.entry_id)
+    if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_shutdown()
+        await hass.async_add_executor_job(coordinator.api.forget)
+
+        # Laatste entry weg: de gedeelde worker mag stoppen
+        if not any(isinstance(v, MagisterDataUpdateCoordinator) for v in hass.data[DOMAIN].values()):
+            if worker := hass.data[DOMAIN].pop(WORKER, None):
+                await hass.async_add_executor_job(worker.stop)
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Ruim sessie-cookies, cijferarchief, berichten, bijlagen en historie op als de integratie verwijderd wordt."""
+    path = session_path(hass, entry.entry_id)
+
+    def _remove():
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    await hass.async_add_executor_job(_remove)
+    await archive_store(hass, entry.entry_id).async_remove()
+    await inbox_store(hass, entry.entry_id).async_remove()
+    await hass.async_add_executor_job(AttachmentCache(attachments_path(hass, entry.entry_id)).clear)
+    await hass.async_add_executor_job(History(history_path(hass, entry.entry_id)).remove)
@@ -1,70 +1,349 @@
-import subprocess
+import itertools
 import json
 import logging
+import os
+import select
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from .const import CONF_SCHOOL, CONF_USER, CONF_PASS
+from .attachments import write_stream
+from .records import record_hook, snapshot_from_json
+from .schedule import DEFAULT_SCHEDULE_WEEKS
 
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_AUTHCODE = "00000000000000000000000000000000"
 
+# Account, kinderen en aanmeldingen veranderen zelden; lang bewaren
+METADATA_TTL = timedelta(hours=24)
+
+# Maximale duur van een verzoek aan de worker voordat hij als 'hangend' geldt
+REQUEST_TIMEOUT = 30
+
+# Tijdsbudget (s) voor de Magister-verzoeken van één poll. Wat niet past
+# wordt niet weggegooid maar schuift door naar de volgende poll.
+FETCH_BUDGET = 20
+
+# Socket-timeout bij het downloaden van een bijlage (buiten de worker)
+DOWNLOAD_TIMEOUT = 60
+
 class AuthenticationRequired(Exception):
     """Raised when Magister requires re-authentication (e.g. password change)."""
     pass
 
+class WorkerError(Exception):
+    """Raised when the worker process crashed, hung or returned an error."""
+    pass
+
+class DownloadError(Exception):
+    """Raised when an attachment could not be downloaded from its storage location."""
+    pass
+
+class MagisterWorker:
+    """
+    Supervisor voor het langlevende worker.py proces.
+
+    Eén worker per Home Assistant instantie, gedeeld door alle config entries.
+    Verzoeken gaan als JSON-regels over stdin/stdout; er loopt er steeds één
+    tegelijk. Crasht of hangt de worker, dan wordt hij bij het volgende
+    verzoek opnieuw gestart.
+    """
+
+    def __init__(self):
+        self._proc = None
+        self._buf = b""
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.restarts = 0
+
+    def _start(self):
+        script_path = str(Path(__file__).resolve().parent / "worker.py")
+        self._proc = subprocess.Popen(
+            # -P: de map van het script niet op sys.path (zie worker.py)
+            [sys.executable, "-P", script_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        self._buf = b""
+        threading.Thread(
+            target=self._log_stderr, args=(self._proc,), name="magister-worker-stderr", daemon=True
+        ).start()
+        _LOGGER.debug("Magister worker gestart (pid %s)", self._proc.pid)
+
+    @staticmethod
+    def _log_stderr(proc):
+        for line in proc.stderr:
+            _LOGGER.debug("worker: %s", line.decode("utf-8", "replace").rstrip())
+
+    def _kill(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=5)
+        except Exception:
+            pass
+        self._proc = None
+
+    def _readline(self, timeout):
+        fd = self._proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while b"\n" not in self._buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return b""
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return line
+
+    def request(self, payload, timeout=REQUEST_TIMEOUT):
+        """Stuur één verzoek en wacht op het antwoord (blokkerend)."""
+        with self._lock:
+            if self._proc is None or self._proc.poll() is not None:
+                if self._proc is not None:
+                    self.restarts += 1
+                    _LOGGER.warning("Magister worker was gestopt (exit %s), herstart", self._proc.returncode)
+                self._start()
+
+            rid = next(self._ids)
+            try:
+                self._proc.stdin.write(json.dumps({**payload, "id": rid}).encode("utf-8") + b"\n")
+                self._proc.stdin.flush()
+            except OSError as err:
+                self._kill()
+                raise WorkerError(f"Kon niet naar de worker schrijven: {err}") from err
+
+            line = self._readline(timeout)
+            if line is None:
+                _LOGGER.error("Magister worker reageert niet binnen %ss, wordt herstart", timeout)
+                self._kill()
+                raise WorkerError("Magister worker timeout")
+            if not line:
+                self._kill()
+                raise WorkerError("Magister worker onverwacht gestopt")
+
+        # Records direct tijdens het decoderen aanmaken
+        resp = json.loads(line, object_hook=record_hook)
+        if resp.get("id") != rid:
+            with self._lock:
+                self._kill()
+            raise WorkerError("Magister worker antwoord hoort niet bij het verzoek")
+        if not resp.get("ok"):
+            if resp.get("error") == "auth":
+                raise AuthenticationRequired(resp.get("message"))
+            raise WorkerError(resp.get("message"))
+        return resp.get("result")
+
+    def stop(self):
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=5)
+                except Exception:
+                    pass
+            self._kill()
+
 class MagisterAPI:
-    def __init__(self, school, user, password, totp_secret=None):
+    def __init__(self, school, user, password, worker, totp_secret=None, session_file=None,
+                 schedule_weeks=DEFAULT_SCHEDULE_WEEKS):
         self.school = school
         self.user = user
         self.password = password
         self.authcode = DEFAULT_AUTHCODE
         self.totp_secret = totp_secret
+        self.worker = worker
+        # Bewaarde accounts.magister.net sessie voor stille re-authenticatie
+        self.session_file = session_file
+        # Aantal weken rooster vanaf vandaag (de worker cachet het per dag)
+        self.schedule_weeks = schedule_weeks
+        # Token + account uit de config flow, eenmalig te gebruiken bij de eerste refresh
+        self._handoff = None
+        # Statische account-gegevens (account, kinderen, aanmeldingen, lesperiode)
+        self._metadata = None
+        self._metadata_time = None
+
+    def _account(self):
+        return {
+            "school": self.school,
+            "user": self.user,
+            "password": self.password,
+            "totp_secret": self.totp_secret,
+            "authcode": self.authcode,
+            "session_file": str(self.session_file) if self.session_file else None,
+        }
+
+    def check(self):
+        """
+        Controleer alleen de inloggegevens: login + 'account', geen verdere data.
 
-    def get_data(self):
-        script_dir = Path(__file__).resolve().parent
-        script_path = str(script_dir) + "/magister.py"
-        cmd = [
-            "python3", script_path,
-            "--json",
-            "--schoolserver", f"{self.school}.magister.net",
-            "--username", self.user,
-            "--password", self.password,
-            "--authcode", self.authcode
-        ]
-
-        if self.totp_secret:
-            cmd += ["--totp-secret", self.totp_secret]
+        Geeft een dict met access_token, expires en account terug.
+        """
+        return self.worker.request({"op": "check", "account": self._account()})
 
+    def forget(self):
+        """Laat de worker de sessie van dit account vergeten (bij unload)."""
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30,
-                check=True,
-            )
-            if not result.stdout.strip():
-                raise AuthenticationRequired("Login failed: no output from script (wrong credentials or TOTP secret)")
-            try:
-                return json.loads(result.stdout)
-            except json.JSONDecodeError as e:
-                out = (result.stdout or "") + (result.stderr or "")
-                _LOGGER.error("Ongeldige JSON van Magister script: %s, output: %s", e, out)
-                low = out.lower()
-                if any(tok in low for tok in ["visit website", "redirect url does not contain a fragment", "could not get account info", "requested -> visit website", "change password", "totp challenge failed", "softtoken challenge failed", "2fa (totp) is required", "2fa (softtoken) is required"]):
-                    raise AuthenticationRequired(out)
-                raise
-
-        except subprocess.TimeoutExpired:
-            _LOGGER.error("Magister script timeout")
-            raise
-        except subprocess.CalledProcessError as e:
-            out = (e.stdout or "") + (e.stderr or "")
-            _LOGGER.error("Magister script error: %s", out)
-            low = out.lower()
-            if any(tok in low for tok in ["visit website", "redirect url does not contain a fragment", "could not get account info", "requested -> visit website", "change password", "totp challenge failed", "softtoken challenge failed", "2fa (totp) is required", "2fa (softtoken) is required"]):
-                raise AuthenticationRequired(out)
+            self.worker.request({"op": "forget", "account": self._account()})
+        except Exception as err:
+            _LOGGER.debug("Sessie vergeten mislukt: %s", err)
+
+    def prime(self, auth):
+        """Neem token en account-gegevens over uit een eerdere check()."""
+        self._handoff = auth
+
+    def _take_handoff(self):
+        auth, self._handoff = self._handoff, None
+        if not auth or not auth.get("access_token"):
+            return None
+        try:
+            expires = datetime.strptime(auth["expires"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if expires < datetime.now(timezone.utc) + timedelta(minutes=5):
+            return None
+        return auth
+
+    def invalidate_metadata(self):
+        """Vergeet de gecachte account-gegevens (bijv. na een reauth)."""
+        self._metadata = None
+        self._metadata_time = None
+
+    def _cached_metadata(self):
+        if self._metadata is None:
+            return None
+        if datetime.now(timezone.utc) - self._metadata_time > METADATA_TTL:
+            self.invalidate_metadata()
+            return None
+        return self._metadata
+
+    def get_data(self, cijfer_cursors=None, sections=None, priority=None, berichten_cursor=None,
+                 kind_ids=None, max_kinderen=None):
+        """
+        Volledige snapshot. Met `cijfer_cursors` ({kind_id: ingevoerd_op})
+        bevat "cijfers" voor die kinderen alleen de nieuwere cijfers; met
+        `sections` alleen die onderdelen (zie records.SECTIONS).
+
+        De worker werkt binnen FETCH_BUDGET seconden; "sections" in het
+        resultaat is wat volledig opgehaald is, "carry_over" wat niet paste
+        (geef dat als `priority` mee aan de volgende aanroep). Met
+        `berichten_cursor` ({"id", "verzonden_op"}) bevat "berichten" alleen
+        nieuwere berichten. Met `kind_ids` alleen die kinderen; zonder, en met
+        meer dan `max_kinderen` kinderen, geen enkel kind (zie kinderen()).
+        """
+        payload = {
+            "op": "fetch",
+            "account": self._account(),
+            "cijfer_cursors": cijfer_cursors,
+            "sections": sections,
+            "budget": FETCH_BUDGET,
+            "priority": priority,
+            "schedule_weeks": self.schedule_weeks,
+            "berichten_cursor": berichten_cursor,
+            "kind_ids": kind_ids,
+            "max_kinderen": max_kinderen,
+        }
+        metadata = self._cached_metadata()
+        if auth := self._take_handoff():
+            # Eerste refresh na de config flow: geen nieuwe login of account-call
+            payload["access_token"] = auth["access_token"]
+            metadata = {**(metadata or {}), "account": auth.get("account")}
+        payload["metadata"] = metadata
+
+        try:
+            # Inloggen valt buiten het budget: ruim genoeg marge voor een hangende worker
+            data = self.worker.request(payload, timeout=FETCH_BUDGET + REQUEST_TIMEOUT)
+        except AuthenticationRequired:
+            self.invalidate_metadata()
             raise
         except Exception as e:
             _LOGGER.error("Onverwachte fout: %s", e)
+            # Bij twijfel de volgende keer weer alles vers ophalen
+            self.invalidate_metadata()
             raise
+
+        if fresh := data.pop("metadata", None):
+            if self._metadata is None:
+                self._metadata_time = datetime.now(timezone.utc)
+            self._metadata = fresh
+        return snapshot_from_json(data)
+
+    def kinderen(self):
+        """{kind_id (str): naam} van alle kinderen/leerlingen van het account."""
+        return {
+            str(kind["Id"]): f"{kind.get('Roepnaam', '')} {kind.get('Achternaam', '')}"
+            for kind in (self._metadata or {}).get("kinderen") or []
+        }
+
+    def get_schedule(self, kind_id, van, tot):
+        """Afspraken en roosterwijzigingen van één kind voor [van, tot] (YYYY-MM-DD)."""
+        return self.worker.request({
+            "op": "schedule",
+            "account": self._account(),
+            "metadata": self._cached_metadata(),
+            "kind_id": kind_id,
+            "van": van,
+            "tot": tot,
+        })
+
+    def get_cijfers(self, kind_id, top, skip):
+        """Eén pagina cijfers (nieuwste eerst), voor het aanvullen van het archief."""
+        return self.worker.request({
+            "op": "cijfers",
+            "account": self._account(),
+            "kind_id": kind_id,
+            "top": top,
+            "skip": skip,
+        })
+
+    def get_bericht(self, bericht_id):
+        """Eén bericht inclusief de (naar tekst omgezette) inhoud."""
+        return self.worker.request({
+            "op": "bericht",
+            "account": self._account(),
+            "bericht_id": bericht_id,
+        })
+
+    def set_huiswerk_afgerond(self, kind_id, afspraak_id, afgerond=True):
+        """Markeer het huiswerk van een afspraak als (niet) afgerond; geeft de bijgewerkte afspraak."""
+        return self.worker.request({
+            "op": "huiswerk",
+            "account": self._account(),
+            "kind_id": kind_id,
+            "afspraak_id": afspraak_id,
+            "afgerond": afgerond,
+        })
+
+    def download(self, href, directory):
+        """
+        Download een bijlage naar `directory` (bestandsnaam = sha256 van de
+        inhoud); geeft {"sha256", "size", "content_type"}. De worker zoekt
+        alleen de ondertekende opslaglocatie op; het bestand komt hier binnen,
+        zodat de gedeelde worker vrij blijft voor polls. Er is geen terugval
+        via de worker: lukt de download niet, dan een DownloadError.
+        """
+        location = self.worker.request({
+            "op": "bijlage_location",
+            "account": self._account(),
+            "href": href,
+        })
+        try:
+            with urllib.request.urlopen(location, timeout=DOWNLOAD_TIMEOUT) as response:
+                return {
+                    **write_stream(response, str(directory)),
+                    "content_type": response.headers.get("content-type", ""),
+                }
+        except OSError as err:
+            # urllib.error.URLError/HTTPError en timeouts zijn allemaal OSError
+            raise DownloadError(f"Bijlage downloaden van de opslaglocatie mislukt: {err}") from err
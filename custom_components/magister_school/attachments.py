@@ -0,0 +1,180 @@
+"""Schijfcache voor bijlagen van opdrachten en studiewijzers.
+
+Bestanden staan content-addressed in één map: de bestandsnaam is de sha256
+van de inhoud, dus dezelfde bijlage (of hetzelfde bestand bij twee
+opdrachten) staat er maar één keer. Een index koppelt de Magister bijlage
+aan het bestand en houdt per bestand het laatste gebruik bij. Wordt de map
+groter dan `max_bytes`, dan verdwijnen de langst niet gebruikte bestanden.
+
+De worker zoekt de (ondertekende) opslaglocatie op; het bestand zelf wordt
+buiten de worker met `write_stream` in deze map geschreven, zodat een grote
+download de polls niet ophoudt. Alle methodes zijn blokkerend (executor).
+
+Geen Home Assistant imports.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_BYTES = 200 * 1024 * 1024
+
+# Leesgrootte bij het wegschrijven van een download
+DOWNLOAD_CHUNK = 64 * 1024
+
+INDEX_FILE = "index.json"
+
+# Alleen deze soorten toont de browser zelf (inline); de rest wordt een
+# download. Bijlagen komen van leraren maar worden geserveerd vanaf de
+# origin van Home Assistant: HTML of SVG zou daar script kunnen draaien.
+INLINE_TYPES = ("image/", "audio/", "video/")
+INLINE_EXACT = ("application/pdf",)
+NOT_INLINE = ("image/svg+xml",)
+
+
+def bijlage_key(bijlage):
+    """Sleutel van een bijlage in de index: het Magister id, anders de link."""
+    return str(bijlage.id if bijlage.id is not None else bijlage.href)
+
+
+def inline_type(content_type):
+    """Het (kale) content type als de bijlage inline getoond mag worden, anders None."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NOT_INLINE:
+        return None
+    if media_type in INLINE_EXACT or (
+        media_type.startswith(INLINE_TYPES) and media_type.count("/") == 1 and media_type[-1] != "/"
+    ):
+        return media_type
+    return None
+
+
+def write_stream(fh, directory, chunk_size=DOWNLOAD_CHUNK):
+    """
+    Schrijf een (binaire) stream naar `directory`, met de sha256 van de inhoud
+    als bestandsnaam; geeft {"sha256", "size"}. Tot hij compleet is heet het
+    bestand *.part.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fh.read(chunk_size):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, os.path.join(directory, digest.hexdigest()))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return {"sha256": digest.hexdigest(), "size": size}
+
+
+class AttachmentCache:
+    """Content-addressed bestanden met LRU-opruiming op totale grootte."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # {"bestanden": {sha256: {"size", "used"}}, "bijlagen": {key: {"sha256", "naam", "content_type"}}}
+        self._index = None
+
+    def _path(self, sha256):
+        return os.path.join(self.directory, sha256)
+
+    def _load(self):
+        if self._index is not None:
+            return
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), encoding="utf-8") as fh:
+                self._index = json.load(fh)
+        except (OSError, ValueError):
+            self._index = {}
+        self._index.setdefault("bestanden", {})
+        self._index.setdefault("bijlagen", {})
+        # Half geschreven downloads van een afgebroken run
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".part"):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as fh:
+            json.dump(self._index, fh)
+        os.replace(path + ".tmp", path)
+
+    def lookup(self, key):
+        """(pad, metadata) van een al gedownloade bijlage, of None."""
+        with self._lock:
+            self._load()
+            meta = self._index["bijlagen"].get(key)
+            if meta is None:
+                return None
+            bestand = self._index["bestanden"].get(meta["sha256"])
+            path = self._path(meta["sha256"])
+            if bestand is None or not os.path.exists(path):
+                # handmatig opgeruimd: opnieuw downloaden
+                del self._index["bijlagen"][key]
+                self._save()
+                return None
+            bestand["used"] = time.time()
+            self._save()
+            return path, meta
+
+    def add(self, key, result, naam, content_type=None):
+        """
+        Registreer een download (`result` van write_stream, met content_type)
+        en ruim zo nodig op. Geeft (pad, metadata).
+        """
+        with self._lock:
+            self._load()
+            sha256 = result["sha256"]
+            self._index["bestanden"][sha256] = {"size": result["size"], "used": time.time()}
+            meta = self._index["bijlagen"][key] = {
+                "sha256": sha256,
+                "naam": naam,
+                "content_type": content_type or result.get("content_type") or "application/octet-stream",
+                "size": result["size"],
+            }
+            self._evict(keep=sha256)
+            self._save()
+            return self._path(sha256), meta
+
+    def _evict(self, keep):
+        """Verwijder de langst niet gebruikte bestanden tot alles binnen max_bytes past."""
+        bestanden = self._index["bestanden"]
+        total = sum(b["size"] for b in bestanden.values())
+        for sha256, bestand in sorted(bestanden.items(), key=lambda item: item[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep:
+                continue
+            try:
+                os.remove(self._path(sha256))
+            except FileNotFoundError:
+                pass
+            del bestanden[sha256]
+            total -= bestand["size"]
+        self._index["bijlagen"] = {
+            key: meta for key, meta in self._index["bijlagen"].items() if meta["sha256"] in bestanden
+        }
+
+    def clear(self):
+        """Verwijder de hele cache (bij het verwijderen van de integratie)."""
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._index = None
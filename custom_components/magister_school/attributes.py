@@ -0,0 +1,91 @@
+"""Attributen binnen een byte-budget houden.
+
+Home Assistant zet state attributes bij elke wijziging in de database en
+weigert attributes boven 16 KiB. Lange lijsten worden hier ingekort tot de
+JSON-vorm binnen het budget past. Het attribuut `meer_beschikbaar` geeft
+per ingekorte lijst (pad met punten, bijv. `kinderen.Jan.afspraken`) het
+aantal weggelaten items.
+
+Geen Home Assistant imports.
+"""
+import json
+
+from .records import json_default
+
+# Grens waarboven de recorder attributes niet meer opslaat
+DEFAULT_ATTRIBUTE_BUDGET = 16384
+# Aantal recente items in de (wel opgeslagen) samenvatting
+SUMMARY_ITEMS = 5
+
+MORE_AVAILABLE = "meer_beschikbaar"
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8"))
+
+
+def _copy(value, depth=0):
+    """Kopie van de dicts tot twee niveaus diep; lijsten en items worden gedeeld."""
+    if isinstance(value, dict) and depth <= 2:
+        return {k: _copy(v, depth + 1) for k, v in value.items()}
+    return value
+
+
+def _list_slots(attributes):
+    """(container, sleutel, pad) voor elke lijst op het hoogste niveau of twee niveaus diep."""
+    slots = []
+
+    def walk(container, depth, prefix):
+        for key, value in container.items():
+            if isinstance(value, list) and value:
+                slots.append((container, key, f"{prefix}{key}"))
+            elif isinstance(value, dict) and depth < 2:
+                walk(value, depth + 1, f"{prefix}{key}.")
+
+    walk(attributes, 0, "")
+    return slots
+
+
+def apply_budget(attributes, budget):
+    """
+    Geef `attributes` terug met lijsten ingekort tot het geheel binnen `budget` bytes past.
+
+    Het budget dat na de vaste velden overblijft wordt eerlijk verdeeld:
+    kleine lijsten krijgen alles, wat ze overlaten gaat naar de grotere.
+    Van elke lijst blijven de eerste items staan. De invoer wordt niet
+    gewijzigd, zodat gedeelde (gecachte) waarden heel blijven.
+    """
+    if not budget or budget <= 0:
+        return attributes
+    if _size(attributes) <= budget:
+        return attributes
+
+    attributes = _copy(attributes)
+    slots = _list_slots(attributes)
+    # Item-groottes (+1 voor de komma) en de ruimte voor alles behalve de lijsten
+    sizes = [[_size(item) + 1 for item in container[key]] for container, key, _ in slots]
+    fixed = _size(attributes) - sum(sum(s) for s in sizes)
+    # Ruimte voor de markering ('"meer_beschikbaar":{"pad":123,...}')
+    fixed += len(MORE_AVAILABLE) + 5 + sum(len(path) + 10 for _, _, path in slots)
+    remaining = max(budget - fixed, 0)
+
+    more = {}
+    order = sorted(range(len(slots)), key=lambda i: sum(sizes[i]))
+    for n, i in enumerate(order):
+        share = remaining // (len(order) - n)
+        used = keep = 0
+        for item_size in sizes[i]:
+            if used + item_size > share:
+                break
+            used += item_size
+            keep += 1
+        remaining -= used
+
+        container, key, path = slots[i]
+        dropped = len(container[key]) - keep
+        if dropped:
+            container[key] = container[key][:keep]
+            more[path] = dropped
+    if more:
+        attributes[MORE_AVAILABLE] = more
+    return attributes
@@ -0,0 +1,115 @@
+"""Postvak in: incrementeel bijgehouden berichten met een cursor.
+
+De cursor is het hoogste bericht-id (en de verzenddatum daarvan) dat al
+gezien is; een poll haalt alleen nieuwere berichten op. De leesstatus van
+de bewaarde berichten volgt uit de ids van de ongelezen berichten. De inhoud
+van een bericht wordt pas opgehaald als het geopend wordt en daarna bewaard.
+
+Geen Home Assistant imports.
+"""
+from dataclasses import replace
+
+from .records import Bericht
+
+# Zoveel van de nieuwste berichten worden bewaard
+INBOX_SIZE = 50
+
+
+class Inbox:
+    """De nieuwste berichten van één account, op id."""
+
+    def __init__(self):
+        self._berichten = {}
+        self._cursor = None
+        # Ongelezen volgens Magister; None als de map-telling ontbrak
+        self.ongelezen = None
+
+    @property
+    def cursor(self):
+        """{"id", "verzonden_op"} van het nieuwste bekende bericht, of None."""
+        return dict(self._cursor) if self._cursor else None
+
+    def merge(self, berichten):
+        """
+        Voeg opgehaalde berichten toe; geeft de nieuwe terug (oud -> nieuw).
+
+        Een bericht dat al bekend is houdt zijn eerder opgehaalde inhoud.
+        """
+        nieuw = []
+        for bericht in berichten:
+            bekend = self._berichten.get(bericht.id)
+            if bekend is None:
+                nieuw.append(bericht)
+            elif bericht.inhoud is None:
+                bericht.inhoud = bekend.inhoud
+            self._berichten[bericht.id] = bericht
+            if self._cursor is None or self._newer(bericht):
+                self._cursor = {"id": bericht.id, "verzonden_op": bericht.verzonden_op}
+        self._trim()
+        nieuw.sort(key=lambda b: (b.verzonden_op or "", b.id or 0))
+        return nieuw
+
+    def _newer(self, bericht):
+        if bericht.id is not None and self._cursor["id"] is not None:
+            return bericht.id > self._cursor["id"]
+        return (bericht.verzonden_op or "") > (self._cursor["verzonden_op"] or "")
+
+    def _trim(self):
+        if len(self._berichten) > INBOX_SIZE:
+            keep = self.berichten()[:INBOX_SIZE]
+            self._berichten = {b.id: b for b in keep}
+
+    def berichten(self):
+        """Alle bewaarde berichten, nieuwste eerst."""
+        return sorted(
+            self._berichten.values(),
+            key=lambda b: (b.verzonden_op or "", b.id or 0),
+            reverse=True,
+        )
+
+    def get(self, bericht_id):
+        return self._berichten.get(bericht_id)
+
+    def set_ongelezen(self, ids):
+        """
+        Leesstatus bijwerken: van de bewaarde berichten zijn alleen die met een
+        id uit `ids` ongelezen. Geeft of er iets veranderde.
+        """
+        ids = set(ids)
+        changed = False
+        for bericht_id, bericht in self._berichten.items():
+            gelezen = bericht_id not in ids
+            if bericht.is_gelezen != gelezen:
+                # Nieuw record: de vorige snapshot deelt het oude
+                self._berichten[bericht_id] = replace(bericht, is_gelezen=gelezen)
+                changed = True
+        return changed
+
+    def set_inhoud(self, bericht):
+        """Bewaar een geopend bericht (met inhoud)."""
+        if bericht.id in self._berichten:
+            self._berichten[bericht.id] = bericht
+
+    def aantal_ongelezen(self):
+        """Magister's telling, anders de ongelezen bewaarde berichten."""
+        if self.ongelezen is not None:
+            return self.ongelezen
+        return sum(1 for b in self._berichten.values() if not b.is_gelezen)
+
+    def as_json(self):
+        return {
+            "cursor": self._cursor,
+            "ongelezen": self.ongelezen,
+            "berichten": [b.as_dict() for b in self._berichten.values()],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        inbox = cls()
+        data = data or {}
+        inbox._cursor = data.get("cursor")
+        inbox.ongelezen = data.get("ongelezen")
+        for item in data.get("berichten") or []:
+            bericht = Bericht.from_dict(item)
+            inbox._berichten[bericht.id] = bericht
+        return inbox
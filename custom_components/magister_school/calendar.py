@@ -0,0 +1,213 @@
+# calendar.py
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .schedule import IntervalIndex, merge_rooster, parse_local
+
+_LOGGER = logging.getLogger(__name__)
+
+# Buiten het vaste venster opgehaalde dagen blijven zo lang geldig
+RANGE_CACHE_TTL = 6 * 3600
+# Maximaal aantal dagen buiten het venster in de cache
+RANGE_CACHE_MAX_DAYS = 400
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback
+):
+    """Set up een Magister rooster-kalender per kind."""
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    entities = []
+    if coordinator.data and "kinderen" in coordinator.data:
+        for kind_naam in coordinator.kinderen:
+            base_id = kind_naam.lower().replace(' ', '_')
+            entities.append(MagisterKindCalendar(coordinator, kind_naam, base_id))
+
+    async_add_entities(entities, update_before_add=False)
+
+
+def _rooster_intervals(afspraken, wijzigingen, tz):
+    """Afspraken + wijzigingen -> (start, einde, CalendarEvent) intervallen."""
+    intervals = []
+    for afspraak, wijziging in merge_rooster(afspraken, wijzigingen):
+        bron = afspraak or wijziging
+        start = parse_local(bron.start, tz)
+        if start is None:
+            continue
+        end = parse_local(bron.einde, tz) or start
+        if end < start:
+            end = start
+
+        summary = bron.omschrijving or getattr(bron, "vak", "") or "Les"
+        if afspraak is not None and afspraak.is_uitval:
+            summary = f"Uitval: {summary}"
+        elif wijziging is not None:
+            summary = f"Wijziging: {summary}"
+
+        description = [bron.inhoud] if bron.inhoud else []
+        if afspraak is not None and wijziging is not None:
+            description.append(f"Roosterwijziging: {wijziging.omschrijving}")
+            if wijziging.inhoud:
+                description.append(wijziging.inhoud)
+
+        location = (wijziging.lokaal if wijziging is not None and wijziging.lokaal else bron.lokaal) or None
+        intervals.append((start, end, CalendarEvent(
+            start=start,
+            end=end,
+            summary=summary,
+            description="\n".join(description) or None,
+            location=location,
+            uid=str(bron.id) if bron.id is not None else None,
+        )))
+    return intervals
+
+
+class MagisterKindCalendar(CalendarEntity):
+    """Rooster van één kind, inclusief roosterwijzigingen en uitval."""
+
+    def __init__(self, coordinator, kind_naam, base_id):
+        self._coordinator = coordinator
+        self._kind_naam = kind_naam
+        self._attr_unique_id = f"magister_{base_id}_rooster"
+        self._attr_name = f"Magister {kind_naam} Rooster"
+        self._attr_icon = "mdi:calendar-clock"
+        self._index = IntervalIndex()
+        # Dagen buiten het vaste venster: dag -> (opgehaald_op, intervallen)
+        self._days = {}
+        self._days_index = IntervalIndex()
+        self._fetch_lock = asyncio.Lock()
+
+    def _get_kind_data(self):
+        if not self._coordinator.data:
+            return None
+        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
+
+    def _window(self):
+        """Het venster [van, tot) dat de coordinator bij elke poll ophaalt."""
+        kind_data = self._get_kind_data() or {}
+        try:
+            return (
+                date.fromisoformat(kind_data["rooster_van"]),
+                date.fromisoformat(kind_data["rooster_tot"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None, None
+
+    def _rebuild_index(self):
+        kind_data = self._get_kind_data()
+        if not kind_data:
+            self._index = IntervalIndex()
+            return
+        self._index = IntervalIndex(_rooster_intervals(
+            kind_data.get("afspraken", []),
+            kind_data.get("wijzigingen", []),
+            dt_util.get_default_time_zone(),
+        ))
+
+    @property
+    def event(self):
+        return self._index.current_or_next(dt_util.now())
+
+    async def async_get_events(self, hass: HomeAssistant, start_date: datetime, end_date: datetime):
+        await self._ensure_days(start_date.date(), end_date.date())
+        events = self._index.overlapping(start_date, end_date)
+        events += self._days_index.overlapping(start_date, end_date)
+        events.sort(key=lambda e: e.start)
+        return events
+
+    async def _ensure_days(self, first, last):
+        """Haal dagen buiten het vaste venster lui op, met cache."""
+        van, tot = self._window()
+        kind_data = self._get_kind_data()
+        if not kind_data or kind_data.get("id") is None:
+            return
+
+        now = time.monotonic()
+        missing = []
+        day = first
+        while day <= last:
+            in_window = van is not None and van <= day < tot
+            cached = self._days.get(day)
+            if not in_window and (cached is None or now - cached[0] > RANGE_CACHE_TTL):
+                missing.append(day)
+            day += timedelta(days=1)
+        if not missing:
+            return
+
+        async with self._fetch_lock:
+            # Aaneengesloten stukken in één verzoek
+            runs = []
+            for day in missing:
+                if runs and day == runs[-1][1] + timedelta(days=1):
+                    runs[-1][1] = day
+                else:
+                    runs.append([day, day])
+
+            tz = dt_util.get_default_time_zone()
+            for run_van, run_tot in runs:
+                try:
+                    result = await self.hass.async_add_executor_job(
+                        self._coordinator.api.get_schedule,
+                        kind_data["id"],
+                        run_van.isoformat(),
+                        (run_tot + timedelta(days=1)).isoformat(),
+                    )
+                except Exception as err:
+                    _LOGGER.warning("Rooster %s - %s ophalen mislukt: %s", run_van, run_tot, err)
+                    continue
+
+                per_day = {}
+                for iv in _rooster_intervals(result.get("afspraken", []), result.get("wijzigingen", []), tz):
+                    per_day.setdefault(iv[0].date(), []).append(iv)
+                day = run_van
+                while day <= run_tot:
+                    self._days[day] = (now, per_day.get(day, []))
+                    day += timedelta(days=1)
+
+            # Cache begrenzen: oudste opgehaalde dagen eerst weg
+            if len(self._days) > RANGE_CACHE_MAX_DAYS:
+                for day, _ in sorted(self._days.items(), key=lambda kv: kv[1][0])[:len(self._days) - RANGE_CACHE_MAX_DAYS]:
+                    del self._days[day]
+
+            self._rebuild_days_index()
+
+    def _rebuild_days_index(self):
+        # Dagen die inmiddels in het vaste venster vallen niet dubbel tonen
+        van, tot = self._window()
+        self._days_index = IntervalIndex(
+            iv for day, (_, intervals) in self._days.items()
+            if van is None or not van <= day < tot
+            for iv in intervals
+        )
+
+    @property
+    def should_poll(self):
+        return False
+
+    @property
+    def available(self):
+        return self._coordinator.last_update_success and self._get_kind_data() is not None
+
+    @callback
+    def _handle_coordinator_update(self):
+        self._rebuild_index()
+        self._rebuild_days_index()
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        self._rebuild_index()
+        self.async_on_remove(
+            self._coordinator.async_add_listener(self._handle_coordinator_update)
+        )
@@ -0,0 +1,88 @@
+"""Wijzigingsdetectie tussen twee opeenvolgende snapshots.
+
+Per kind en sectie wordt een set met sleutels (Magister id, of anders een
+combinatie van velden) van de vorige snapshot bewaard. Na elke refresh
+levert `diff()` alleen de nieuwe items op, zodat er per wijziging één
+compact event gestuurd kan worden.
+"""
+from .const import (
+    EVENT_NEW_GRADE,
+    EVENT_LESSON_CANCELLED,
+    EVENT_SCHEDULE_CHANGE,
+    EVENT_NEW_ASSIGNMENT,
+    EVENT_NEW_ABSENCE,
+)
+
+# Grote tekstvelden laten we buiten de events
+_SKIP_FIELDS = {"inhoud"}
+
+
+def record_key(record):
+    """Stabiele sleutel voor een record: het Magister id, anders de velden."""
+    if getattr(record, "id", None) is not None:
+        return record.id
+    return tuple(
+        getattr(record, name) for name in record.__slots__
+        if name != "inhoud" and name not in record._nested
+    )
+
+
+def _payload(kind_naam, record):
+    data = {k: v for k, v in record.as_dict().items() if k not in _SKIP_FIELDS}
+    data["kind"] = kind_naam
+    return data
+
+
+def _sections(snapshot):
+    """(event_type, kind_naam, records) voor alles wat we volgen."""
+    for kind_naam, kind_data in (snapshot.get("kinderen") or {}).items():
+        afspraken = kind_data.get("afspraken") or []
+        yield EVENT_LESSON_CANCELLED, kind_naam, [a for a in afspraken if a.is_uitval]
+        yield EVENT_SCHEDULE_CHANGE, kind_naam, kind_data.get("wijzigingen") or []
+    for section, event_type in (
+        ("cijfers", EVENT_NEW_GRADE),
+        ("opdrachten", EVENT_NEW_ASSIGNMENT),
+        ("absenties", EVENT_NEW_ABSENCE),
+    ):
+        for kind_naam, records in (snapshot.get(section) or {}).items():
+            yield event_type, kind_naam, records
+
+
+class ChangeTracker:
+    """Houdt per (event_type, kind) de sleutels van de vorige snapshot bij."""
+
+    def __init__(self):
+        self._seen = None
+
+    def diff(self, snapshot):
+        """
+        Vergelijk met de vorige snapshot; geeft [(event_type, data), ...].
+
+        De eerste snapshot is alleen de nulmeting en levert geen events op.
+        """
+        seen = {}
+        changes = []
+        for event_type, kind_naam, records in _sections(snapshot):
+            keys = seen[(event_type, kind_naam)] = {}
+            for record in records:
+                keys[record_key(record)] = record
+
+            if self._seen is None:
+                continue
+            previous = self._seen.get((event_type, kind_naam))
+            if previous is None:
+                # nieuw kind of nieuwe sectie: eerst een nulmeting
+                continue
+            for key, record in keys.items():
+                if key not in previous:
+                    changes.append((event_type, _payload(kind_naam, record)))
+
+        self._seen = {k: set(v) for k, v in seen.items()}
+        return changes
+
+    def extend_baseline(self, event_type, kind_naam, records):
+        """Markeer records als bekend zonder event (bijv. aangevulde oude cijfers)."""
+        if self._seen is None:
+            return
+        seen = self._seen.setdefault((event_type, kind_naam), set())
+        seen.update(record_key(record) for record in records)
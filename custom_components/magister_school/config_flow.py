@@ -3,8 +3,19 @@ from homeassistant import config_entries
 from homeassistant.core import callback
 import logging
 
-from .const import DOMAIN
+from .attributes import DEFAULT_ATTRIBUTE_BUDGET
+from homeassistant.helpers import config_validation as cv
+
+from .const import (
+    DOMAIN, HANDOFF, CONF_ATTRIBUTE_BUDGET, CONF_MIN_INTERVAL, CONF_MAX_INTERVAL, CONF_SCHEDULE_WEEKS,
+    CONF_KINDEREN, CONF_SHARD_SIZE, CONF_HISTORY_DAYS,
+)
 from .api import MagisterAPI, AuthenticationRequired
+from .coordinator import async_get_worker
+from .polling import DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL
+from .history import DEFAULT_HISTORY_DAYS
+from .schedule import DEFAULT_SCHEDULE_WEEKS
+from .shards import DEFAULT_SHARD_SIZE
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,15 +30,19 @@ async def validate_input(hass, data):
 
     totp_secret = data.get("totp_secret") or None
 
-    api = MagisterAPI(school, user, password, totp_secret=totp_secret)
+    api = MagisterAPI(school, user, password, async_get_worker(hass), totp_secret=totp_secret)
     try:
-        await hass.async_add_executor_job(api.get_data)
+        # Alleen inloggen + account ophalen, niet de volledige data dump
+        auth = await hass.async_add_executor_job(api.check)
     except AuthenticationRequired:
         raise ValueError("invalid_auth")
     except Exception as err:
         _LOGGER.error("Could not connect to Magister during validation: %s", err)
         raise ValueError("cannot_connect")
 
+    # Geef token en account door aan de eerste refresh van de coordinator
+    hass.data.setdefault(DOMAIN, {}).setdefault(HANDOFF, {})[f"{school}_{user}"] = auth
+
     return {
         "title": f"Magister - {school}",
         "user": user,
@@ -37,17 +52,22 @@ class MagisterConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow voor Magister integratie."""
 
     VERSION = 1
+    # 2: nieuwe entries halen zonder keuze maximaal AUTO_KINDEREN kinderen op
+    MINOR_VERSION = 2
 
     async def async_step_user(self, user_input=None):
         errors = {}
 
         if user_input is not None:
+            # Eerst controleren, dan pas inloggen: validate_input zet het token
+            # klaar in HANDOFF, en bij een afbreking zou dat blijven liggen.
+            # Buiten de try, anders wordt AbortFlow een "unknown" fout.
+            await self.async_set_unique_id(f"{user_input['school']}_{user_input['user']}")
+            self._abort_if_unique_id_configured()
+
             try:
                 info = await validate_input(self.hass, user_input)
 
-                await self.async_set_unique_id(f"{user_input['school']}_{user_input['user']}")
-                self._abort_if_unique_id_configured()
-
                 return self.async_create_entry(
                     title=info["title"],
                     data=user_input,
@@ -132,13 +152,43 @@ class MagisterOptionsFlow(config_entries.OptionsFlow):
         errors = {}
 
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
-
-        options_schema = vol.Schema(
-            {
-                vol.Optional("poll_interval", default=self._config_entry.options.get("poll_interval", 300)): int,
-            }
-        )
+            # Zonder keuzelijst (account nog niet geladen) de gekozen leerlingen houden
+            return self.async_create_entry(title="", data={**self._config_entry.options, **user_input})
+
+        fields = {
+            vol.Optional(
+                CONF_MIN_INTERVAL,
+                default=self._config_entry.options.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_MAX_INTERVAL,
+                default=self._config_entry.options.get(CONF_MAX_INTERVAL, DEFAULT_MAX_INTERVAL),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_SCHEDULE_WEEKS,
+                default=self._config_entry.options.get(CONF_SCHEDULE_WEEKS, DEFAULT_SCHEDULE_WEEKS),
+            ): vol.All(int, vol.Range(min=1, max=12)),
+            vol.Optional(
+                CONF_ATTRIBUTE_BUDGET,
+                default=self._config_entry.options.get(CONF_ATTRIBUTE_BUDGET, DEFAULT_ATTRIBUTE_BUDGET),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Optional(
+                CONF_HISTORY_DAYS,
+                default=self._config_entry.options.get(CONF_HISTORY_DAYS, DEFAULT_HISTORY_DAYS),
+            ): vol.All(int, vol.Range(min=0)),
+        }
+
+        # Leerlingen kiezen kan pas als het account geladen is (lijst uit de coordinator)
+        coordinator = self.hass.data.get(DOMAIN, {}).get(self._config_entry.entry_id)
+        kind_namen = getattr(coordinator, "kind_namen", None)
+        if kind_namen:
+            gekozen = [i for i in self._config_entry.options.get(CONF_KINDEREN, []) if i in kind_namen]
+            fields[vol.Optional(CONF_KINDEREN, default=gekozen)] = cv.multi_select(kind_namen)
+            fields[vol.Optional(
+                CONF_SHARD_SIZE,
+                default=self._config_entry.options.get(CONF_SHARD_SIZE, DEFAULT_SHARD_SIZE),
+            )] = vol.All(int, vol.Range(min=1))
+        options_schema = vol.Schema(fields)
 
         return self.async_show_form(
             step_id="user",
@@ -2,4 +2,29 @@ DOMAIN = "magister_school"
 CONF_SCHOOL = "school"
 CONF_USER = "user"
 CONF_PASS = "pass"
+CONF_ATTRIBUTE_BUDGET = "attribute_budget"
+CONF_MIN_INTERVAL = "min_interval"
+CONF_MAX_INTERVAL = "max_interval"
+CONF_SCHEDULE_WEEKS = "schedule_weeks"
+CONF_KINDEREN = "kinderen"
+CONF_SHARD_SIZE = "shard_size"
+CONF_HISTORY_DAYS = "history_days"
+# Entries van voor de AUTO_KINDEREN grens: zonder keuze alle kinderen ophalen
+CONF_ALLE_KINDEREN = "alle_kinderen"
 DEFAULT_NAME = "Magister Data"
+HANDOFF = "handoff"
+WORKER = "worker"
+
+SERVICE_DOWNLOAD_BIJLAGE = "download_bijlage"
+SERVICE_LEES_BERICHT = "lees_bericht"
+SERVICE_MARKEER_HUISWERK = "markeer_huiswerk"
+SERVICE_ZOEK_HISTORIE = "zoek_historie"
+SERVICE_ZOEK = "zoek"
+
+# Events bij wijzigingen tussen twee refreshes
+EVENT_NEW_GRADE = f"{DOMAIN}_new_grade"
+EVENT_LESSON_CANCELLED = f"{DOMAIN}_lesson_cancelled"
+EVENT_SCHEDULE_CHANGE = f"{DOMAIN}_schedule_change"
+EVENT_NEW_ASSIGNMENT = f"{DOMAIN}_new_assignment"
+EVENT_NEW_ABSENCE = f"{DOMAIN}_new_absence"
+EVENT_NEW_MESSAGE = f"{DOMAIN}_new_message"
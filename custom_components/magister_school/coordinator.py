@@ -1,31 +1,178 @@
+import asyncio
 import logging
+import time
+from dataclasses import replace
 from datetime import timedelta
+import functools
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
 from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.components import persistent_notification
+from homeassistant.util import dt as dt_util
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.storage import STORAGE_DIR, Store
 
-from .api import MagisterAPI, AuthenticationRequired
+from .api import MagisterAPI, MagisterWorker, AuthenticationRequired
+from .attachments import AttachmentCache, bijlage_key
+from .attributes import DEFAULT_ATTRIBUTE_BUDGET
+from .berichten import Inbox
+from .changes import ChangeTracker
+from .grades import GradeArchive, GradeStore, schooljaar_start
+from .history import DEFAULT_HISTORY_DAYS, History
+from .records import SECTIONS, huiswerk_counts
+from .schedule import DEFAULT_SCHEDULE_WEEKS
+from .search import SearchIndex
+from .polling import DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, next_interval, school_days
+from .shards import AUTO_KINDEREN, DEFAULT_SHARD_SIZE, Shards
+from .statistieken import StatisticsImporter
+from .views import SnapshotView
+from .const import DOMAIN, WORKER, EVENT_NEW_GRADE, EVENT_NEW_MESSAGE
 
 _LOGGER = logging.getLogger(__name__)
 
+ARCHIVE_VERSION = 1
+INBOX_VERSION = 1
+# Aanvullen van het cijferarchief: paginagrootte en maximum aantal pagina's
+BACKFILL_PAGE = 100
+BACKFILL_MAX_PAGES = 20
+
+# Refresh-verzoeken van entities binnen dit venster worden één ophaalronde
+SECTION_REFRESH_DEBOUNCE = 5
+# Een onderdeel wordt op verzoek niet vaker opgehaald dan dit (seconden)
+SECTION_MIN_SPACING = 60
+
+
+def session_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Pad van de bewaarde accounts-sessie voor een config entry."""
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.session")
+
+
+def archive_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store met het cijferarchief van een config entry."""
+    return Store(hass, ARCHIVE_VERSION, f"{DOMAIN}.{entry_id}.cijfers")
+
+
+def inbox_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store met de berichten (en cursor) van een config entry."""
+    return Store(hass, INBOX_VERSION, f"{DOMAIN}.{entry_id}.berichten")
+
+
+def attachments_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Map met de gedownloade bijlagen van een config entry."""
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.bijlagen")
+
+
+def history_path(hass: HomeAssistant, entry_id: str) -> str:
+    """SQLite-historie van een config entry."""
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}.{entry_id}.historie.db")
+
+
+@callback
+def async_get_worker(hass: HomeAssistant) -> MagisterWorker:
+    """De gedeelde worker van deze Home Assistant instantie (lazy gestart)."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (worker := domain_data.get(WORKER)) is None:
+        worker = domain_data[WORKER] = MagisterWorker()
+
+        async def _stop(event):
+            await hass.async_add_executor_job(worker.stop)
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _stop)
+    return worker
+
 class MagisterDataUpdateCoordinator(DataUpdateCoordinator):
     """Coordinator voor Magister data updates."""
 
-    def __init__(self, hass: HomeAssistant, school: str, username: str, password: str, totp_secret: str = None):
-        self.api = MagisterAPI(school, username, password, totp_secret=totp_secret)
+    def __init__(self, hass: HomeAssistant, school: str, username: str, password: str, totp_secret: str = None, entry_id: str = None, attribute_budget: int = DEFAULT_ATTRIBUTE_BUDGET,
+                 min_interval: int = DEFAULT_MIN_INTERVAL, max_interval: int = DEFAULT_MAX_INTERVAL,
+                 schedule_weeks: int = DEFAULT_SCHEDULE_WEEKS, kinderen: list = None,
+                 shard_size: int = DEFAULT_SHARD_SIZE, history_days: int = DEFAULT_HISTORY_DAYS,
+                 max_kinderen: int | None = AUTO_KINDEREN):
+        self.api = MagisterAPI(
+            school, username, password, async_get_worker(hass),
+            totp_secret=totp_secret,
+            session_file=session_path(hass, entry_id) if entry_id else None,
+            schedule_weeks=schedule_weeks,
+        )
+        # Sleutels van de vorige snapshot, voor de wijzigings-events
+        self._changes = ChangeTracker()
+        # Per kind de verwerkte cijfers en lopende gemiddelden
+        self.grades = {}
+        # Bewaard cijferarchief (alle cijfers van het schooljaar) met cursor
+        self._archive_store = archive_store(hass, entry_id) if entry_id else None
+        self._archive = None
+        self._backfill_task = None
+        # Bewaarde berichten met cursor; alleen nieuwere worden opgehaald
+        self._inbox_store = inbox_store(hass, entry_id) if entry_id else None
+        self.inbox = None
+        # Gedownloade bijlagen; één download tegelijk per account
+        self.attachments = AttachmentCache(attachments_path(hass, entry_id)) if entry_id else None
+        self._download_lock = asyncio.Lock()
+        # Alles wat ooit opgehaald is, ook buiten het ophaalvenster
+        self.history = History(history_path(hass, entry_id), history_days) if entry_id else None
+        self._history_task = None
+        # Zoekindex over huiswerk, opdrachten en studiewijzers; per snapshot bijgewerkt
+        self.search_index = SearchIndex()
+        # Gemiddelden en absenties als lange-termijn statistieken
+        self._statistics = StatisticsImporter(hass)
+        self._statistics_task = None
+        # Maximale grootte (bytes) van de attributes per sensor
+        self.attribute_budget = attribute_budget
+        # Afgeleide waarden van de huidige snapshot, gedeeld door alle entities
+        self._view = None
+        self._view_source = None
+        # Onderdelen waarvoor een entity een refresh vroeg, en wanneer ze laatst opgehaald zijn
+        self._pending_sections = set()
+        self._fetched_at = {}
+        # Onderdelen die vorige keer niet binnen het tijdsbudget pasten: eerst aan de beurt
+        self._carry_over = []
+        # Gekozen kinderen (grote accounts), per poll een schijf daarvan
+        self._shards = Shards(kinderen, shard_size, max_kinderen)
+        self._warned_kinderen = False
+        # Aangeroepen bij async_shutdown, bv. voor websocket-abonnementen
+        self._shutdown_listeners = []
+        # {kind_id: naam} van alle kinderen van het account
+        self._kind_namen = {}
+        self._section_debouncer = Debouncer(
+            hass, _LOGGER,
+            cooldown=SECTION_REFRESH_DEBOUNCE,
+            immediate=False,
+            function=self._async_refresh_sections,
+        )
+        # Grenzen voor het rooster-afhankelijke poll-interval
+        self._min_interval = timedelta(minutes=min_interval)
+        self._max_interval = max(timedelta(minutes=max_interval), self._min_interval)
         
         super().__init__(
             hass,
             _LOGGER,
             name="Magister",
-            update_interval=timedelta(minutes=15),
+            update_interval=self._min_interval,
         )
 
     async def _async_update_data(self):
+        if self._archive is None:
+            stored = await self._archive_store.async_load() if self._archive_store else None
+            self._archive = GradeArchive.from_json(stored)
+        if self.inbox is None:
+            stored = await self._inbox_store.async_load() if self._inbox_store else None
+            self.inbox = Inbox.from_json(stored)
+
         try:
-            data = await self.hass.async_add_executor_job(self.api.get_data)
+            data = await self._async_get_data(priority=self._carry_over or None, **self._shards.next())
             _LOGGER.debug("Magister data succesvol opgehaald")
+            self._mark_fetched(data.pop("sections", SECTIONS))
+            self._carry_over = data.pop("carry_over", [])
+            if self._carry_over:
+                _LOGGER.info("Magister tijdsbudget op; volgende keer eerst: %s", ", ".join(self._carry_over))
+            if self.data and (self._carry_over or self._shards.sharded):
+                # Niet opgehaalde onderdelen en kinderen houden hun vorige waarde
+                data = self._merge_sections(data)
+            self._check_kinderen(data)
+            self._process_snapshot(data)
+            self._schedule_backfill()
+            self._adapt_interval(data)
             return data
         except AuthenticationRequired as err:
             _LOGGER.error("Authenticatie vereist voor Magister: %s", err)
@@ -38,3 +185,385 @@ class MagisterDataUpdateCoordinator(DataUpdateCoordinator):
         except Exception as err:
             _LOGGER.error("Fout bij ophalen Magister data: %s", err)
             raise UpdateFailed(f"Error communicating with Magister API: {err}")
+
+    async def _async_get_data(self, sections=None, priority=None, kind_ids=None, max_kinderen=None):
+        return await self.hass.async_add_executor_job(functools.partial(
+            self.api.get_data,
+            cijfer_cursors=self._archive.cursors() or None,
+            sections=sections,
+            priority=priority,
+            berichten_cursor=self.inbox.cursor,
+            kind_ids=kind_ids,
+            max_kinderen=max_kinderen,
+        ))
+
+    def _check_kinderen(self, data):
+        """Namen bijwerken; eenmalige melding als er te veel kinderen zijn om zonder keuze op te halen."""
+        self._kind_namen = self.api.kinderen() or self._kind_namen
+        if self._warned_kinderen or self._shards.kind_ids is not None or self._shards.max_kinderen is None:
+            return
+        if data.get("aantal_kinderen", 0) > self._shards.max_kinderen and not data.get("kinderen"):
+            self._warned_kinderen = True
+            persistent_notification.async_create(
+                self.hass,
+                f"Het Magister account {self.api.user} heeft {data['aantal_kinderen']} leerlingen. "
+                "Kies in de opties van de integratie welke leerlingen gevolgd worden.",
+                title="Magister - kies leerlingen",
+            )
+
+    @property
+    def kinderen(self):
+        """Namen van de kinderen die entities krijgen: de gekozen, anders de opgehaalde."""
+        if self._shards.kind_ids is None:
+            return list((self.data or {}).get("kinderen", {}))
+        return [self._kind_namen[i] for i in self._shards.kind_ids if i in self._kind_namen]
+
+    @property
+    def kind_namen(self):
+        """{kind_id: naam} van alle kinderen van het account (voor de opties)."""
+        return dict(self._kind_namen)
+
+    def _process_snapshot(self, data):
+        """Archief en berichten bijwerken, events sturen en cijfers verwerken voor een nieuwe snapshot."""
+        self._merge_archive(data)
+        self._merge_inbox(data)
+        self._fire_change_events(data)
+        self._ingest_grades(data)
+        self._store_history(data)
+        self._import_statistics(data)
+        self._update_search_index(data)
+
+    def _update_search_index(self, data):
+        # Alleen nieuwe en gewijzigde teksten worden getokeniseerd
+        changed, removed = self.search_index.update(data)
+        if changed or removed:
+            _LOGGER.debug("Magister zoekindex: %d bijgewerkt, %d verwijderd", changed, removed)
+
+    def _store_history(self, data):
+        if self.history is None:
+            return
+        self._history_task = self.hass.async_create_background_task(
+            self._async_store_history(data, self._history_task), "magister_historie"
+        )
+
+    def _import_statistics(self, data):
+        if "recorder" not in self.hass.config.components:
+            return
+        # Pas gemiddelden als het hele schooljaar binnen is (zie _schedule_backfill)
+        compleet = {naam for naam in self._archive.kind_ids() if self._archive.backfilled(naam)}
+        self._statistics_task = self.hass.async_create_background_task(
+            self._async_import_statistics(data, compleet, self._statistics_task), "magister_statistieken"
+        )
+
+    async def _async_import_statistics(self, data, compleet, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await self._statistics.async_import(data, compleet)
+        except Exception as err:
+            _LOGGER.warning("Magister statistieken importeren mislukt: %s", err)
+
+    async def _async_store_history(self, data, previous):
+        # In volgorde: een oudere snapshot mag een nieuwere niet overschrijven
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            changed = await self.hass.async_add_executor_job(self.history.store, data)
+            _LOGGER.debug("Magister historie: %d records bijgewerkt", changed)
+        except Exception as err:
+            _LOGGER.warning("Magister historie bijwerken mislukt: %s", err)
+
+    def _mark_fetched(self, sections):
+        now = time.monotonic()
+        for section in sections:
+            self._fetched_at[section] = now
+
+    async def async_request_sections(self, sections):
+        """
+        Vraag een refresh van alleen deze onderdelen (zie records.SECTIONS).
+
+        Verzoeken binnen SECTION_REFRESH_DEBOUNCE seconden worden samengevoegd
+        tot één ophaalronde; onderdelen die minder dan SECTION_MIN_SPACING
+        seconden geleden opgehaald zijn worden overgeslagen.
+        """
+        self._pending_sections.update(sections)
+        await self._section_debouncer.async_call()
+
+    async def _async_refresh_sections(self):
+        sections, self._pending_sections = self._pending_sections, set()
+        now = time.monotonic()
+        sections = [
+            s for s in SECTIONS
+            if s in sections and now - self._fetched_at.get(s, -SECTION_MIN_SPACING) >= SECTION_MIN_SPACING
+        ]
+        if not sections:
+            return
+        if self.data is None or len(sections) == len(SECTIONS):
+            await self.async_refresh()
+            return
+
+        _LOGGER.debug("Magister refresh van %s", ", ".join(sections))
+        try:
+            partial = await self._async_get_data(sections=sections, **self._shards.current())
+        except Exception as err:
+            # De volgende gewone poll meldt eventuele (auth)fouten
+            _LOGGER.warning("Gedeeltelijke Magister refresh mislukt: %s", err)
+            return
+
+        self._mark_fetched(partial.pop("sections", sections))
+        for section in partial.pop("carry_over", []):
+            if section not in self._carry_over:
+                self._carry_over.append(section)
+        data = self._merge_sections(partial)
+        self._process_snapshot(data)
+        self.async_set_updated_data(data)
+
+    def _merge_sections(self, partial):
+        """Nieuwe snapshot: de huidige, met per kind vervangen wat er opgehaald is."""
+        data = {**self.data, "last_update": partial.get("last_update", self.data.get("last_update"))}
+        kinderen = dict(self.data.get("kinderen", {}))
+        for kind_naam, kind_data in partial.get("kinderen", {}).items():
+            # Zonder rooster (niet gevraagd of niet binnen het budget) het vorige houden
+            if "afspraken" not in kind_data:
+                kind_data = {**kinderen.get(kind_naam, {}), **kind_data}
+            kinderen[kind_naam] = kind_data
+        data["kinderen"] = kinderen
+        for section in SECTIONS:
+            if section != "rooster" and section in partial:
+                data[section] = {**self.data.get(section, {}), **partial[section]}
+        return data
+
+    @callback
+    def async_on_shutdown(self, listener):
+        """Roep `listener` aan als de coordinator stopt (entry herladen of verwijderd); geeft de afmelding."""
+        self._shutdown_listeners.append(listener)
+
+        @callback
+        def remove():
+            if listener in self._shutdown_listeners:
+                self._shutdown_listeners.remove(listener)
+
+        return remove
+
+    async def async_shutdown(self):
+        for listener in list(self._shutdown_listeners):
+            listener()
+        self._shutdown_listeners.clear()
+        self._section_debouncer.async_cancel()
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+        if self._statistics_task is not None:
+            self._statistics_task.cancel()
+        if self.history is not None:
+            if self._history_task is not None:
+                await asyncio.wait([self._history_task])
+            await self.hass.async_add_executor_job(self.history.close)
+        await super().async_shutdown()
+
+    @property
+    def view(self) -> SnapshotView:
+        """View op de huidige snapshot; bij elke nieuwe snapshot een nieuwe."""
+        if self._view is None or self._view_source is not self.data:
+            self._view = SnapshotView(self.data, self.grades)
+            self._view_source = self.data
+        return self._view
+
+    async def async_get_bijlage(self, key):
+        """
+        (pad, metadata) van een bijlage uit de huidige snapshot, of None als
+        hij er niet in staat. Eerst uit de cache; anders wordt hij gedownload.
+        """
+        found = self.view.bijlage(key)
+        if found is None or self.attachments is None:
+            return None
+        _, _, bijlage = found
+        key = bijlage_key(bijlage)
+        if cached := await self.hass.async_add_executor_job(self.attachments.lookup, key):
+            return cached
+        async with self._download_lock:
+            # Intussen misschien al door een ander verzoek opgehaald
+            if cached := await self.hass.async_add_executor_job(self.attachments.lookup, key):
+                return cached
+            result = await self.hass.async_add_executor_job(
+                self.api.download, bijlage.href, self.attachments.directory
+            )
+            return await self.hass.async_add_executor_job(
+                self.attachments.add, key, result, bijlage.naam, bijlage.content_type
+            )
+
+    def _adapt_interval(self, data):
+        """Volgende poll: dicht rond schooltijd, zelden 's nachts, in het weekend en de vakantie."""
+        if self._carry_over:
+            # Het restant zo snel mogelijk ophalen
+            self.update_interval = self._min_interval
+            return
+        days = school_days(
+            (kind_data.get("afspraken", []) for kind_data in (data.get("kinderen") or {}).values()),
+            dt_util.get_default_time_zone(),
+        )
+        self.update_interval = next_interval(dt_util.now(), days, self._min_interval, self._max_interval)
+        _LOGGER.debug("Volgende Magister poll over %s", self.update_interval)
+
+    def _save_archive(self):
+        if self._archive_store:
+            self._archive_store.async_delay_save(self._archive.as_json, 30)
+
+    def _merge_archive(self, data):
+        """Nieuwe cijfers in het archief; de snapshot krijgt alle cijfers uit het archief."""
+        for kind_naam, kind_data in (data.get("kinderen") or {}).items():
+            self._archive.set_kind_id(kind_naam, kind_data.get("id"))
+        changed = False
+        for kind_naam, cijfers in (data.get("cijfers") or {}).items():
+            changed |= bool(self._archive.merge(kind_naam, cijfers))
+            data["cijfers"][kind_naam] = self._archive.cijfers(kind_naam)
+        if changed:
+            self._save_archive()
+
+    def _merge_inbox(self, data):
+        """
+        Nieuwe berichten in de inbox, met een event per bericht; de snapshot
+        krijgt alle bewaarde berichten. De eerste synchronisatie is de
+        nulmeting en levert geen events op.
+        """
+        if (berichten := data.get("berichten")) is None:
+            return
+        if "items" not in berichten:
+            # Niet opgehaald (tijdsbudget op): bewaarde berichten en telling houden
+            data["berichten"] = {"ongelezen": self.inbox.ongelezen, "items": self.inbox.berichten()}
+            return
+        baseline = self.inbox.cursor is None
+        # Eerst de leesstatus van de bewaarde berichten; net opgehaalde
+        # berichten brengen hun eigen (nieuwere) status mee
+        changed = False
+        if (ids := berichten.get("ongelezen_ids")) is not None:
+            changed = self.inbox.set_ongelezen(ids)
+        nieuw = self.inbox.merge(berichten.get("items") or [])
+        changed = changed or bool(nieuw) or self.inbox.ongelezen != berichten.get("ongelezen")
+        self.inbox.ongelezen = berichten.get("ongelezen")
+        data["berichten"] = {"ongelezen": self.inbox.ongelezen, "items": self.inbox.berichten()}
+        if changed:
+            self._save_inbox()
+        if baseline:
+            return
+        for bericht in nieuw:
+            self.hass.bus.async_fire(
+                EVENT_NEW_MESSAGE, {k: v for k, v in bericht.as_dict().items() if k != "inhoud"}
+            )
+
+    def _save_inbox(self):
+        if self._inbox_store:
+            self._inbox_store.async_delay_save(self.inbox.as_json, 30)
+
+    async def async_get_bericht(self, bericht_id):
+        """Een bewaard bericht met inhoud (die pas nu opgehaald wordt), of None."""
+        bericht = self.inbox.get(bericht_id) if self.inbox else None
+        if bericht is None:
+            return None
+        if bericht.inhoud is None:
+            bericht = await self.hass.async_add_executor_job(self.api.get_bericht, bericht_id)
+            self.inbox.set_inhoud(bericht)
+            self._save_inbox()
+        return bericht
+
+    async def async_set_huiswerk_afgerond(self, afspraak_id, afgerond=True):
+        """
+        Markeer het huiswerk van een afspraak als (niet) afgerond.
+
+        De snapshot en de sensors worden direct bijgewerkt, nog voor Magister
+        antwoordt; mislukt het verzoek, dan wordt dat teruggedraaid (tenzij er
+        intussen een nieuwe snapshot is). Geeft de afspraak, of None als hij
+        niet in deze snapshot staat.
+        """
+        for kind_naam, kind_data in (self.data or {}).get("kinderen", {}).items():
+            origineel = next((a for a in kind_data.get("afspraken") or [] if a.id == afspraak_id), None)
+            if origineel is not None:
+                break
+        else:
+            return None
+
+        optimistisch = self._with_afspraak(kind_naam, replace(origineel, is_afgerond=afgerond))
+        self.async_set_updated_data(optimistisch)
+        try:
+            afspraak = await self.hass.async_add_executor_job(
+                self.api.set_huiswerk_afgerond, kind_data.get("id"), afspraak_id, afgerond
+            )
+        except Exception:
+            # Een poll van intussen heeft de echte stand al; die niet overschrijven
+            if self.data is optimistisch:
+                self.async_set_updated_data(self._with_afspraak(kind_naam, origineel))
+            raise
+        self.async_set_updated_data(self._with_afspraak(kind_naam, afspraak))
+        return afspraak
+
+    def _with_afspraak(self, kind_naam, afspraak):
+        """Nieuwe snapshot met één afspraak vervangen en de huiswerk-tellingen opnieuw geteld."""
+        kind_data = dict(self.data["kinderen"].get(kind_naam, {}))
+        kind_data["afspraken"] = [
+            afspraak if a.id == afspraak.id else a for a in kind_data.get("afspraken") or []
+        ]
+        kind_data.update(huiswerk_counts(kind_data["afspraken"]))
+        return {**self.data, "kinderen": {**self.data["kinderen"], kind_naam: kind_data}}
+
+    @callback
+    def _schedule_backfill(self):
+        if self._backfill_task is not None and not self._backfill_task.done():
+            return
+        todo = [naam for naam in self._archive.kind_ids() if not self._archive.backfilled(naam)]
+        if todo:
+            self._backfill_task = self.hass.async_create_background_task(
+                self._async_backfill(todo), "magister_cijfers_backfill"
+            )
+
+    async def _async_backfill(self, todo):
+        """
+        Haal eenmalig alle cijfers van het schooljaar op, pagina voor pagina.
+
+        Elke pagina is een los worker-verzoek, zodat polls ertussendoor kunnen.
+        Aangevulde cijfers zijn oud: daar gaan geen events voor uit.
+        """
+        start = schooljaar_start()
+        kind_ids = self._archive.kind_ids()
+        updated = {}
+        for kind_naam in todo:
+            added = []
+            skip = 0
+            for _ in range(BACKFILL_MAX_PAGES):
+                try:
+                    page = await self.hass.async_add_executor_job(
+                        self.api.get_cijfers, kind_ids[kind_naam], BACKFILL_PAGE, skip
+                    )
+                except Exception as err:
+                    # Volgende poll opnieuw proberen
+                    _LOGGER.warning("Cijferarchief aanvullen voor %s mislukt: %s", kind_naam, err)
+                    return
+                added += self._archive.merge(kind_naam, page)
+                if len(page) < BACKFILL_PAGE or (page[-1].ingevoerd_op or "") < start:
+                    break
+                skip += BACKFILL_PAGE
+
+            self._archive.set_backfilled(kind_naam)
+            self._save_archive()
+            _LOGGER.debug("Cijferarchief %s aangevuld met %d cijfers", kind_naam, len(added))
+            if added:
+                self._changes.extend_baseline(EVENT_NEW_GRADE, kind_naam, added)
+                updated[kind_naam] = self._archive.cijfers(kind_naam)
+
+        if updated and self.data:
+            data = {**self.data, "cijfers": {**self.data.get("cijfers", {}), **updated}}
+            self._ingest_grades(data)
+            self.async_set_updated_data(data)
+
+    def _ingest_grades(self, data):
+        """Nieuwe cijfers in de GradeStore per kind opnemen."""
+        for kind_naam, cijfers in (data.get("cijfers") or {}).items():
+            if (store := self.grades.get(kind_naam)) is None:
+                store = self.grades[kind_naam] = GradeStore()
+            store.ingest(cijfers)
+
+    def _fire_change_events(self, data):
+        """Stuur een event per nieuw cijfer, uitval, wijziging, opdracht of absentie."""
+        changes = self._changes.diff(data)
+        for event_type, event_data in changes:
+            self.hass.bus.async_fire(event_type, event_data)
+        if changes:
+            _LOGGER.debug("%d Magister wijzigingen gemeld", len(changes))
@@ -0,0 +1,320 @@
+"""Cijfer-analyse: lopende gewogen gemiddelden per vak en per periode.
+
+Per kind houdt een `GradeStore` bij welke cijfers al verwerkt zijn. Alleen
+nieuwe (of gecorrigeerde) cijfers worden opgenomen en elk cijfer kost O(1):
+het past een paar lopende sommen aan in plaats van alle gemiddelden opnieuw
+uit te rekenen. Periodes zijn kalendermaanden ('YYYY-MM') van `ingevoerd_op`.
+
+Geen Home Assistant imports.
+"""
+from datetime import date
+
+from .changes import record_key
+from .records import Cijfer
+
+
+def parse_waarde(waarde):
+    """
+    Magister cijfer -> float, of None voor niet-numerieke resultaten.
+
+    '7,5' en '7.5' worden 7.5; 'V', 'G', 'O', '-' en lege waarden tellen niet mee.
+    """
+    if isinstance(waarde, bool):
+        return None
+    if isinstance(waarde, (int, float)):
+        return float(waarde)
+    if not isinstance(waarde, str):
+        return None
+    text = waarde.strip().rstrip("*").replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_weegfactor(weegfactor):
+    """Weegfactor -> float; ontbreekt hij, dan telt het cijfer één keer."""
+    if weegfactor in (None, ""):
+        return 1.0
+    factor = parse_waarde(weegfactor)
+    return factor if factor is not None and factor >= 0 else 1.0
+
+
+def _datum(value):
+    """Een echte datum, of "" voor een ontbrekende ('?', None)."""
+    return "" if not value or value == "?" else value
+
+
+def _gecorrigeerd(oud, nieuw):
+    """Zelfde cijfer (kolom), maar door de docent aangepast."""
+    return (oud.waarde, oud.weegfactor, oud.vak) != (nieuw.waarde, nieuw.weegfactor, nieuw.vak)
+
+
+class RunningAverage:
+    """Gewogen gemiddelde als lopende som; toevoegen is O(1)."""
+
+    __slots__ = ("som", "gewicht", "aantal")
+
+    def __init__(self):
+        self.som = 0.0
+        self.gewicht = 0.0
+        self.aantal = 0
+
+    def add(self, waarde, weegfactor):
+        self.som += waarde * weegfactor
+        self.gewicht += weegfactor
+        self.aantal += 1
+
+    def remove(self, waarde, weegfactor):
+        self.som -= waarde * weegfactor
+        self.gewicht -= weegfactor
+        self.aantal -= 1
+        if not self.aantal:
+            # geen afrondingsresten laten staan
+            self.som = self.gewicht = 0.0
+
+    @property
+    def gemiddelde(self):
+        return round(self.som / self.gewicht, 2) if self.gewicht else None
+
+
+class VakStats:
+    """Alles wat per vak bijgehouden wordt."""
+
+    __slots__ = ("totaal", "periodes", "vorig_gemiddelde", "laatste", "laatste_op", "niet_numeriek")
+
+    def __init__(self):
+        self.totaal = RunningAverage()
+        self.periodes = {}
+        # Gemiddelde vóór het laatste cijfer, voor de trend
+        self.vorig_gemiddelde = None
+        self.laatste = None
+        self.laatste_op = ""
+        self.niet_numeriek = 0
+
+    @property
+    def trend(self):
+        """Verschil met het gemiddelde vóór het laatste cijfer."""
+        if self.vorig_gemiddelde is None or self.totaal.gemiddelde is None:
+            return None
+        return round(self.totaal.gemiddelde - self.vorig_gemiddelde, 2)
+
+    def as_dict(self):
+        return {
+            "gemiddelde": self.totaal.gemiddelde,
+            "aantal": self.totaal.aantal,
+            "weging": round(self.totaal.gewicht, 2),
+            "trend": self.trend,
+            "laatste": self.laatste,
+            "niet_numeriek": self.niet_numeriek,
+            "per_periode": {p: avg.gemiddelde for p, avg in sorted(self.periodes.items())},
+        }
+
+
+class GradeStore:
+    """Cijfers van één kind, incrementeel verwerkt."""
+
+    def __init__(self):
+        # record_key -> verwerkt cijfer
+        self._seen = {}
+        self.vakken = {}
+        self.totaal = RunningAverage()
+
+    def __len__(self):
+        return len(self._seen)
+
+    def ingest(self, cijfers):
+        """
+        Verwerk nieuwe cijfers en cijfers die de docent gecorrigeerd heeft
+        (zelfde kolom, andere waarde, weging of vak); geeft die terug (oud -> nieuw).
+        """
+        verwerkt = []
+        for cijfer in sorted(cijfers, key=lambda c: _datum(c.ingevoerd_op)):
+            key = record_key(cijfer)
+            oud = self._seen.get(key)
+            if oud is not None:
+                if not _gecorrigeerd(oud, cijfer):
+                    continue
+                self._remove(oud)
+            self._seen[key] = cijfer
+            self._add(cijfer)
+            verwerkt.append(cijfer)
+        return verwerkt
+
+    def _add(self, cijfer):
+        stats = self.vakken.get(cijfer.vak)
+        if stats is None:
+            stats = self.vakken[cijfer.vak] = VakStats()
+
+        waarde = parse_waarde(cijfer.waarde)
+        if waarde is None:
+            stats.niet_numeriek += 1
+            return
+        weegfactor = parse_weegfactor(cijfer.weegfactor)
+
+        # Oudere cijfers (uit het aanvullen van het archief) veranderen de trend niet
+        ingevoerd_op = _datum(cijfer.ingevoerd_op)
+        if ingevoerd_op >= stats.laatste_op:
+            stats.vorig_gemiddelde = stats.totaal.gemiddelde
+            stats.laatste = waarde
+            stats.laatste_op = ingevoerd_op
+        stats.totaal.add(waarde, weegfactor)
+        periode = ingevoerd_op[:7] or "onbekend"
+        if (avg := stats.periodes.get(periode)) is None:
+            avg = stats.periodes[periode] = RunningAverage()
+        avg.add(waarde, weegfactor)
+        self.totaal.add(waarde, weegfactor)
+
+    def _remove(self, cijfer):
+        """Haal een eerder verwerkt cijfer uit de sommen (voor een correctie)."""
+        stats = self.vakken[cijfer.vak]
+        waarde = parse_waarde(cijfer.waarde)
+        if waarde is None:
+            stats.niet_numeriek -= 1
+            return
+        weegfactor = parse_weegfactor(cijfer.weegfactor)
+        stats.totaal.remove(waarde, weegfactor)
+        periode = _datum(cijfer.ingevoerd_op)[:7] or "onbekend"
+        stats.periodes[periode].remove(waarde, weegfactor)
+        if not stats.periodes[periode].aantal:
+            del stats.periodes[periode]
+        self.totaal.remove(waarde, weegfactor)
+
+    def analytics(self):
+        """Compacte samenvatting: totaalgemiddelde en per vak gemiddelde/aantal/trend."""
+        return {
+            "gemiddelde": self.totaal.gemiddelde,
+            "aantal": self.totaal.aantal,
+            "vakken": {
+                vak: {
+                    "gemiddelde": stats.totaal.gemiddelde,
+                    "aantal": stats.totaal.aantal,
+                    "trend": stats.trend,
+                }
+                for vak, stats in sorted(self.vakken.items())
+            },
+        }
+
+
+def gemiddelde_reeks(cijfers):
+    """
+    Verloop van het lopende gewogen gemiddelde, per uur waarin cijfers
+    ingevoerd zijn: {vak: [(uur, gemiddelde), ...]}, oud -> nieuw, met
+    onder vak None het gemiddelde over alle vakken. `uur` is 'YYYY-MM-DD HH'.
+    """
+    reeksen = {}
+    for cijfer in sorted(cijfers, key=lambda c: c.ingevoerd_op or ""):
+        waarde = parse_waarde(cijfer.waarde)
+        uur = (cijfer.ingevoerd_op or "")[:13]
+        if waarde is None or len(uur) != 13:
+            continue
+        weegfactor = parse_weegfactor(cijfer.weegfactor)
+        for vak in (cijfer.vak, None):
+            avg, punten = reeksen.setdefault(vak, (RunningAverage(), []))
+            avg.add(waarde, weegfactor)
+            if punten and punten[-1][0] == uur:
+                punten[-1] = (uur, avg.gemiddelde)
+            else:
+                punten.append((uur, avg.gemiddelde))
+    return {vak: punten for vak, (_, punten) in reeksen.items()}
+
+
+def schooljaar_start(today=None):
+    """1 augustus van het lopende schooljaar, als 'YYYY-MM-DD'."""
+    today = today or date.today()
+    year = today.year if today.month >= 8 else today.year - 1
+    return f"{year}-08-01"
+
+
+class GradeArchive:
+    """
+    Alle cijfers per kind, op sleutel (kolomId), plus een cursor.
+
+    De cursor is de `ingevoerd_op` van het nieuwste bekende cijfer; een poll
+    haalt alleen cijfers vanaf dat moment op. `backfilled` geeft aan of het
+    hele schooljaar al eens (gepagineerd) is opgehaald.
+    """
+
+    def __init__(self):
+        self._kinderen = {}
+
+    def _kind(self, kind_naam):
+        if (kind := self._kinderen.get(kind_naam)) is None:
+            kind = self._kinderen[kind_naam] = {"id": None, "cijfers": {}, "cursor": None, "backfilled": False}
+        return kind
+
+    def set_kind_id(self, kind_naam, kind_id):
+        self._kind(kind_naam)["id"] = kind_id
+
+    def kind_ids(self):
+        """{kind_naam: kind_id} van alle kinderen met een bekend id."""
+        return {naam: kind["id"] for naam, kind in self._kinderen.items() if kind["id"] is not None}
+
+    def cursors(self):
+        """{kind_id (str): cursor}, zoals collect() ze verwacht."""
+        return {
+            str(kind["id"]): kind["cursor"]
+            for kind in self._kinderen.values()
+            if kind["id"] is not None and kind["cursor"]
+        }
+
+    def cursor(self, kind_naam):
+        kind = self._kinderen.get(kind_naam)
+        return kind["cursor"] if kind else None
+
+    def backfilled(self, kind_naam):
+        kind = self._kinderen.get(kind_naam)
+        return bool(kind and kind["backfilled"])
+
+    def set_backfilled(self, kind_naam):
+        self._kind(kind_naam)["backfilled"] = True
+
+    def merge(self, kind_naam, cijfers):
+        """Voeg cijfers toe (nieuwe of bijgewerkte); geeft de nieuwe terug."""
+        kind = self._kind(kind_naam)
+        nieuw = []
+        for cijfer in cijfers:
+            key = str(record_key(cijfer))
+            if key not in kind["cijfers"]:
+                nieuw.append(cijfer)
+            kind["cijfers"][key] = cijfer
+            # Zonder datum ("?" uit datum()) niet: "?" sorteert na elke datum
+            ingevoerd_op = _datum(cijfer.ingevoerd_op)
+            if ingevoerd_op and (kind["cursor"] is None or ingevoerd_op > kind["cursor"]):
+                kind["cursor"] = ingevoerd_op
+        return nieuw
+
+    def cijfers(self, kind_naam):
+        """Alle cijfers van een kind, nieuwste eerst (zoals cijfers/laatste)."""
+        kind = self._kinderen.get(kind_naam)
+        if not kind:
+            return []
+        return sorted(kind["cijfers"].values(), key=lambda c: c.ingevoerd_op or "", reverse=True)
+
+    def as_json(self):
+        return {
+            "kinderen": {
+                naam: {
+                    "id": kind["id"],
+                    "cursor": kind["cursor"],
+                    "backfilled": kind["backfilled"],
+                    "cijfers": [c.as_dict() for c in kind["cijfers"].values()],
+                }
+                for naam, kind in self._kinderen.items()
+            }
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        archive = cls()
+        for naam, kind in ((data or {}).get("kinderen") or {}).items():
+            archive._kinderen[naam] = {
+                "id": kind.get("id"),
+                "cursor": _datum(kind.get("cursor")) or None,
+                "backfilled": bool(kind.get("backfilled")),
+                "cijfers": {
+                    str(record_key(c)): c
+                    for c in (Cijfer.from_dict(item) for item in kind.get("cijfers") or [])
+                },
+            }
+        return archive
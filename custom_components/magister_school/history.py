@@ -0,0 +1,226 @@
+"""Lokale historie van afspraken, wijzigingen, cijfers, absenties en opdrachten.
+
+Wat uit het ophaalvenster valt (rooster van twee weken, absenties van een
+jaar, ...) blijft hier bewaard. Per onderdeel één SQLite-tabel met een rij
+per record (upsert op kind + sleutel), geïndexeerd op kind, datum en vak.
+Zonder bruikbare datum is de datum NULL; zulke rijen komen achteraan en
+worden niet opgeruimd. Van de inhoud (huiswerk, omschrijving van een
+wijziging) wordt alleen het begin bewaard. Rijen ouder dan `retention_days`
+worden eens per dag opgeruimd.
+
+Alle methodes zijn blokkerend (executor).
+
+Geen Home Assistant imports.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from .changes import record_key
+
+# 0: nooit opruimen
+DEFAULT_HISTORY_DAYS = 5 * 365
+
+# Zo vaak wordt er opgeruimd
+PURGE_INTERVAL = 24 * 3600
+
+DEFAULT_QUERY_LIMIT = 100
+
+# Zoveel tekens van de inhoud worden bewaard
+SNIPPET_SIZE = 200
+
+# 1: datum NULL in plaats van "?" of "" (versie 0 had datum NOT NULL)
+SCHEMA_VERSION = 1
+
+# Onderdeel -> (datumveld, vakveld of None)
+TABLES = {
+    "afspraken": ("start", "vak"),
+    "wijzigingen": ("start", None),
+    "cijfers": ("ingevoerd_op", "vak"),
+    "absenties": ("start", None),
+    "opdrachten": ("inleveren_voor", "vak"),
+}
+
+# In de snapshot per kind (snapshot["kinderen"][naam]) in plaats van per onderdeel
+KIND_TABLES = ("afspraken", "wijzigingen")
+
+
+def _rows(snapshot, now):
+    """(tabel, rij) voor alle records in de snapshot die bewaard worden."""
+    for naam, kind_data in (snapshot.get("kinderen") or {}).items():
+        for table in KIND_TABLES:
+            for record in kind_data.get(table) or []:
+                yield table, _row(table, naam, record, now)
+    for table in TABLES:
+        if table in KIND_TABLES:
+            continue
+        for naam, records in (snapshot.get(table) or {}).items():
+            for record in records:
+                yield table, _row(table, naam, record, now)
+
+
+def _row(table, naam, record, now):
+    datum_veld, vak_veld = TABLES[table]
+    data = record.as_dict()
+    if data.get("inhoud"):
+        data["inhoud"] = _snippet(data["inhoud"])
+    datum = data.get(datum_veld)
+    return (
+        naam,
+        json.dumps(record_key(record), default=str),
+        datum if datum and datum != "?" else None,
+        data.get(vak_veld) if vak_veld else None,
+        json.dumps(data, ensure_ascii=False, default=str),
+        now,
+    )
+
+
+class History:
+    """SQLite-bestand met een tabel per onderdeel (zie TABLES)."""
+
+    def __init__(self, path, retention_days=DEFAULT_HISTORY_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn = None
+        self._purged_at = None
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.execute("BEGIN")
+        for table, (_, vak_veld) in TABLES.items():
+            oud = version < SCHEMA_VERSION and conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            if oud:
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_oud")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " kind TEXT NOT NULL, sleutel TEXT NOT NULL, datum TEXT, vak TEXT,"
+                " data TEXT NOT NULL, bijgewerkt REAL NOT NULL,"
+                " PRIMARY KEY (kind, sleutel))"
+            )
+            if oud:
+                # De indexen gaan met de oude tabel mee weg en komen hieronder terug
+                conn.execute(
+                    f"INSERT INTO {table} SELECT kind, sleutel, NULLIF(NULLIF(datum, '?'), ''), vak, data, bijgewerkt"
+                    f" FROM {table}_oud"
+                )
+                conn.execute(f"DROP TABLE {table}_oud")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_datum ON {table} (kind, datum)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_alle_datum ON {table} (datum)")
+            if vak_veld:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_vak ON {table} (kind, vak, datum)")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def store(self, snapshot):
+        """
+        Upsert alle records uit een snapshot; geeft het aantal nieuwe of
+        gewijzigde rijen. Ongewijzigde rijen worden niet herschreven.
+        """
+        now = time.time()
+        per_table = {}
+        for table, row in _rows(snapshot, now):
+            per_table.setdefault(table, []).append(row)
+        with self._lock:
+            conn = self._connect()
+            changed = conn.total_changes
+            with conn:
+                for table, rows in per_table.items():
+                    conn.executemany(
+                        f"INSERT INTO {table} (kind, sleutel, datum, vak, data, bijgewerkt)"
+                        " VALUES (?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (kind, sleutel) DO UPDATE SET"
+                        " datum = excluded.datum, vak = excluded.vak,"
+                        " data = excluded.data, bijgewerkt = excluded.bijgewerkt"
+                        " WHERE data != excluded.data",
+                        rows,
+                    )
+            changed = conn.total_changes - changed
+            if self._purged_at is None or now - self._purged_at >= PURGE_INTERVAL:
+                self._purge(conn, now)
+        return changed
+
+    def _purge(self, conn, now):
+        self._purged_at = now
+        if not self.retention_days:
+            return
+        grens = f"{date.today() - timedelta(days=self.retention_days):%Y-%m-%d}"
+        with conn:
+            for table in TABLES:
+                # zonder datum (NULL) niet opruimen
+                conn.execute(f"DELETE FROM {table} WHERE datum < ?", (grens,))
+
+    def query(self, table, kind=None, van=None, tot=None, vak=None, limit=DEFAULT_QUERY_LIMIT):
+        """
+        Records uit één tabel, nieuwste eerst (zonder datum achteraan), als
+        dicts met "kind" erbij; "inhoud" is ingekort tot SNIPPET_SIZE tekens.
+        `van` en `tot` zijn datums (YYYY-MM-DD, tot en met); `vak` alleen voor
+        tabellen met een vak.
+        """
+        if table not in TABLES:
+            raise ValueError(f"onbekend onderdeel: {table}")
+        where, params = [], []
+        if kind is not None:
+            where.append("kind = ?")
+            params.append(kind)
+        if vak is not None:
+            if TABLES[table][1] is None:
+                raise ValueError(f"{table} heeft geen vak")
+            where.append("vak = ?")
+            params.append(vak)
+        if van is not None:
+            where.append("datum >= ?")
+            params.append(str(van))
+        if tot is not None:
+            where.append("datum < ?")
+            params.append(f"{_parse_date(tot) + timedelta(days=1):%Y-%m-%d}")
+        sql = f"SELECT kind, data FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY datum DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+        return [{**json.loads(data), "kind": kind_naam} for kind_naam, data in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def remove(self):
+        """Verwijder de database (bij het verwijderen van de integratie)."""
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def _snippet(tekst):
+    """Begin van de inhoud, op één regel."""
+    plat = " ".join(tekst.split())
+    if len(plat) > SNIPPET_SIZE:
+        return plat[:SNIPPET_SIZE] + "…"
+    return plat
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
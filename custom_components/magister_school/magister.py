@@ -1,12 +1,27 @@
-#!/usr/bin/python3
+#!/usr/bin/python3 -P
+import sys
+import os
+if not __package__:
+    # Als script of los module ("python3 -P magister.py"): de zusjes (records, ...)
+    # als package laden, zonder __init__.py (dat Home Assistant importeert).
+    # De map zelf hoort niet vooraan op sys.path: calendar.py (HA platform)
+    # zou dan de stdlib 'calendar' overschaduwen, vandaar -P.
+    if __name__ == "__main__" and os.path.abspath(sys.path[0] or os.curdir) == os.path.dirname(os.path.abspath(__file__)):
+        sys.exit("Start met: python3 -P magister.py")
+    import types
+    if "magister_school" not in sys.modules:
+        _package = types.ModuleType("magister_school")
+        _package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules["magister_school"] = _package
+    __package__ = "magister_school"
 import re
 import urllib.request
 import urllib.parse
+import urllib.error
+import http.client
 import http.cookiejar
 from datetime import datetime, timezone, timedelta
 import json
-import sys
-import os
 import traceback
 from pathlib import Path
 import argparse
@@ -14,7 +29,18 @@ import hmac
 import hashlib
 import struct
 import time
+import socket
 import base64
+import io
+import codecs
+
+from .records import (
+    Aanmelding, Afspraak, Wijziging, Cijfer, Absentie, Opdracht,
+    Activiteit, Onderdeel, Studiewijzer, Bijlage, Bericht, ACCOUNT_SECTIONS, SECTIONS, json_default,
+    huiswerk_counts,
+)
+from .berichten import INBOX_SIZE
+from .schedule import DEFAULT_SCHEDULE_WEEKS
 
 
 def generate_totp(secret: str, digits: int = 6, period: int = 30) -> str:
@@ -111,6 +137,308 @@ def infotstr(t):
         pass
     return "??"
 
+# Errors of a kept-alive connection the server closed before responding.
+# RemoteDisconnected (a ConnectionResetError) means no status line at all.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+class KeepAliveHTTPSHandler(urllib.request.HTTPSHandler):
+    """
+    HTTPS handler that keeps one connection per host open.
+
+    urllib closes the connection after every request. For the long-lived
+    worker process that means a new TLS handshake per request; this handler
+    reuses the connection instead. Callers must read each response fully
+    (httpreq, reqitems and httpredirurl always do).
+
+    A request is only sent again when a reused connection turns out to be
+    closed by the server before any byte of the response arrived (see
+    STALE_CONNECTION_ERRORS): then the request cannot have been processed.
+    Timeouts and errors on a new connection are never retried, so a POST or
+    PUT is not submitted twice and the deadline of a request is not doubled.
+    """
+    def __init__(self, debuglevel=0):
+        super().__init__(debuglevel=debuglevel)
+        self.connections = {}
+
+    def https_open(self, req):
+        if req._tunnel_host:
+            # via een proxy: gewoon het standaard gedrag
+            return super().https_open(req)
+
+        headers = dict(req.unredirected_hdrs)
+        headers.update({k: v for k, v in req.headers.items() if k not in headers})
+        headers = {name.title(): val for name, val in headers.items()}
+
+        host = req.host
+        while True:
+            conn = self.connections.get(host)
+            # een socket van een vorig verzoek; None na "Connection: close"
+            reused = conn is not None and conn.sock is not None
+            if conn is None:
+                conn = http.client.HTTPSConnection(host, timeout=req.timeout, context=self._context)
+                conn.set_debuglevel(self._debuglevel)
+                self.connections[host] = conn
+            elif conn.timeout != req.timeout:
+                # hergebruikte verbinding: timeout van dit verzoek (deadline) toepassen
+                conn.timeout = req.timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(
+                        req.timeout if isinstance(req.timeout, (int, float)) else socket.getdefaulttimeout()
+                    )
+            try:
+                conn.request(req.get_method(), req.selector, req.data, headers)
+                r = conn.getresponse()
+                break
+            except (http.client.HTTPException, OSError) as err:
+                conn.close()
+                self.connections.pop(host, None)
+                if reused and isinstance(err, STALE_CONNECTION_ERRORS):
+                    # keep-alive verbinding intussen door de server gesloten:
+                    # opnieuw met een nieuwe (die dan niet meer hergebruikt is)
+                    continue
+                raise urllib.error.URLError(err)
+
+        r.url = req.get_full_url()
+        r.msg = r.reason
+        return r
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
+
+# Keys whose values never end up in a recording; in urls also the oauth 'code'
+SECRET_KEYS = re.compile(r"token|password|secret|authcode|code_verifier", re.I)
+# Keys with (signed) urls in JSON bodies: recorded without their query string
+URL_KEYS = re.compile(r"^location$", re.I)
+REDACTED = "REDACTED"
+
+def redact_json(obj):
+    """Copy of a JSON value with all secret-looking keys blanked."""
+    if isinstance(obj, dict):
+        return {k: _redact_value(k, v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [redact_json(v) for v in obj]
+    return obj
+
+def _redact_value(key, value):
+    if SECRET_KEYS.search(key):
+        return REDACTED
+    if URL_KEYS.search(key) and isinstance(value, str):
+        return redact_url(value, keep_query=False)
+    return redact_json(value)
+
+def redact_url(url, keep_query=True):
+    parts = urllib.parse.urlsplit(url)
+    query = ""
+    if keep_query:
+        query = urllib.parse.urlencode([
+            (k, REDACTED if SECRET_KEYS.search(k) or k == "code" else v)
+            for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        ])
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+class RecordedResponse:
+    """
+    Minimal stand-in for an http response: status, headers and read().
+    """
+    def __init__(self, status, content_type, body, url=None):
+        self.status = status
+        self.headers = http.client.HTTPMessage()
+        if content_type:
+            self.headers["Content-Type"] = content_type
+        self.url = url
+        self._body = io.BytesIO(body)
+
+    def read(self, size=-1):
+        return self._body.read(size)
+
+class Recorder:
+    """
+    Saves every response of a run in `directory`, one numbered JSON file per
+    request, for --replay. Login traffic (the hosts in `skip_hosts`) is not
+    saved; secrets in urls and JSON bodies are redacted, and urls of other
+    hosts (signed download locations) lose their query string.
+    """
+    def __init__(self, directory, school_host, skip_hosts=()):
+        self.directory = directory
+        self.school_host = school_host
+        self.skip_hosts = set(skip_hosts)
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, method, url, response):
+        host = urllib.parse.urlsplit(url).hostname
+        if host in self.skip_hosts:
+            return response
+        status = getattr(response, "status", None) or getattr(response, "code", 200)
+        ctype = response.headers.get("content-type", "")
+        body = response.read()
+        entry = {"method": method, "url": redact_url(url, keep_query=host == self.school_host),
+                 "status": status, "content_type": ctype, "recorded_at": datetime.now().isoformat()}
+        if "application/json" in ctype:
+            try:
+                entry["json"] = redact_json(json.loads(body))
+            except ValueError:
+                entry["base64"] = base64.b64encode(body).decode("ascii")
+        else:
+            entry["base64"] = base64.b64encode(body).decode("ascii")
+        self.count += 1
+        with open(os.path.join(self.directory, f"{self.count:04d}.json"), "w", encoding="utf-8") as fh:
+            json.dump(entry, fh, ensure_ascii=False, indent=1)
+        return RecordedResponse(status, ctype, body, url)
+
+class Replayer:
+    """
+    Serves the responses saved by Recorder, without network. A request is
+    matched on method, path and query; when the query differs (e.g. other
+    dates) the next recording of the same path is used. `now` is the time of
+    the recording: a replay runs "on" that day (see Magister.now).
+    """
+    def __init__(self, directory):
+        self.exact = {}
+        self.by_path = {}
+        self.now = None
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                entry = json.load(fh)
+            if self.now is None and entry.get("recorded_at"):
+                self.now = datetime.fromisoformat(entry["recorded_at"])
+            parts = urllib.parse.urlsplit(entry["url"])
+            self.exact.setdefault((entry["method"], parts.path, parts.query), []).append(entry)
+            self.by_path.setdefault((entry["method"], parts.path), []).append(entry)
+
+    def open(self, method, url):
+        parts = urllib.parse.urlsplit(redact_url(url))
+        for queue in (self.exact.get((method, parts.path, parts.query)), self.by_path.get((method, parts.path))):
+            if queue:
+                entry = queue[0]
+                if len(queue) > 1:
+                    # repeated requests get the next recording; the last one stays
+                    queue.pop(0)
+                break
+        else:
+            raise LookupError(f"no recorded response for {method} {parts.path}")
+        if "json" in entry:
+            body = json.dumps(entry["json"]).encode("utf-8")
+        else:
+            body = base64.b64decode(entry.get("base64", ""))
+        return RecordedResponse(entry["status"], entry["content_type"], body, url)
+
+# Read size when decoding a response item by item
+STREAM_CHUNK = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+class JSONStream:
+    """
+    Incremental reader of the JSON text in a binary file, one value at a
+    time. Text that has been decoded is dropped, so at most one value plus
+    one chunk is held in memory.
+    """
+    def __init__(self, fh, chunk_size=STREAM_CHUNK):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """Read one more chunk; False when the file was already exhausted."""
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.chunk_size)
+        self.eof = not chunk
+        self.buf = self.buf[self.pos:] + self._utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, "" at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected):
+        """Consume the next character, which must be one of `expected`."""
+        ch = self.peek()
+        if not ch or ch not in expected:
+            raise ValueError(f"JSON: expected one of {expected!r}, got {ch!r}")
+        self.pos += 1
+        return ch
+
+    def _complete(self, end):
+        """True when a delimiter follows the value that ends at `end`."""
+        i = _WHITESPACE.match(self.buf, end).end()
+        return i < len(self.buf) and self.buf[i] in ",]}:"
+
+    def value(self):
+        """Decode the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if not self.eof and not self._complete(end):
+                # een getal aan het eind van de buffer kan nog doorlopen ("1." -> "1.5")
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+def iter_json_items(fh, key="Items", chunk_size=STREAM_CHUNK):
+    """
+    Yield the elements of the top-level `key` array of the JSON object in
+    binary file `fh` one at a time, while reading it. Other top-level values
+    are decoded and dropped. Yields nothing when the document is not an
+    object (or has no `key`), like .get("Items", []) on a parsed response.
+    """
+    stream = JSONStream(fh, chunk_size)
+    if stream.peek() != "{":
+        return
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        name = stream.value()
+        stream.take(":")
+        if name == key and stream.peek() == "[":
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.take("]")
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.take(",]") == "]":
+                        break
+        else:
+            stream.value()
+        if stream.take(",}") == "}":
+            return
+
+class DeadlineExceeded(Exception):
+    """The time budget of the current collect() run is used up."""
+
+def is_timeout(err):
+    """A socket timeout, also when urllib wrapped it in a URLError."""
+    if isinstance(err, urllib.error.URLError) and not isinstance(err, urllib.error.HTTPError):
+        err = err.reason
+    return isinstance(err, (socket.timeout, TimeoutError))
+
+# Non-standard cookie attributes kept in the saved session
+COOKIE_ATTRS = ("HttpOnly", "SameSite")
+
 class Magister:
     """
     object encapsulating all magister functionality.
@@ -121,11 +449,37 @@ class Magister:
         self.access_token = args.accesstoken
         self.magisterserver = args.magisterserver
         self.schoolserver = args.schoolserver
+        self.token_expires = token_expiry(self.access_token) if self.access_token else None
         self.cj = http.cookiejar.CookieJar()
+        self.authorize_url = None
         handlers = [urllib.request.HTTPCookieProcessor(self.cj)]
-        if args.debug:
+        if getattr(args, "keepalive", False):
+            handlers.append(KeepAliveHTTPSHandler(debuglevel=1 if args.debug else 0))
+        elif args.debug:
             handlers.append(urllib.request.HTTPSHandler(debuglevel=1))
         self.opener = urllib.request.build_opener(*handlers)
+        # time.monotonic() deadline for all requests of the current run, or None
+        self.deadline = None
+        # Rolling afspraken/wijzigingen cache; lives as long as this object
+        self.schedule_cache = ScheduleCache()
+        # Eerste verzoek na een account uit de cache controleert het token (zie _check_auth)
+        self.verify_auth = False
+        # --record / --replay
+        self.recorder = None
+        self.replayer = None
+        if getattr(args, "record", None):
+            self.recorder = Recorder(args.record, self.schoolserver, skip_hosts=(self.magisterserver,))
+        if getattr(args, "replay", None):
+            self.replayer = Replayer(args.replay)
+
+    def now(self):
+        """The current local time; when replaying, the time of the recording."""
+        if self.replayer is not None and self.replayer.now is not None:
+            return self.replayer.now
+        return datetime.now()
+
+    def deadline_passed(self, slack=0):
+        return self.deadline is not None and time.monotonic() >= self.deadline - slack
 
     def logprint(self, *args):
         # In JSON-modus altijd stil zijn; en alleen loggen als debug True.
@@ -140,47 +494,81 @@ class Magister:
             safe_args.append(arg)
         print(*safe_args)
 
-    def httpreq(self, url, data=None):
+    def httpreq(self, url, data=None, method=None):
         """
         Generic http request function.
-        Does a http-POST when the 'data' argument is present.
+        Does a http-POST when the 'data' argument is present, unless another
+        `method` (e.g. PUT) is given.
 
         Adds the nesecesary xsrf and auth headers.
         """
+        response = self.httpopen(url, data, method=method)
+        raw = response.read()
+        ctype = response.headers.get("content-type", "")
+        if "application/json" in ctype:
+            js = json.loads(raw)
+            # alleen loggen als debug én niet json-uitvoer
+            if getattr(self.args, "debug", False) and not getattr(self.args, "json", False):
+                self.logprint(js)
+                self.logprint()
+            return js
+        # niet-json content
+        if getattr(self.args, "debug", False) and not getattr(self.args, "json", False):
+            self.logprint(raw)
+            self.logprint()
+        return raw
+
+    def httpopen(self, url, data=None, auth=True, method=None):
+        """
+        Open url and return the (unread) response, for httpreq and streaming.
+        Without `auth` no xsrf/auth headers are sent (e.g. to a file store).
+        """
         self.logprint(">", url)
+        method = method or ("POST" if data else "GET")
+        if self.replayer is not None:
+            return self.replayer.open(method, url)
         hdrs = { }
         if data and type(data)==str:
             data = data.encode('utf-8')
         if data and data[:1] in (b'{', b'['):
             hdrs["Content-Type"] = "application/json"
-        if self.xsrftoken:
+        if auth and self.xsrftoken:
             hdrs["X-XSRF-TOKEN"] = self.xsrftoken
-        if self.access_token:
+        if auth and self.access_token:
             hdrs['Authorization'] = 'Bearer ' + self.access_token
-        req = urllib.request.Request(url, headers=hdrs)
+        req = urllib.request.Request(url, headers=hdrs, method=method)
         kwargs = dict()
         if data:
             kwargs["data"] = data
+        if self.deadline is not None:
+            # per verzoek: niet langer wachten dan het resterende budget
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(url)
+            kwargs["timeout"] = remaining
         try:
             response = self.opener.open(req, **kwargs)
         except urllib.error.HTTPError as e:
             self.logprint("!", str(e))
             response = e
+        if self.recorder is not None:
+            response = self.recorder.record(method, url, response)
+        if auth and self.access_token:
+            self._check_auth(url, response)
+        return response
 
-        raw = response.read()
-        ctype = response.headers.get("content-type", "")
-        if "application/json" in ctype:
-            js = json.loads(raw)
-            # alleen loggen als debug én niet json-uitvoer
-            if getattr(self.args, "debug", False) and not getattr(self.args, "json", False):
-                self.logprint(js)
-                self.logprint()
-            return js
-        # niet-json content
-        if getattr(self.args, "debug", False) and not getattr(self.args, "json", False):
-            self.logprint(raw)
-            self.logprint()
-        return raw
+    def _check_auth(self, url, response):
+        """
+        Raise LoginError for a rejected token: on a 401, and on a 403 for the
+        first request after the account info came from the cache (instead of
+        the account request that used to reject an expired token). Later
+        403s are not a login problem: a student account gets one on the
+        kinderen list.
+        """
+        status = getattr(response, "status", None)
+        first, self.verify_auth = self.verify_auth, False
+        if status == 401 or (first and status == 403):
+            raise LoginError(f"HTTP {status}: {url}")
 
     def extractxsrf(self):
         """
@@ -255,6 +643,73 @@ class Magister:
                 cfg[key] = value;
         return cfg
 
+    def load_session(self, path):
+        """
+        Load the persisted accounts-host session (authorize url + cookies).
+        """
+        try:
+            with open(path, "r") as fh:
+                session = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return False
+        self.authorize_url = session.get("authorize_url")
+        for c in session.get("cookies", []):
+            domain = c["domain"]
+            self.cj.set_cookie(http.cookiejar.Cookie(
+                0, c["name"], c["value"], None, False,
+                domain, domain.startswith('.'), domain.startswith('.'),
+                c.get("path", "/"), True, c.get("secure", True), c.get("expires"),
+                c.get("expires") is None, None, None, c.get("rest") or {},
+            ))
+        return bool(self.authorize_url)
+
+    def save_session(self, path):
+        """
+        Persist the accounts-host cookies, so a next run can log in silently.
+        Only cookies for the magister accounts server are stored, file mode 0600.
+        """
+        if not self.authorize_url:
+            return
+        cookies = [
+            dict(name=c.name, value=c.value, domain=c.domain, path=c.path,
+                 secure=c.secure, expires=c.expires,
+                 rest={a: c.get_nonstandard_attr(a) for a in COOKIE_ATTRS if c.has_nonstandard_attr(a)})
+            for c in self.cj
+            if c.domain.lstrip('.') == self.magisterserver
+        ]
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # de mode van os.open geldt alleen voor een nieuw bestand
+        os.chmod(path, 0o600)
+        with os.fdopen(fd, "w") as fh:
+            json.dump(dict(authorize_url=self.authorize_url, cookies=cookies), fh)
+
+    def silent_login(self):
+        """
+        Obtain a new access token without credentials, using the session cookies
+        of accounts.magister.net and a 'prompt=none' authorize request.
+        """
+        if not self.authorize_url:
+            return False
+
+        self.logprint("\n---- silent auth ----")
+        try:
+            url, _ = self.httpredirurl(self.authorize_url + "&prompt=none")
+        except Exception as e:
+            self.logprint("!", str(e))
+            self.cj.clear()
+            return False
+
+        d = urllib.parse.parse_qs(url.split('#', 1)[1]) if '#' in url else {}
+        if "access_token" not in d:
+            # meestal error=login_required: sessie verlopen
+            self.logprint("silent auth failed:", d.get("error"))
+            # verlopen cookies niet meenemen in de volledige login
+            self.cj.clear()
+            return False
+
+        self.access_token = d["access_token"][0]
+        return True
+
     def login(self, username, password):
         """
         Authenticate to the magister server using username and password.
@@ -284,7 +739,8 @@ class Magister:
         self.logprint("\n---- auth ----")
 
         # sets the XSRF-TOKEN cookie
-        sessionurl, html = self.httpredirurl(openidcfg["authorization_endpoint"] + "?" + urllib.parse.urlencode(params))
+        self.authorize_url = openidcfg["authorization_endpoint"] + "?" + urllib.parse.urlencode(params)
+        sessionurl, html = self.httpredirurl(self.authorize_url)
 
         self.xsrftoken = self.extractxsrf()
         if self.args.verbose and not getattr(self.args, "json", False):
@@ -389,6 +845,34 @@ class Magister:
         Generic 'school' request method, converts and concats all argments automatically.
         With the last argument optionally a dict, when a querystring is needed.
         """
+        return self.httpreq(self.requrl(*args))
+
+    def reqitems(self, *args):
+        """
+        Like req(), but yields the "Items" of the response one at a time,
+        decoded while the body comes in (see iter_json_items), so a large
+        list is never held in memory as a whole.
+        """
+        url = self.requrl(*args)
+        if getattr(self.args, "debug", False) and not getattr(self.args, "json", False):
+            # debug logt de hele response: dan gewoon in één keer
+            js = self.httpreq(url)
+            yield from js.get("Items", []) if isinstance(js, dict) else []
+            return
+        response = self.httpopen(url)
+        try:
+            if "application/json" in response.headers.get("content-type", ""):
+                yield from iter_json_items(response)
+        finally:
+            # keep-alive: ook na een fout of afgebroken iteratie de body uitlezen
+            try:
+                while response.read(STREAM_CHUNK):
+                    pass
+            except (OSError, http.client.HTTPException):
+                pass
+
+    def requrl(self, *args):
+        """The url for req() / reqitems() arguments."""
         tag = []
         for v in args:
             if type(v)==str and re.match(r'^[a-z]+$', v):
@@ -403,7 +887,7 @@ class Magister:
             qs = "?" + urllib.parse.urlencode(querydict)
 
         path = "/".join(str(_) for _ in args)
-        return self.httpreq(f"https://{self.schoolserver}/api/{path}{qs}")
+        return f"https://{self.schoolserver}/api/{path}{qs}"
 
     def getlink(self, link):
         """
@@ -453,11 +937,10 @@ def apply_auth_config(cfg, args):
         return
     args.accesstoken = cfg.get('root', 'accesstoken')
 
-def store_access_token(cache: str, token: str) -> None:
-    import base64
-    import json
-    from datetime import datetime, timezone, timedelta
-
+def token_expiry(token: str) -> datetime:
+    """
+    Return the expiry time of a (JWT) access token, or one hour from now.
+    """
     now = datetime.now(timezone.utc)
 
     def base64url_decode(input):
@@ -480,11 +963,42 @@ def store_access_token(cache: str, token: str) -> None:
             exp = now + timedelta(hours=1)
     except Exception:
         exp = now + timedelta(hours=1)
+    return exp
 
+def store_access_token(cache: str, token: str) -> None:
+    exp = token_expiry(token)
     with open(cache, "w+") as fh:
         print(f"expires={exp:%Y-%m-%dT%H:%M:%SZ}", file=fh)
         print(f"accesstoken={token}", file=fh)
 
+def bepaal_lesperiode(items, target_date):
+    """
+    Find the lesperiode for target_date in the aanmeldingen items.
+    Returns (lesperiode, geldig_tot), geldig_tot is None for the fallback.
+    """
+    for meld in items:
+        if "Start" not in meld or "Eind" not in meld:
+            continue
+        try:
+            start_aanm = datetime.strptime(meld["Start"][:10], "%Y-%m-%d").date()
+            einde_aanm = datetime.strptime(meld["Eind"][:10], "%Y-%m-%d").date()
+        except Exception:
+            continue
+        if start_aanm <= target_date <= einde_aanm:
+            omschrijving = meld.get("Omschrijving", "")
+            if omschrijving:
+                return omschrijving.split()[0], meld["Eind"][:10]
+            # zonder omschrijving: de Lesperiode van de laatste aanmelding, zoals vroeger
+            break
+
+    if items:
+        return items[-1].get("Lesperiode"), None
+    return None, None
+
+# Velden die we van kinderen en aanmeldingen in de metadata-cache bewaren
+KIND_FIELDS = ("Id", "Roepnaam", "Achternaam", "Geboortedatum", "Stamnummer")
+AANMELDING_FIELDS = ("Start", "Einde", "Eind", "Lesperiode", "Studie", "Omschrijving")
+
 def safe_datum_field(item, *keys):
     """Return first found datum from item for given keys (passes through datum())."""
     for k in keys:
@@ -493,13 +1007,228 @@ def safe_datum_field(item, *keys):
             return datum(v)
     return "?"
     
-def main():
+def afspraak_record(item):
+    return Afspraak(
+        start=datum(item.get("Start") or item.get("Datum")),
+        einde=datum(item.get("Einde") or item.get("Eind")),
+        type=infotstr(item.get("InfoType", 0)),
+        lokaal=item.get("Lokatie", ""),
+        omschrijving=item.get("Omschrijving", ""),
+        inhoud=dehtml(item.get("Inhoud", "")),
+        vak=item.get("Vak", ""),
+        is_huiswerk=item.get("InfoType", 0) == 1,
+        is_uitval=item.get("Status") == 5,
+        id=item.get("Id"),
+        is_afgerond=bool(item.get("Afgerond")),
+    )
+
+def wijziging_record(item):
+    return Wijziging(
+        start=safe_datum_field(item, "Start", "Datum"),
+        einde=safe_datum_field(item, "Eind", "Einde"),
+        type=infotstr(item.get("InfoType", 0)),
+        lokaal=item.get("Lokatie", ""),
+        omschrijving=item.get("Omschrijving", ""),
+        inhoud=dehtml(item.get("Inhoud", "")),
+        id=item.get("Id"),
+    )
+
+# Page size for the list of kinderen / leerlingen
+KINDEREN_PAGE = 100
+
+def fetch_kinderen(mg, ouderid, page=KINDEREN_PAGE):
+    """
+    All kinderen of the account, page by page; {"Items": [...]}, or the
+    error response (with "Fouttype") for a student account.
+    """
+    items = []
+    seen = set()
+    skip = 0
+    while True:
+        k = mg.req("personen", ouderid, "kinderen", dict(top=page, skip=skip))
+        if k.get("Fouttype"):
+            return k
+        batch = [item for item in k.get("Items", []) if item.get("Id") not in seen]
+        seen.update(item.get("Id") for item in batch)
+        items += batch
+        # Kleiner dan een pagina, of de server negeert top/skip (niets nieuws)
+        if len(k.get("Items", [])) < page or not batch:
+            return {"Items": items}
+        skip += page
+
+def fetch_aanmeldingen(mg, kindid):
+    """
+    Fetch the aanmeldingen, trimmed to the fields kept in the metadata cache.
+    """
+    x = mg.req("personen", kindid, "aanmeldingen")
+    return {"Items": [
+        {key: item[key] for key in AANMELDING_FIELDS if key in item}
+        for item in x.get("Items", [])
+    ]}
+
+def fetch_schedule(mg, kindid, van, tot, lesperiode=None):
+    """
+    Fetch afspraken and roosterwijzigingen for [van, tot] as records.
+    """
+    params = dict(van=van, tot=tot)
+    if lesperiode:
+        params["lesperiode"] = lesperiode
+
+    afspraken = [afspraak_record(item) for item in mg.reqitems("personen", kindid, "afspraken", params)]
+    wijzigingen = [wijziging_record(item) for item in mg.reqitems("personen", kindid, "roosterwijzigingen", params)]
+    return afspraken, wijzigingen
+
+# Schedule cache refresh policy: (days ahead, max age in seconds) of a day
+# bucket. Today and tomorrow are refreshed on every run, later days less
+# often; days beyond the last entry at most once a day.
+SCHEDULE_MAX_AGE = ((2, 0), (7, 3600), (14, 6 * 3600))
+SCHEDULE_FAR_MAX_AGE = 24 * 3600
+
+class ScheduleCache:
+    """
+    Afspraken and wijzigingen per kind, in day buckets.
+
+    Each run only fetches the days whose bucket is older than their max age
+    (see SCHEDULE_MAX_AGE); adjacent stale days share one request. Days that
+    slide out of the window are dropped, new days at the far end are simply
+    missing and fetched in the next run. So a longer horizon costs one extra
+    request per far range now and then, not more traffic per poll.
+    """
+    def __init__(self):
+        # kindid -> {date: (fetched_at, afspraken, wijzigingen)}
+        self._kinderen = {}
+
+    @staticmethod
+    def max_age(offset):
+        for days, age in SCHEDULE_MAX_AGE:
+            if offset < days:
+                return age
+        return SCHEDULE_FAR_MAX_AGE
+
+    def stale_runs(self, kindid, days, now=None):
+        """
+        Drop buckets outside `days` and return the stale days as
+        consecutive runs [(first, last), ...].
+        """
+        now = time.monotonic() if now is None else now
+        buckets = self._kinderen.setdefault(str(kindid), {})
+        for day in set(buckets) - set(days):
+            del buckets[day]
+
+        runs = []
+        for offset, day in enumerate(days):
+            bucket = buckets.get(day)
+            if bucket is not None and now - bucket[0] < self.max_age(offset):
+                continue
+            if runs and runs[-1][1] == day - timedelta(days=1):
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+        return runs
+
+    def store(self, kindid, first, last, afspraken, wijzigingen, now=None):
+        """Replace the buckets first..last with freshly fetched records."""
+        now = time.monotonic() if now is None else now
+        fresh = {}
+        day = first
+        while day <= last:
+            fresh[day] = (now, [], [])
+            day += timedelta(days=1)
+        for index, records in ((1, afspraken), (2, wijzigingen)):
+            for record in records:
+                try:
+                    day = datetime.strptime(record.start[:10], "%Y-%m-%d").date()
+                except ValueError:
+                    # zonder bruikbare start: bij de eerste dag van de range
+                    day = first
+                if day in fresh:
+                    fresh[day][index].append(record)
+        self._kinderen.setdefault(str(kindid), {}).update(fresh)
+
+    def update(self, kindid, afspraak):
+        """Replace one cached afspraak (same id), e.g. after marking its homework done."""
+        for bucket in self._kinderen.get(str(kindid), {}).values():
+            bucket[1][:] = [afspraak if a.id == afspraak.id else a for a in bucket[1]]
+
+    def window(self, kindid, days):
+        """(afspraken, wijzigingen) over `days`, in order."""
+        buckets = self._kinderen.get(str(kindid), {})
+        afspraken, wijzigingen = [], []
+        for day in days:
+            if bucket := buckets.get(day):
+                afspraken.extend(bucket[1])
+                wijzigingen.extend(bucket[2])
+        return afspraken, wijzigingen
+
+def cijfer_record(item):
+    return Cijfer(
+        vak=item.get("vak", {}).get("code", ""),
+        omschrijving=item.get("omschrijving", ""),
+        waarde=item.get("waarde", ""),
+        weegfactor=item.get("weegfactor", ""),
+        ingevoerd_op=datum(item.get("ingevoerdOp")),
+        id=item.get("kolomId"),
+    )
+
+def fetch_cijfers(mg, kindid, top=50, skip=0):
+    """
+    One page of grades, newest first.
+    """
+    c = mg.req("personen", kindid, "cijfers", "laatste", dict(top=top, skip=skip))
+    return [cijfer_record(item) for item in c.get("items", [])]
+
+# Maximum aantal pagina's per cijfers_since; meer nieuwe cijfers komen bij de volgende poll
+CIJFERS_SINCE_MAX_PAGES = 20
+
+def cijfers_since(mg, kindid, cursor, page=10, max_pages=CIJFERS_SINCE_MAX_PAGES):
+    """
+    Grades entered at or after `cursor` (an ingevoerd_op value).
+    Pages through the newest-first list until an older grade shows up, so
+    a poll without new grades costs one small request. Stops after
+    `max_pages` pages, or when a page repeats the previous one (an endpoint
+    that ignores skip).
+    """
+    result = []
+    previous = None
+    for number in range(max_pages):
+        items = fetch_cijfers(mg, kindid, top=page, skip=number * page)
+        if items == previous:
+            break
+        for cijfer in items:
+            if cijfer.ingevoerd_op and cijfer.ingevoerd_op < cursor:
+                return result
+            result.append(cijfer)
+        if len(items) < page:
+            return result
+        previous = items
+    return result
+
+def schedule_range(mg, metadata, kindid, van, tot):
+    """
+    Afspraken and wijzigingen for an arbitrary date range (e.g. the calendar
+    looking beyond the regular two-week window).
+    """
+    x = (metadata.get("aanmeldingen") or {}).get(str(kindid))
+    if x is None:
+        x = fetch_aanmeldingen(mg, kindid)
+    target_date = datetime.strptime(van, "%Y-%m-%d").date()
+    lesperiode, _ = bepaal_lesperiode(x.get("Items", []), target_date)
+    afspraken, wijzigingen = fetch_schedule(mg, kindid, van, tot, lesperiode)
+    return {"van": van, "tot": tot, "afspraken": afspraken, "wijzigingen": wijzigingen}
+
+def make_parser():
     parser = argparse.ArgumentParser(description='Magister info dump')
     parser.add_argument('--debug', '-d', action='store_true', help=argparse.SUPPRESS)
     parser.add_argument('--json', action='store_true', help='output as JSON only')
     parser.add_argument('--config', help=argparse.SUPPRESS)
     parser.add_argument('--cache', help=argparse.SUPPRESS)
+    parser.add_argument('--session', help=argparse.SUPPRESS)
+    parser.add_argument('--check', action='store_true', help='only verify the login, print token and account info')
+    parser.add_argument('--metadata', help=argparse.SUPPRESS)
+    parser.add_argument('--keepalive', action='store_true', help=argparse.SUPPRESS)
     parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--record', metavar='DIR', help='save all API responses of this run in DIR (secrets redacted)')
+    parser.add_argument('--replay', metavar='DIR', help='serve API responses from a --record DIR, without network')
 
     # 'internal' options.
     parser.add_argument('--xsrftoken', help=argparse.SUPPRESS)
@@ -510,8 +1239,12 @@ def main():
     parser.add_argument('--totp-secret', dest='totp_secret', default=None, help=argparse.SUPPRESS)
     parser.add_argument('--schoolserver', help=argparse.SUPPRESS)
     parser.add_argument('--magisterserver', default='accounts.magister.net', help=argparse.SUPPRESS)
-    args = parser.parse_args()
+    return parser
 
+def prepare_args(args):
+    """
+    Fill in `args` from .magisterrc and the access token cache.
+    """
     if not args.config:
         script_dir = Path(__file__).parent
         local_config = script_dir / ".magisterrc"
@@ -555,241 +1288,540 @@ def main():
             if not args.json:
                 print(f"cache: {e}")
 
-    mg = Magister(args)
+class LoginError(Exception):
+    """
+    Raised when the account info can not be retrieved with the current token.
+    """
 
-    if not args.accesstoken:
-        if not mg.login(args.username, args.password):
-            if not args.json:
-                print("Login failed")
-            return
-        if not mg.access_token or mg.access_token == "":
+def authenticate(mg, args, silent=True):
+    """
+    Obtain a new access token: silently with the saved accounts session
+    when possible, otherwise with username, password and (optional) TOTP.
+    """
+    mg.access_token = None
+    if not silent:
+        # een lopende accounts-sessie zou de challenges overslaan
+        mg.cj.clear()
+    elif not mg.authorize_url and args.session:
+        mg.load_session(args.session)
+
+    # Eerst stil via de bewaarde accounts-sessie, pas daarna volledig inloggen
+    if silent and mg.silent_login():
+        if args.verbose and not args.json:
+            print("-> silent login via session cookies")
+    elif not mg.login(args.username, args.password):
+        if not args.json:
+            print("Login failed")
+        return False
+    if not mg.access_token or mg.access_token == "":
+        if not args.json:
+            print("Login appeared to succeed, but no access token was received.")
+        return False
+    mg.token_expires = token_expiry(mg.access_token)
+    store_access_token(args.cache, mg.access_token)
+    if args.session:
+        try:
+            mg.save_session(args.session)
+        except OSError as e:
             if not args.json:
-                print("Login appeared to succeed, but no access token was received.")
-            return
-        store_access_token(args.cache, mg.access_token)
+                print(f"session: {e}")
+    return True
+
+def get_account(mg, args, metadata):
+    """
+    Return the account info, from the metadata when already known.
+    """
+    d = metadata.get("account")
+    if d:
+        mg.verify_auth = True
+    else:
+        d = mg.req("account")
+    
+    # Check if account request was successful
+    if not isinstance(d, dict) or "Persoon" not in d:
+        if not args.json:
+            print(f"ERROR: Could not get account info. Response: {d}")
+        raise LoginError("Could not get account info")
+    return d
+
+def check_info(mg, d):
+    """
+    Result of a credential check: token, its expiry and the account info.
+    """
+    return {
+        "access_token": mg.access_token,
+        "expires": f"{token_expiry(mg.access_token):%Y-%m-%dT%H:%M:%SZ}",
+        "account": d,
+    }
+
+# Fetch order within a run: what matters most today first, the expensive
+# studiewijzers (one request per studiewijzer) last
+FETCH_ORDER = ("rooster", "cijfers", "berichten", "opdrachten", "absenties", "activiteiten", "studiewijzers")
 
+def collect(mg, args, metadata, cijfer_cursors=None, sections=None, budget=None, priority=None,
+            schedule_weeks=None, berichten_cursor=None, kind_ids=None, max_kinderen=None):
+    """
+    Fetch all data for all kinderen of the account.
+
+    `metadata` holds the static account info of a previous run (account,
+    kinderen, aanmeldingen, lesperiodes); the refreshed version is returned
+    in output_data["metadata"].
+
+    `cijfer_cursors` maps a kind id (as string) to the ingevoerd_op of the
+    newest grade already known; for those kinderen only newer grades are
+    fetched instead of the latest 50.
+
+    `sections` limits the fetch to a subset of SECTIONS; the output then
+    only has those sections and lists them in output_data["sections"].
+
+    With `budget` (seconds) the run stops starting new requests once the
+    budget is used up, and each request waits at most for the remaining
+    time. Sections are fetched in FETCH_ORDER, with the sections in
+    `priority` (e.g. the carry-over of the previous run) first. Whatever
+    was done is returned; sections that did not (completely) fit are
+    listed in output_data["carry_over"] and left out of "sections".
+
+    The rooster covers `schedule_weeks` weeks from today, served from the
+    Magister object's ScheduleCache (see collect_rooster).
+
+    Only the kinderen in `kind_ids` are fetched (a shard of a large
+    account); without `kind_ids` all of them, unless there are more than
+    `max_kinderen`: then none, only the list (output_data["metadata"]) and
+    output_data["aantal_kinderen"].
+
+    "berichten" is per account: output_data["berichten"] has the unread
+    count, the ids of the unread messages (see fetch_ongelezen_ids) and the
+    inbox messages newer than `berichten_cursor` (see berichten_since), or
+    the first page when there is no cursor yet.
+    """
+    cijfer_cursors = cijfer_cursors or {}
+    want = set(sections or SECTIONS)
     # JSON output voor Home Assistant
     output_data = {
         "last_update": datetime.now().isoformat(),
+        "sections": [],
+        "carry_over": [],
         "kinderen": {},
-        "cijfers": {},
-        "absenties": {},
-        "opdrachten": {},
-        "studiewijzers": {},
-        "activiteiten": {}
+        **{s: {} for s in SECTIONS if s != "rooster" and s in want},
     }
 
-    d = mg.req("account")
-    
-    # Check if account request was successful
-    if not isinstance(d, dict) or "Persoon" not in d:
-        if not args.json:
-            print(f"ERROR: Could not get account info. Response: {d}")
-        sys.exit(1)
+    d = get_account(mg, args, metadata)
     
     ouderid = d["Persoon"]["Id"]
-    
-    # Try to get children - will fail for student accounts
-    try:
-        k = mg.req("personen", ouderid, "kinderen")
-    except Exception as e:
-        # If request fails completely, treat as student account
-        k = {"Fouttype": "OnvoldoendePrivileges"}
-
-    # Check if student account (gets permission error)
-    if k.get('Fouttype'):
-        # Student account - use own ID as "kind"
-        kinderen = [{
-            "Id": d["Persoon"]["Id"],
-            "Roepnaam": d["Persoon"].get("Roepnaam", ""),
-            "Achternaam": d["Persoon"].get("Achternaam", ""),
-            "Geboortedatum": d["Persoon"].get("Geboortedatum", ""),
-            "Stamnummer": d["Persoon"].get("Stamnummer", "")
-        }]
+
+    # Statische gegevens uit de metadata-cache; alleen ophalen wat ontbreekt
+    kinderen = metadata.get("kinderen")
+    aanmeldingen_cache = metadata.get("aanmeldingen") or {}
+    lesperiodes = metadata.get("lesperiodes") or {}
+
+    if kinderen is None:
+        # Try to get children - will fail for student accounts
+        # Een 403 hier betekent een leerlingaccount, geen verlopen token
+        mg.verify_auth = False
+        try:
+            k = fetch_kinderen(mg, ouderid)
+        except LoginError:
+            raise
+        except Exception as e:
+            # If request fails completely, treat as student account
+            k = {"Fouttype": "OnvoldoendePrivileges"}
+
+        # Check if student account (gets permission error)
+        if k.get('Fouttype'):
+            # Student account - use own ID as "kind"
+            kinderen = [{
+                "Id": d["Persoon"]["Id"],
+                "Roepnaam": d["Persoon"].get("Roepnaam", ""),
+                "Achternaam": d["Persoon"].get("Achternaam", ""),
+                "Geboortedatum": d["Persoon"].get("Geboortedatum", ""),
+                "Stamnummer": d["Persoon"].get("Stamnummer", "")
+            }]
+        else:
+            # Parent account - use children list
+            kinderen = [
+                {key: kind.get(key) for key in KIND_FIELDS}
+                for kind in k.get("Items", [])
+            ]
+
+    output_data["metadata"] = {
+        "account": d,
+        "kinderen": kinderen,
+        "aanmeldingen": aanmeldingen_cache,
+        "lesperiodes": lesperiodes,
+    }
+
+    output_data["aantal_kinderen"] = len(kinderen)
+    if kind_ids is not None:
+        wanted = {str(i) for i in kind_ids}
+        selected = [kind for kind in kinderen if str(kind["Id"]) in wanted]
+    elif max_kinderen is not None and len(kinderen) > max_kinderen:
+        # Te veel om elke poll allemaal op te halen: alleen de lijst, tot er een keuze is
+        selected = []
     else:
-        # Parent account - use children list
-        kinderen = k.get("Items", [])
+        selected = kinderen
 
-    for kind in kinderen:
+    # (kind_naam, kindid, kind_data, aanmeldingen) per kind
+    plan = []
+    for kind in selected:
         kind_naam = f"{kind.get('Roepnaam', '')} {kind.get('Achternaam', '')}"
+        kindid = kind["Id"]
         kind_data = {
+            "id": kindid,
             "naam": kind_naam,
             "stamnummer": kind.get('Stamnummer', ''),
             "geboortedatum": kind.get('Geboortedatum', '')
         }
-        kindid = kind["Id"]
 
-        # Aanmeldingen
-        x = mg.req("personen", kindid, "aanmeldingen")
+        # Aanmeldingen (statisch gedurende het schooljaar -> uit de cache)
+        x = aanmeldingen_cache.get(str(kindid))
+        if x is None:
+            x = aanmeldingen_cache[str(kindid)] = fetch_aanmeldingen(mg, kindid)
         kind_data["aanmeldingen"] = [
-            {
-                "start": datum(item.get("Start")),
-                "einde": datum(item.get("Einde")),
-                "lesperiode": item.get("Lesperiode"),
-                "studie": item.get("Studie", {}).get("Omschrijving", "") if item.get("Studie") else ""
-            }
+            Aanmelding(
+                start=datum(item.get("Start")),
+                einde=datum(item.get("Einde")),
+                lesperiode=item.get("Lesperiode"),
+                studie=item.get("Studie", {}).get("Omschrijving", "") if item.get("Studie") else "",
+            )
             for item in x.get("Items", [])
         ]
 
-        # Rooster data: determine lesperiode as before
-        start_date = deltaymd()
-        end_date = deltaymd(weeks=+2)
-
-        params = dict(van=start_date, tot=end_date)
-        target_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-        lesperiode = None
+        output_data["kinderen"][kind_naam] = kind_data
+        plan.append((kind_naam, kindid, kind_data, x))
+
+    def fetch(section, kind_naam=None, kindid=None, kind_data=None, x=None):
+        if section == "berichten":
+            ongelezen = fetch_ongelezen(mg)
+            output_data["berichten"] = {
+                "ongelezen": ongelezen,
+                # Alles gelezen: geen lijst nodig
+                "ongelezen_ids": fetch_ongelezen_ids(mg) if ongelezen else ([] if ongelezen == 0 else None),
+                "items": berichten_since(mg, berichten_cursor) if berichten_cursor else fetch_berichten(mg),
+            }
+        elif section == "rooster":
+            kind_data.update(collect_rooster(mg, kindid, x, lesperiodes, schedule_weeks or DEFAULT_SCHEDULE_WEEKS))
+        elif section == "cijfers":
+            # Cijfers: alleen nieuwe als de aanroeper al een archief heeft
+            if cursor := cijfer_cursors.get(str(kindid)):
+                output_data["cijfers"][kind_naam] = cijfers_since(mg, kindid, cursor)
+            else:
+                output_data["cijfers"][kind_naam] = fetch_cijfers(mg, kindid)
+        elif section == "absenties":
+            output_data["absenties"][kind_naam] = fetch_absenties(mg, kindid)
+        elif section == "opdrachten":
+            output_data["opdrachten"][kind_naam] = fetch_opdrachten(mg, kindid)
+        elif section == "activiteiten":
+            output_data["activiteiten"][kind_naam] = fetch_activiteiten(mg, kindid)
+        elif section == "studiewijzers":
+            output_data["studiewijzers"][kind_naam] = fetch_studiewijzers(mg, kindid)
+
+    priority = [p for p in priority or () if p in want]
+    order = priority + [p for p in FETCH_ORDER if p in want and p not in priority]
+
+    mg.deadline = time.monotonic() + budget if budget else None
+    try:
+        for section in order:
+            complete = True
+            for task in ([()] if section in ACCOUNT_SECTIONS else plan):
+                if mg.deadline_passed():
+                    complete = False
+                    break
+                try:
+                    fetch(section, *task)
+                except DeadlineExceeded:
+                    # Alleen een verlopen budget is geen fout: later verder.
+                    complete = False
+                    break
+                except (socket.timeout, TimeoutError, urllib.error.URLError) as err:
+                    # Een socket-timeout valt (bijna) samen met de deadline;
+                    # andere fouten (login, HTTP, parsen) gaan gewoon door.
+                    if not is_timeout(err) or not mg.deadline_passed(slack=1):
+                        raise
+                    complete = False
+                    break
+            output_data["sections" if complete else "carry_over"].append(section)
+    finally:
+        mg.deadline = None
+        mg.verify_auth = False
+
+    return output_data
+
+def collect_rooster(mg, kindid, x, lesperiodes, weeks=DEFAULT_SCHEDULE_WEEKS):
+    """
+    `weeks` of afspraken and wijzigingen plus the derived counts, as a dict
+    to merge into the kind's data. `x` are the kind's aanmeldingen,
+    `lesperiodes` the metadata cache. Only the stale days of mg.schedule_cache
+    are fetched.
+    """
+    kind_data = {}
+    now = mg.now()
+    today = now.date()
+    days = [today + timedelta(days=offset) for offset in range(weeks * 7)]
+    # Rooster data: determine lesperiode as before
+    start_date = f"{today:%Y-%m-%d}"
+    end_date = f"{days[-1] + timedelta(days=1):%Y-%m-%d}"
+
+    kind_data["rooster_van"] = start_date
+    kind_data["rooster_tot"] = end_date
+    target_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+
+    cached = lesperiodes.get(str(kindid))
+    if cached and cached.get("tot") and start_date <= cached["tot"]:
+        lesperiode = cached.get("code")
+    else:
+        lesperiode, geldig_tot = bepaal_lesperiode(x.get("Items", []), target_date)
+        lesperiodes[str(kindid)] = {"code": lesperiode, "tot": geldig_tot}
 
-        for meld in x.get("Items", []):
-            if "Start" not in meld or "Eind" not in meld:
-                continue
-            try:
-                start_aanm = datetime.strptime(meld["Start"][:10], "%Y-%m-%d").date()
-                einde_aanm = datetime.strptime(meld["Eind"][:10], "%Y-%m-%d").date()
-            except Exception:
-                continue
-            if start_aanm <= target_date <= einde_aanm:
-                omschrijving = meld.get("Omschrijving", "")
-                lesperiode = omschrijving.split()[0] if omschrijving else None
-                break
+    cache = mg.schedule_cache
+    for first, last in cache.stale_runs(kindid, days):
+        afspraken, wijzigingen = fetch_schedule(
+            mg, kindid, f"{first:%Y-%m-%d}", f"{last + timedelta(days=1):%Y-%m-%d}", lesperiode
+        )
+        cache.store(kindid, first, last, afspraken, wijzigingen)
+    kind_data["afspraken"], kind_data["wijzigingen"] = cache.window(kindid, days)
+
+    # Tel statistieken
+    vandaag = now.strftime('%Y-%m-%d')
+    kind_data["aantal_afspraken_vandaag"] = len([
+        a for a in kind_data["afspraken"]
+        if a.start.startswith(vandaag)
+    ])
+    kind_data.update(huiswerk_counts(kind_data["afspraken"]))
+    kind_data["aantal_uitval"] = len([
+        a for a in kind_data["afspraken"]
+        if a.is_uitval
+    ])
+
+    # Volgende afspraak
+    toekomstige_afspraken = [
+        a for a in kind_data["afspraken"]
+        if a.start > now.strftime('%Y-%m-%d %H:%M:%S')
+    ]
+    if toekomstige_afspraken:
+        volgende = min(toekomstige_afspraken, key=lambda x: x.start)
+        kind_data["volgende_afspraak"] = volgende.start
+        kind_data["volgende_vak"] = volgende.vak or ""
+    else:
+        kind_data["volgende_afspraak"] = "Geen"
+        kind_data["volgende_vak"] = ""
+    return kind_data
+
+def bijlage_record(item):
+    href = next(
+        (link.get("Href") for link in item.get("Links") or [] if link.get("Rel") == "Contents"),
+        None,
+    )
+    return Bijlage(
+        naam=item.get("Naam", ""),
+        content_type=item.get("ContentType", ""),
+        grootte=item.get("Grootte"),
+        href=href,
+        id=item.get("Id"),
+    )
+
+def bijlage_location(mg, href):
+    """
+    The signed storage url of the attachment at `href` (a Bijlage.href), to
+    be downloaded without Magister credentials. The file itself never goes
+    through here: ValueError when Magister does not answer with a location.
+    """
+    url = f"https://{mg.schoolserver}{href}"
+    # Magister answers with the storage location instead of a redirect
+    response = mg.httpopen(url + ("&" if "?" in url else "?") + "redirect_type=body")
+    status = getattr(response, "status", 200)
+    if status >= 400 or "application/json" not in response.headers.get("content-type", ""):
+        # keep-alive: de body niet half laten staan
+        while response.read(STREAM_CHUNK):
+            pass
+        raise ValueError(f"no storage location for {href} (HTTP {status})")
+    location = json.loads(response.read()) or {}
+    location = location.get("location") or location.get("Location")
+    if not location:
+        raise ValueError(f"no location for {href}")
+    return location
+
+def bericht_record(item, inhoud=None):
+    return Bericht(
+        onderwerp=item.get("onderwerp", ""),
+        afzender=(item.get("afzender") or {}).get("naam", ""),
+        verzonden_op=datum(item.get("verzondenOp")),
+        is_gelezen=bool(item.get("isGelezen")),
+        heeft_bijlagen=bool(item.get("heeftBijlagen")),
+        inhoud=inhoud,
+        id=item.get("id"),
+    )
+
+def fetch_berichten(mg, top=25, skip=0):
+    """
+    One page of the inbox (postvak in), newest first, without bodies.
+    """
+    b = mg.req("berichten", "postvakin", "berichten", dict(top=top, skip=skip))
+    return [bericht_record(item) for item in b.get("items", [])]
 
-        if not lesperiode and x.get("Items"):
-            last = x["Items"][-1]
-            lesperiode = last.get("Lesperiode")
-
-        if lesperiode:
-            params["lesperiode"] = lesperiode
-
-        afspraken = mg.req("personen", kindid, "afspraken", params)
-        wijzigingen = mg.req("personen", kindid, "roosterwijzigingen", params)
-
-        kind_data["afspraken"] = [
-            {
-                "start": datum(item.get("Start") or item.get("Datum")),
-                "einde": datum(item.get("Einde") or item.get("Eind")),
-                "type": infotstr(item.get("InfoType", 0)),
-                "lokaal": item.get("Lokatie", ""),
-                "omschrijving": item.get("Omschrijving", ""),
-                "inhoud": dehtml(item.get("Inhoud", "")),
-                "vak": item.get("Vak", ""),
-                "is_huiswerk": item.get("InfoType", 0) == 1,
-                "is_uitval": item.get("Status") == 5
-            }
-            for item in afspraken.get("Items", [])
-        ]
+def berichten_since(mg, cursor, page=10, max_pages=10):
+    """
+    Inbox messages newer than `cursor` ({"id", "verzonden_op"} of the newest
+    message already seen). Pages through the newest-first inbox until a
+    known message shows up, so a poll without new mail is one small request.
+    """
+    def is_new(bericht):
+        if bericht.id is not None and cursor.get("id") is not None:
+            return bericht.id > cursor["id"]
+        return bericht.verzonden_op > (cursor.get("verzonden_op") or "")
+
+    result = []
+    for skip in range(0, page * max_pages, page):
+        items = fetch_berichten(mg, top=page, skip=skip)
+        for bericht in items:
+            if not is_new(bericht):
+                return result
+            result.append(bericht)
+        if len(items) < page:
+            break
+    return result
+
+def fetch_ongelezen(mg):
+    """
+    Number of unread messages in the inbox, from the folder list; None if
+    the inbox folder is not there.
+    """
+    mappen = mg.req("berichten", "mappen", "alle")
+    counts = [
+        m.get("aantalOngelezen") or 0
+        for m in mappen.get("items", [])
+        if (m.get("naam") or "").lower() == "postvak in"
+    ]
+    return sum(counts) if counts else None
+
+def fetch_ongelezen_ids(mg, top=INBOX_SIZE):
+    """
+    Ids of the newest unread inbox messages, to refresh the read state of
+    messages fetched earlier. Only items that say they are unread count, so
+    this holds whether or not the server applies the filter.
+    """
+    b = mg.req("berichten", "postvakin", "berichten", dict(top=top, skip=0, gelezenStatus="ongelezen"))
+    return [item.get("id") for item in b.get("items", []) if not item.get("isGelezen")]
 
-        kind_data["wijzigingen"] = [
-            {
-                "start": safe_datum_field(item, "Start", "Datum"),
-                "einde": safe_datum_field(item, "Eind", "Einde"),
-                "type": infotstr(item.get("InfoType", 0)),
-                "lokaal": item.get("Lokatie", ""),
-                "omschrijving": item.get("Omschrijving", ""),
-                "inhoud": dehtml(item.get("Inhoud", ""))
-            }
-            for item in wijzigingen.get("Items", [])
-        ]
+def fetch_bericht(mg, berichtid):
+    """
+    One message including its body, converted to text with dehtml().
+    """
+    item = mg.req("berichten", "berichten", berichtid)
+    return bericht_record(item, inhoud=dehtml(item.get("inhoud") or ""))
 
-        # Tel statistieken
-        vandaag = datetime.now().strftime('%Y-%m-%d')
-        kind_data["aantal_afspraken_vandaag"] = len([
-            a for a in kind_data["afspraken"]
-            if a["start"].startswith(vandaag)
-        ])
-        kind_data["aantal_huiswerk"] = len([
-            a for a in kind_data["afspraken"]
-            if a["is_huiswerk"]
-        ])
-        kind_data["aantal_uitval"] = len([
-            a for a in kind_data["afspraken"]
-            if a["is_uitval"]
-        ])
+def markeer_huiswerk(mg, kindid, afspraakid, afgerond=True):
+    """
+    Mark the homework of an afspraak as done (or not done) in Magister and
+    return the updated record. Magister expects the whole afspraak back, so
+    it is fetched first. The schedule cache gets the new state as well.
+    """
+    item = mg.req("personen", kindid, "afspraken", afspraakid)
+    if not isinstance(item, dict) or item.get("Id") is None:
+        raise ValueError(f"afspraak {afspraakid} not found")
+    item["Afgerond"] = bool(afgerond)
+    response = mg.httpopen(
+        mg.requrl("personen", kindid, "afspraken", afspraakid), json.dumps(item), method="PUT"
+    )
+    status = getattr(response, "status", None) or getattr(response, "code", 200)
+    response.read()
+    if status >= 400:
+        raise ValueError(f"marking afspraak {afspraakid} failed: HTTP {status}")
+    afspraak = afspraak_record(item)
+    mg.schedule_cache.update(kindid, afspraak)
+    return afspraak
+
+def fetch_absenties(mg, kindid):
+    abs_van = deltaymd(years=-1)
+    abs_tot = deltaymd(weeks=+1)
+    return [
+        Absentie(
+            start=datum(item.get("Start")),
+            einde=datum(item.get("Eind")),
+            omschrijving=item.get("Omschrijving", ""),
+            afspraak=item.get("Afspraak", {}).get("Omschrijving", ""),
+            id=item.get("Id"),
+        )
+        for item in mg.reqitems("personen", kindid, "absenties", dict(van=abs_van, tot=abs_tot))
+    ]
+
+def fetch_opdrachten(mg, kindid):
+    return [
+        Opdracht(
+            titel=item.get("Titel", ""),
+            vak=item.get("Vak", ""),
+            inleveren_voor=datum(item.get("InleverenVoor")),
+            ingeleverd_op=datum(item.get("IngeleverdOp")),
+            omschrijving=dehtml(item.get("Omschrijving", "")),
+            id=item.get("Id"),
+            bijlagen=[bijlage_record(b) for b in item.get("Bijlagen") or []],
+        )
+        for item in mg.reqitems("personen", kindid, "opdrachten")
+    ]
+
+def fetch_activiteiten(mg, kindid):
+    return [
+        Activiteit(
+            titel=item.get("Titel", ""),
+            zichtbaar_vanaf=datum(item.get("ZichtbaarVanaf")),
+            zichtbaar_tot=datum(item.get("ZichtbaarTotEnMet")),
+        )
+        for item in mg.reqitems("personen", kindid, "activiteiten")
+    ]
+
+def fetch_studiewijzers(mg, kindid):
+    swlist = mg.req("leerlingen", kindid, "studiewijzers")
+    result = []
+    for sw in swlist.get("Items", []):
+        switem = mg.req("leerlingen", kindid, "studiewijzers", sw["Id"])
+        result.append(Studiewijzer(
+            titel=switem.get("Titel", ""),
+            van=datum(switem.get("Van")),
+            tot_en_met=datum(switem.get("TotEnMet")),
+            onderdelen=[
+                Onderdeel(
+                    titel=o.get("Titel", ""),
+                    omschrijving=dehtml(o.get("Omschrijving", "")),
+                    bijlagen=[bijlage_record(b) for b in o.get("Bronnen") or []],
+                )
+                for o in switem["Onderdelen"]["Items"]
+            ],
+        ))
+    return result
 
-        # Volgende afspraak
-        toekomstige_afspraken = [
-            a for a in kind_data["afspraken"]
-            if a["start"] > datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ]
-        if toekomstige_afspraken:
-            volgende = min(toekomstige_afspraken, key=lambda x: x["start"])
-            kind_data["volgende_afspraak"] = volgende["start"]
-            kind_data["volgende_vak"] = volgende.get("vak", "")
-        else:
-            kind_data["volgende_afspraak"] = "Geen"
-            kind_data["volgende_vak"] = ""
+def main():
+    args = make_parser().parse_args()
+    prepare_args(args)
 
-        output_data["kinderen"][kind_naam] = kind_data
+    if args.record and args.replay:
+        sys.exit("--record and --replay can not be combined")
 
-        # 🔥 Nieuw: haal extra data per kind
-        # Cijfers
-        c = mg.req("personen", kindid, "cijfers", "laatste", dict(top=50))
-        output_data["cijfers"][kind_naam] = [
-            {
-                "vak": item.get("vak", {}).get("code", ""),
-                "omschrijving": item.get("omschrijving", ""),
-                "waarde": item.get("waarde", ""),
-                "weegfactor": item.get("weegfactor", ""),
-                "ingevoerd_op": datum(item.get("ingevoerdOp"))
-            }
-            for item in c.get("items", [])
-        ]
+    mg = Magister(args)
 
-        # Absenties
-        abs_van = deltaymd(years=-1)
-        abs_tot = deltaymd(weeks=+1)
-        abs_data = mg.req("personen", kindid, "absenties", dict(van=abs_van, tot=abs_tot))
-        output_data["absenties"][kind_naam] = [
-            {
-                "start": datum(item.get("Start")),
-                "einde": datum(item.get("Eind")),
-                "omschrijving": item.get("Omschrijving", ""),
-                "afspraak": item.get("Afspraak", {}).get("Omschrijving", "")
-            }
-            for item in abs_data.get("Items", [])
-        ]
+    if args.replay:
+        # Geen login: alle antwoorden komen van schijf
+        mg.access_token = REDACTED
+    elif not args.accesstoken:
+        if not authenticate(mg, args):
+            return
 
-        # Opdrachten
-        opdr_data = mg.req("personen", kindid, "opdrachten")
-        output_data["opdrachten"][kind_naam] = [
-            {
-                "titel": item.get("Titel", ""),
-                "vak": item.get("Vak", ""),
-                "inleveren_voor": datum(item.get("InleverenVoor")),
-                "ingeleverd_op": datum(item.get("IngeleverdOp")),
-                "omschrijving": dehtml(item.get("Omschrijving", ""))
-            }
-            for item in opdr_data.get("Items", [])
-        ]
+    # Reeds bekende account-gegevens (bijv. van de config flow) via stdin
+    metadata = {}
+    if args.metadata == "-":
+        try:
+            metadata = json.load(sys.stdin) or {}
+        except ValueError:
+            metadata = {}
 
-        # Activiteiten
-        act_data = mg.req("personen", kindid, "activiteiten")
-        output_data["activiteiten"][kind_naam] = [
-            {
-                "titel": item.get("Titel", ""),
-                "zichtbaar_vanaf": datum(item.get("ZichtbaarVanaf")),
-                "zichtbaar_tot": datum(item.get("ZichtbaarTotEnMet"))
-            }
-            for item in act_data.get("Items", [])
-        ]
+    try:
+        if args.check:
+            # Alleen inloggegevens controleren: geen verdere data ophalen
+            output_data = check_info(mg, get_account(mg, args, metadata))
+        else:
+            output_data = collect(mg, args, metadata)
+    except LoginError:
+        sys.exit(1)
 
-        # Studiewijzers
-        swlist = mg.req("leerlingen", kindid, "studiewijzers")
-        output_data["studiewijzers"][kind_naam] = []
-        for sw in swlist.get("Items", []):
-            switem = mg.req("leerlingen", kindid, "studiewijzers", sw["Id"])
-            output_data["studiewijzers"][kind_naam].append({
-                "titel": switem.get("Titel", ""),
-                "van": datum(switem.get("Van")),
-                "tot_en_met": datum(switem.get("TotEnMet")),
-                "onderdelen": [
-                    {
-                        "titel": o.get("Titel", ""),
-                        "omschrijving": dehtml(o.get("Omschrijving", ""))
-                    }
-                    for o in switem["Onderdelen"]["Items"]
-                ]
-            })
-
-    print(json.dumps(output_data, ensure_ascii=False, separators=(',', ':')))
+    print(json.dumps(output_data, ensure_ascii=False, separators=(',', ':'), default=json_default))
 
 # Entry point
 if __name__ == '__main__':
@@ -0,0 +1,157 @@
+# media_source.py
+"""Bijlagen van opdrachten en studiewijzers als media source.
+
+Bladeren gaat per account en kind; pas bij het openen wordt de bijlage via
+`MagisterBijlageView` gedownload (of uit de cache gehaald).
+"""
+import logging
+from http import HTTPStatus
+from urllib.parse import quote
+
+from aiohttp import web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.media_player import MediaClass
+from homeassistant.components.media_source import (
+    BrowseMediaSource,
+    MediaSource,
+    MediaSourceItem,
+    PlayMedia,
+    Unresolvable,
+)
+from homeassistant.core import HomeAssistant
+
+from .attachments import inline_type
+from .const import DOMAIN
+from .coordinator import MagisterDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+BIJLAGE_URL = "/api/magister_school/bijlage/{entry_id}/{key}"
+
+# Eerste deel van het content type -> media class; de rest is een 'url'
+MEDIA_CLASSES = {
+    "image": MediaClass.IMAGE,
+    "video": MediaClass.VIDEO,
+    "audio": MediaClass.MUSIC,
+}
+
+
+async def async_get_media_source(hass: HomeAssistant) -> MediaSource:
+    """Set up de Magister media source."""
+    return MagisterMediaSource(hass)
+
+
+def _coordinators(hass):
+    return {
+        entry_id: coordinator
+        for entry_id, coordinator in hass.data.get(DOMAIN, {}).items()
+        if isinstance(coordinator, MagisterDataUpdateCoordinator)
+    }
+
+
+def bijlage_url(entry_id, key):
+    return BIJLAGE_URL.format(entry_id=entry_id, key=quote(str(key), safe=""))
+
+
+class MagisterMediaSource(MediaSource):
+    """Identifiers: '', '<entry_id>', '<entry_id>/<kind>' en '<entry_id>/<kind>/<bijlage>'."""
+
+    name = "Magister"
+
+    def __init__(self, hass: HomeAssistant):
+        super().__init__(DOMAIN)
+        self.hass = hass
+
+    async def async_resolve_media(self, item: MediaSourceItem) -> PlayMedia:
+        entry_id, _, rest = (item.identifier or "").partition("/")
+        key = rest.rpartition("/")[2]
+        coordinator = _coordinators(self.hass).get(entry_id)
+        if coordinator is None or not key or (found := coordinator.view.bijlage(key)) is None:
+            raise Unresolvable(f"Onbekende bijlage: {item.identifier}")
+        bijlage = found[2]
+        return PlayMedia(bijlage_url(entry_id, key), bijlage.content_type or "application/octet-stream")
+
+    async def async_browse_media(self, item: MediaSourceItem) -> BrowseMediaSource:
+        coordinators = _coordinators(self.hass)
+        if not item.identifier:
+            return self._directory("", "Magister", [
+                self._directory(entry_id, coordinator.api.user)
+                for entry_id, coordinator in coordinators.items()
+            ])
+
+        entry_id, _, kind_naam = item.identifier.partition("/")
+        if (coordinator := coordinators.get(entry_id)) is None:
+            raise Unresolvable(f"Onbekend account: {entry_id}")
+        view = coordinator.view
+        if not kind_naam:
+            return self._directory(entry_id, coordinator.api.user, [
+                self._directory(f"{entry_id}/{naam}", naam)
+                for naam in view.data.get("kinderen", {})
+                if view.kind(naam).bijlagen
+            ])
+
+        return self._directory(item.identifier, kind_naam, [
+            BrowseMediaSource(
+                domain=DOMAIN,
+                identifier=f"{entry_id}/{kind_naam}/{key}",
+                media_class=MEDIA_CLASSES.get((bijlage.content_type or "").split("/")[0], MediaClass.URL),
+                media_content_type=bijlage.content_type or "application/octet-stream",
+                title=f"{context}: {bijlage.naam}",
+                can_play=True,
+                can_expand=False,
+            )
+            for key, (naam, context, bijlage) in view.bijlagen.items()
+            if naam == kind_naam
+        ])
+
+    @staticmethod
+    def _directory(identifier, title, children=None):
+        return BrowseMediaSource(
+            domain=DOMAIN,
+            identifier=identifier,
+            media_class=MediaClass.DIRECTORY,
+            media_content_type="",
+            title=title,
+            can_play=False,
+            can_expand=True,
+            children=children,
+            children_media_class=MediaClass.DIRECTORY if children is not None else None,
+        )
+
+
+class MagisterBijlageView(HomeAssistantView):
+    """Levert een bijlage vanaf schijf; alleen de eerste keer via Magister."""
+
+    url = BIJLAGE_URL
+    name = "api:magister_school:bijlage"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+
+    async def get(self, request: web.Request, entry_id: str, key: str) -> web.StreamResponse:
+        coordinator = _coordinators(self.hass).get(entry_id)
+        if coordinator is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+        try:
+            found = await coordinator.async_get_bijlage(key)
+        except Exception as err:
+            _LOGGER.warning("Bijlage %s ophalen mislukt: %s", key, err)
+            return web.Response(status=HTTPStatus.BAD_GATEWAY)
+        if found is None:
+            return web.Response(status=HTTPStatus.NOT_FOUND)
+
+        path, meta = found
+        # Alleen afbeeldingen, audio, video en pdf inline; al het andere als
+        # download, en nooit als actieve inhoud op de origin van Home Assistant
+        media_type = inline_type(meta["content_type"])
+        disposition = "inline" if media_type else "attachment"
+        return web.FileResponse(path, headers={
+            "Content-Type": media_type or "application/octet-stream",
+            "Content-Disposition": f"{disposition}; filename*=UTF-8''{quote(meta['naam'] or key)}",
+            "X-Content-Type-Options": "nosniff",
+            "Content-Security-Policy": "sandbox",
+            # Content-addressed: de inhoud achter deze bijlage verandert niet
+            "Cache-Control": "private, max-age=86400",
+        })
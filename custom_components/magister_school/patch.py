@@ -0,0 +1,70 @@
+"""JSON-patch (RFC 6902) tussen twee versies van dezelfde JSON-data.
+
+Voor de websocket: een kaart krijgt eenmalig de data en daarna alleen de
+verschillen. Lijsten worden vergeleken na het weglaten van het gelijke begin
+en eind, zodat een nieuw cijfer bovenaan één `add` is en niet een `replace`
+van de hele lijst.
+
+Geen Home Assistant imports.
+"""
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def json_patch(old, new, path=""):
+    """Lijst patch-operaties die `old` in `new` veranderen; leeg als ze gelijk zijn."""
+    ops = []
+    _diff(old, new, path, ops)
+    return ops
+
+
+def _equal(old, new):
+    """Gelijk, ook in type: in JSON zijn 1, 1.0 en true verschillend."""
+    if old is new:
+        return True
+    if type(old) is not type(new) or old != new:
+        return False
+    if isinstance(old, dict):
+        return all(_equal(value, new[key]) for key, value in old.items())
+    if isinstance(old, list):
+        return all(map(_equal, old, new))
+    return True
+
+
+def _diff(old, new, path, ops):
+    if _equal(old, new):
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, f"{path}/{_escape(key)}", ops)
+            else:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+    elif isinstance(old, list) and isinstance(new, list):
+        _diff_list(old, new, path, ops)
+    else:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def _diff_list(old, new, path, ops):
+    start = 0
+    while start < len(old) and start < len(new) and _equal(old[start], new[start]):
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and _equal(old[end_old - 1], new[end_new - 1]):
+        end_old -= 1
+        end_new -= 1
+
+    # Het verschillende middenstuk: paarsgewijs vergelijken, dan toevoegen of verwijderen
+    common = min(end_old, end_new) - start
+    for i in range(start, start + common):
+        _diff(old[i], new[i], f"{path}/{i}", ops)
+    for i in range(start + common, end_new):
+        ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+    for i in reversed(range(start + common, end_old)):
+        ops.append({"op": "remove", "path": f"{path}/{i}"})
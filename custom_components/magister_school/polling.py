@@ -0,0 +1,51 @@
+"""Poll-interval op basis van het rooster.
+
+Rond en tijdens schooltijd wordt met het minimale interval gepolld; daarbuiten
+(avond, nacht, weekend, vakantie) zo zelden mogelijk, maar nooit minder vaak
+dan het maximale interval en altijd op tijd vóór de volgende schooldag.
+
+Schooldagen komen uit de gecachte afspraken: een dag zonder (niet-uitgevallen)
+lessen is geen schooldag. Staan er in het hele opgehaalde venster geen lessen
+meer, dan is het vakantie en geldt het maximale interval.
+
+Geen Home Assistant imports.
+"""
+from datetime import timedelta
+
+from .schedule import parse_local
+
+DEFAULT_MIN_INTERVAL = 15  # minuten
+DEFAULT_MAX_INTERVAL = 180  # minuten
+
+# Zo lang vóór de eerste en na de laatste les wordt al / nog dicht gepolld
+SCHOOL_LEAD = timedelta(hours=1)
+SCHOOL_TAIL = timedelta(hours=1)
+
+
+def school_days(afspraken_lists, tz):
+    """{datum: (eerste start, laatste einde)} over de afspraken van alle kinderen."""
+    days = {}
+    for afspraken in afspraken_lists:
+        for a in afspraken:
+            if a.is_uitval:
+                continue
+            start = parse_local(a.start, tz)
+            if start is None:
+                continue
+            end = max(parse_local(a.einde, tz) or start, start)
+            first, last = days.get(start.date(), (start, end))
+            days[start.date()] = (min(first, start), max(last, end))
+    return days
+
+
+def next_interval(now, days, min_interval, max_interval):
+    """Tijd tot de volgende poll, tussen min_interval en max_interval."""
+    today = days.get(now.date())
+    if today and today[0] - SCHOOL_LEAD <= now <= today[1] + SCHOOL_TAIL:
+        return min_interval
+
+    upcoming = [first - SCHOOL_LEAD for first, _ in days.values() if first - SCHOOL_LEAD > now]
+    if not upcoming:
+        # Geen lessen meer in het venster: vakantie
+        return max_interval
+    return max(min_interval, min(max_interval, min(upcoming) - now))
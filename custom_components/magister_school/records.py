@@ -0,0 +1,303 @@
+"""Compacte records voor de Magister snapshot.
+
+Elk lijst-item in de snapshot (afspraak, wijziging, cijfer, ...) is een
+slotted dataclass in plaats van een losse dict. Veelvoorkomende strings
+(vakcodes, lokalen, types) worden ge-intern'd zodat duizenden records
+dezelfde string delen. Pas aan de rand (JSON-uitvoer, sensor attributes)
+wordt er weer een gewone dict van gemaakt.
+
+Deze module heeft geen Home Assistant imports: `magister.py` gebruikt hem
+ook als losstaand script.
+"""
+import json
+import sys
+from dataclasses import MISSING, dataclass, field, fields
+from itertools import combinations
+from typing import Any, ClassVar
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class _Record:
+    """Gedeelde helpers voor alle records."""
+
+    __slots__ = ()
+
+    # Velden waarvan de waarde ge-intern'd wordt
+    _interned: ClassVar[tuple] = ()
+    # Velden met een lijst geneste records: naam -> record class
+    _nested: ClassVar[dict] = {}
+
+    def __post_init__(self):
+        for name in self._interned:
+            setattr(self, name, _intern(getattr(self, name)))
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in self._nested:
+            data[name] = [item.as_dict() for item in data[name] or []]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        values = {name: data.get(name) for name in cls.__slots__}
+        for name, record_cls in cls._nested.items():
+            values[name] = _convert(values[name], record_cls)
+        return cls(**values)
+
+
+@dataclass(slots=True)
+class Bijlage(_Record):
+    naam: str
+    content_type: str
+    grootte: int | None
+    href: str | None
+    id: int | None = None
+
+    _interned: ClassVar[tuple] = ("content_type",)
+
+
+@dataclass(slots=True)
+class Aanmelding(_Record):
+    start: str
+    einde: str
+    lesperiode: str | None
+    studie: str
+
+    _interned: ClassVar[tuple] = ("lesperiode", "studie")
+
+
+@dataclass(slots=True)
+class Afspraak(_Record):
+    start: str
+    einde: str
+    type: str
+    lokaal: str
+    omschrijving: str
+    inhoud: str | None
+    vak: str
+    is_huiswerk: bool
+    is_uitval: bool
+    id: int | None = None
+    is_afgerond: bool = False
+
+    _interned: ClassVar[tuple] = ("type", "lokaal", "vak", "omschrijving")
+
+
+@dataclass(slots=True)
+class Wijziging(_Record):
+    start: str
+    einde: str
+    type: str
+    lokaal: str
+    omschrijving: str
+    inhoud: str | None
+    id: int | None = None
+
+    _interned: ClassVar[tuple] = ("type", "lokaal", "omschrijving")
+
+
+@dataclass(slots=True)
+class Cijfer(_Record):
+    vak: str
+    omschrijving: str
+    waarde: Any
+    weegfactor: Any
+    ingevoerd_op: str
+    id: int | None = None
+
+    _interned: ClassVar[tuple] = ("vak",)
+
+
+@dataclass(slots=True)
+class Absentie(_Record):
+    start: str
+    einde: str
+    omschrijving: str
+    afspraak: str
+    id: int | None = None
+
+    _interned: ClassVar[tuple] = ("omschrijving", "afspraak")
+
+
+@dataclass(slots=True)
+class Opdracht(_Record):
+    titel: str
+    vak: str
+    inleveren_voor: str
+    ingeleverd_op: str
+    omschrijving: str | None
+    id: int | None = None
+    bijlagen: list = field(default_factory=list)
+
+    _interned: ClassVar[tuple] = ("vak",)
+    _nested: ClassVar[dict] = {"bijlagen": Bijlage}
+
+
+@dataclass(slots=True)
+class Activiteit(_Record):
+    titel: str
+    zichtbaar_vanaf: str
+    zichtbaar_tot: str
+
+
+@dataclass(slots=True)
+class Onderdeel(_Record):
+    titel: str
+    omschrijving: str | None
+    bijlagen: list = field(default_factory=list)
+
+    _nested: ClassVar[dict] = {"bijlagen": Bijlage}
+
+
+@dataclass(slots=True)
+class Studiewijzer(_Record):
+    titel: str
+    van: str
+    tot_en_met: str
+    onderdelen: list = field(default_factory=list)
+
+    _nested: ClassVar[dict] = {"onderdelen": Onderdeel}
+
+
+@dataclass(slots=True)
+class Bericht(_Record):
+    onderwerp: str
+    afzender: str
+    verzonden_op: str
+    is_gelezen: bool
+    heeft_bijlagen: bool
+    # Pas opgehaald als het bericht geopend wordt
+    inhoud: str | None = None
+    id: int | None = None
+
+    _interned: ClassVar[tuple] = ("afzender",)
+
+
+# Lijsten per kind binnen snapshot["kinderen"][naam]
+KIND_RECORDS = {
+    "aanmeldingen": Aanmelding,
+    "afspraken": Afspraak,
+    "wijzigingen": Wijziging,
+}
+
+# Secties op het hoogste niveau: snapshot[sectie][naam] -> lijst
+SECTION_RECORDS = {
+    "cijfers": Cijfer,
+    "absenties": Absentie,
+    "opdrachten": Opdracht,
+    "activiteiten": Activiteit,
+    "studiewijzers": Studiewijzer,
+}
+
+# Onderdelen per account in plaats van per kind: snapshot["berichten"] is
+# {"ongelezen": n, "ongelezen_ids": [id, ...], "items": [Bericht, ...]}
+ACCOUNT_SECTIONS = ("berichten",)
+
+# Onderdelen die los opgehaald kunnen worden; "rooster" zijn de afspraken,
+# wijzigingen en tellingen in snapshot["kinderen"]
+SECTIONS = ("rooster", *SECTION_RECORDS, *ACCOUNT_SECTIONS)
+
+
+def _convert(items, record_cls):
+    return [
+        item if isinstance(item, _Record) else record_cls.from_dict(item)
+        for item in items or []
+    ]
+
+
+def snapshot_from_json(data):
+    """Zet de lijsten in een (uit JSON geladen) snapshot om naar records, in place."""
+    if not isinstance(data, dict):
+        return data
+    for kind_data in (data.get("kinderen") or {}).values():
+        for key, record_cls in KIND_RECORDS.items():
+            if key in kind_data:
+                kind_data[key] = _convert(kind_data[key], record_cls)
+    for section, record_cls in SECTION_RECORDS.items():
+        per_kind = data.get(section)
+        if not per_kind:
+            continue
+        for naam, items in per_kind.items():
+            per_kind[naam] = _convert(items, record_cls)
+    return data
+
+
+def _key_sets(record_cls):
+    """
+    Alle sets sleutels waaraan een record herkend wordt: de verplichte
+    velden plus elke combinatie van velden met een default. Zo gaan ook
+    oudere snapshots (zonder later toegevoegde velden als id) en records
+    zonder id door de snelle weg.
+    """
+    required = [f.name for f in fields(record_cls) if f.default is MISSING and f.default_factory is MISSING]
+    optional = [name for name in record_cls.__slots__ if name not in required]
+    for n in range(len(optional) + 1):
+        for extra in combinations(optional, n):
+            yield frozenset((*required, *extra))
+
+
+def _by_keys(record_classes):
+    by_keys = {}
+    for record_cls in record_classes:
+        for keys in _key_sets(record_cls):
+            if by_keys.setdefault(keys, record_cls) is not record_cls:
+                raise ValueError(f"{record_cls.__name__} en {by_keys[keys].__name__} hebben dezelfde sleutels")
+    return by_keys
+
+
+# Herken records tijdens het decoderen aan hun (unieke) set sleutels
+_BY_KEYS = _by_keys((*KIND_RECORDS.values(), *SECTION_RECORDS.values(), Onderdeel, Bijlage, Bericht))
+
+
+def record_hook(obj):
+    record_cls = _BY_KEYS.get(frozenset(obj))
+    if record_cls is None:
+        return obj
+    if record_cls is Studiewijzer:
+        return Studiewijzer(obj["titel"], obj["van"], obj["tot_en_met"], obj.get("onderdelen") or [])
+    return record_cls(**obj)
+
+
+def loads_snapshot(raw):
+    """
+    Decodeer de JSON van magister.py direct naar records.
+
+    Items worden tijdens het parsen al omgezet, zodat niet eerst de hele
+    snapshot als dicts in het geheugen staat.
+    """
+    return snapshot_from_json(json.loads(raw, object_hook=record_hook))
+
+
+def huiswerk_counts(afspraken):
+    """Tellingen van open en afgerond huiswerk, voor in de kind-data."""
+    huiswerk = [a for a in afspraken if a.is_huiswerk]
+    afgerond = sum(1 for a in huiswerk if a.is_afgerond)
+    return {"aantal_huiswerk": len(huiswerk) - afgerond, "aantal_huiswerk_afgerond": afgerond}
+
+
+def as_dicts(items):
+    """Lijst records -> lijst dicts, voor attributes en JSON."""
+    return [item.as_dict() if isinstance(item, _Record) else item for item in items or []]
+
+
+def json_default(obj):
+    """`default=` hook voor json.dumps zodat records direct geserialiseerd worden."""
+    if isinstance(obj, _Record):
+        return obj.as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def snapshot_as_dict(data):
+    """Volledige snapshot met records terug naar gewone dicts/lijsten."""
+    if isinstance(data, _Record):
+        return data.as_dict()
+    if isinstance(data, dict):
+        return {k: snapshot_as_dict(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [snapshot_as_dict(v) for v in data]
+    return data
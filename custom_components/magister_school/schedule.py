@@ -0,0 +1,88 @@
+"""Rooster helpers: interval-index over afspraken en roosterwijzigingen.
+
+Geen Home Assistant imports; de calendar en de coordinator gebruiken dit.
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+# Standaard rooster-horizon in weken (optie van de integratie)
+DEFAULT_SCHEDULE_WEEKS = 2
+
+
+def parse_local(ts, tz):
+    """'YYYY-MM-DD HH:MM:SS' (uitvoer van datum()) -> aware datetime, of None."""
+    try:
+        return datetime.strptime(ts[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=tz)
+    except (TypeError, ValueError):
+        return None
+
+
+class IntervalIndex:
+    """
+    Gesorteerde index van (start, einde, item) intervallen.
+
+    Een zoekvraag naar overlap met [start, einde) zoekt binair op de starttijden.
+    Omdat de langste duur bekend is, hoeven alleen items die starten in
+    [start - max_duur, einde) bekeken te worden: O(log n + k).
+    """
+
+    def __init__(self, intervals=()):
+        self._items = sorted(intervals, key=lambda iv: iv[0])
+        self._starts = [iv[0] for iv in self._items]
+        self._max_duur = max((iv[1] - iv[0] for iv in self._items), default=timedelta(0))
+
+    def __len__(self):
+        return len(self._items)
+
+    def overlapping(self, start, end):
+        """Items die (deels) in [start, end) vallen, gesorteerd op start."""
+        lo = bisect_left(self._starts, start - self._max_duur)
+        hi = bisect_left(self._starts, end)
+        return [
+            item for s, e, item in self._items[lo:hi]
+            if e > start or s >= start
+        ]
+
+    def current_or_next(self, moment):
+        """Het item dat nu loopt, of anders het eerstvolgende."""
+        lo = bisect_left(self._starts, moment - self._max_duur)
+        for s, e, item in self._items[lo:]:
+            if e > moment or s >= moment:
+                return item
+        return None
+
+
+def merge_rooster(afspraken, wijzigingen):
+    """
+    Combineer afspraken met roosterwijzigingen.
+
+    Een wijziging met hetzelfde id (of anders dezelfde start) als een afspraak
+    hoort bij die afspraak; overige wijzigingen staan op zichzelf. Elke
+    wijziging hoort bij hooguit één afspraak, en een match op id gaat voor.
+    Geeft (afspraak of None, wijziging of None) paren.
+    """
+    by_id = {w.id: w for w in wijzigingen if w.id is not None}
+    used = set()
+    matched = []
+    for a in afspraken:
+        w = by_id.get(a.id) if a.id is not None else None
+        if w is not None and id(w) in used:
+            w = None
+        if w is not None:
+            used.add(id(w))
+        matched.append(w)
+
+    # Dan op start, met de wijzigingen die nog vrij zijn (in volgorde)
+    by_start = {}
+    for w in wijzigingen:
+        if id(w) not in used:
+            by_start.setdefault(w.start, []).append(w)
+    for i, a in enumerate(afspraken):
+        if matched[i] is None and by_start.get(a.start):
+            w = matched[i] = by_start[a.start].pop(0)
+            used.add(id(w))
+
+    yield from zip(afspraken, matched)
+    for w in wijzigingen:
+        if id(w) not in used:
+            yield None, w
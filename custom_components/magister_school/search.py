@@ -0,0 +1,224 @@
+"""Zoekindex over huiswerk (afspraken), opdrachten en studiewijzers.
+
+Een inverted index: per term de documenten waarin hij voorkomt, met de
+frequentie. Na elke snapshot worden alleen nieuwe en gewijzigde records
+(opnieuw) getokeniseerd en verdwenen records verwijderd; een vingerafdruk
+van de tekst bepaalt of een record gewijzigd is. Zoeken rangschikt met
+BM25; een zoekwoord van drie letters of meer telt ook als begin van een
+langer woord ("bio" vindt "biologie"), met half gewicht.
+
+Geen Home Assistant imports.
+"""
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from .changes import record_key
+
+DEFAULT_LIMIT = 10
+
+ONDERDELEN = ("afspraken", "opdrachten", "studiewijzers")
+
+# BM25
+K1 = 1.2
+B = 0.75
+
+# Gewicht van een match op het begin van een woord
+PREFIX_WEIGHT = 0.5
+PREFIX_MIN = 3
+
+FRAGMENT_SIZE = 160
+
+STOPWOORDEN = frozenset(
+    "de het een en of van in op te is aan met voor naar bij om uit tot als dat die dit er "
+    "je jij we wij ze zij hij ik u wat wie waar wanneer hoe niet ook nog al dan maar "
+    "the a an of in on to is and or for with at by from when what where how".split()
+)
+
+_TOKEN = re.compile(r"[a-z]+|[0-9]+")
+
+
+def tokens(text):
+    """Kleine letters, zonder accenten; woorden en getallen apart ('H4' -> 'h', '4')."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [
+        t for t in _TOKEN.findall(text)
+        if t not in STOPWOORDEN and (len(t) > 1 or t.isdigit())
+    ]
+
+
+def _documents(snapshot):
+    """(doc_id, meta, tekst) voor alles wat doorzocht kan worden."""
+    for naam, kind_data in (snapshot.get("kinderen") or {}).items():
+        for afspraak in kind_data.get("afspraken") or []:
+            yield ("afspraken", naam, record_key(afspraak)), {
+                "onderdeel": "afspraken",
+                "kind": naam,
+                "titel": afspraak.omschrijving,
+                "vak": afspraak.vak,
+                "datum": afspraak.start,
+                "id": afspraak.id,
+            }, f"{afspraak.omschrijving}\n{afspraak.vak}\n{afspraak.inhoud or ''}"
+    for naam, opdrachten in (snapshot.get("opdrachten") or {}).items():
+        for opdracht in opdrachten:
+            yield ("opdrachten", naam, record_key(opdracht)), {
+                "onderdeel": "opdrachten",
+                "kind": naam,
+                "titel": opdracht.titel,
+                "vak": opdracht.vak,
+                "datum": opdracht.inleveren_voor,
+                "id": opdracht.id,
+            }, f"{opdracht.titel}\n{opdracht.vak}\n{opdracht.omschrijving or ''}"
+    for naam, studiewijzers in (snapshot.get("studiewijzers") or {}).items():
+        for studiewijzer in studiewijzers:
+            for i, onderdeel in enumerate(studiewijzer.onderdelen):
+                yield ("studiewijzers", naam, record_key(studiewijzer), i), {
+                    "onderdeel": "studiewijzers",
+                    "kind": naam,
+                    "titel": f"{studiewijzer.titel} / {onderdeel.titel}",
+                    # Studiewijzers hebben geen vak; de titel noemt het meestal wel
+                    "vak": studiewijzer.titel,
+                    "datum": studiewijzer.van,
+                    "id": None,
+                }, f"{studiewijzer.titel}\n{onderdeel.titel}\n{onderdeel.omschrijving or ''}"
+
+
+class _Doc:
+    __slots__ = ("fingerprint", "terms", "length", "meta", "tekst")
+
+    def __init__(self, fingerprint, terms, meta, tekst):
+        self.fingerprint = fingerprint
+        self.terms = terms
+        self.length = sum(terms.values())
+        self.meta = meta
+        self.tekst = tekst
+
+
+class SearchIndex:
+    """Inverted index over de doorzoekbare teksten van één account."""
+
+    def __init__(self):
+        self._docs = {}
+        # term -> {doc_id: frequentie}
+        self._postings = {}
+        self._total_length = 0
+        # Gesorteerde termen voor prefix-matches; None na een wijziging
+        self._sorted_terms = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def update(self, snapshot):
+        """Index bijwerken naar deze snapshot; geeft (toegevoegd/gewijzigd, verwijderd)."""
+        current = set()
+        changed = 0
+        for doc_id, meta, tekst in _documents(snapshot):
+            current.add(doc_id)
+            fingerprint = hash(tekst)
+            doc = self._docs.get(doc_id)
+            if doc is not None and doc.fingerprint == fingerprint:
+                doc.meta = meta
+                continue
+            if doc is not None:
+                self._remove(doc_id)
+            self._add(doc_id, _Doc(fingerprint, Counter(tokens(tekst)), meta, tekst))
+            changed += 1
+        removed = [doc_id for doc_id in self._docs if doc_id not in current]
+        for doc_id in removed:
+            self._remove(doc_id)
+        return changed, len(removed)
+
+    def _add(self, doc_id, doc):
+        self._docs[doc_id] = doc
+        self._total_length += doc.length
+        for term, tf in doc.terms.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._sorted_terms = None
+            self._postings[term][doc_id] = tf
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id)
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                self._sorted_terms = None
+
+    def _expand(self, term):
+        """[(term, gewicht)]: de term zelf en langere termen die ermee beginnen."""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if len(term) >= PREFIX_MIN:
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(self._postings)
+            i = bisect_left(self._sorted_terms, term)
+            while i < len(self._sorted_terms) and self._sorted_terms[i].startswith(term):
+                if self._sorted_terms[i] != term:
+                    matches.append((self._sorted_terms[i], PREFIX_WEIGHT))
+                i += 1
+        return matches
+
+    def search(self, query, kind=None, vak=None, onderdeel=None, limit=DEFAULT_LIMIT):
+        """
+        Beste matches voor `query`, als dicts met score, meta en een fragment.
+        `vak` is een deel van het vak (bij studiewijzers: van de titel),
+        zonder onderscheid in hoofdletters.
+        """
+        terms = tokens(query)
+        if not terms or not self._docs:
+            return []
+        vak = vak.lower() if vak else None
+        n = len(self._docs)
+        avg_length = self._total_length / n or 1
+
+        scores = {}
+        for term in dict.fromkeys(terms):
+            for match, weight in self._expand(term):
+                postings = self._postings[match]
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    doc = self._docs[doc_id]
+                    meta = doc.meta
+                    if (kind is not None and meta["kind"] != kind) or (
+                        onderdeel is not None and meta["onderdeel"] != onderdeel
+                    ) or (vak is not None and vak not in (meta["vak"] or "").lower()):
+                        continue
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc.length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * norm
+
+        best = sorted(
+            scores.items(),
+            key=lambda item: (-item[1], _neg(self._docs[item[0]].meta["datum"])),
+        )[:limit]
+        return [
+            {
+                "score": round(score, 3),
+                **self._docs[doc_id].meta,
+                "fragment": _fragment(self._docs[doc_id].tekst, terms),
+            }
+            for doc_id, score in best
+        ]
+
+
+def _neg(datum):
+    """Sorteersleutel: nieuwere datum eerst bij gelijke score."""
+    return [-ord(c) for c in datum or ""]
+
+
+def _fragment(tekst, terms):
+    """Stukje tekst rond de eerste zoekterm, op één regel."""
+    plat = " ".join((tekst or "").split())
+    lower = plat.lower()
+    positions = [p for p in (lower.find(t) for t in terms) if p >= 0]
+    start = max(0, min(positions) - FRAGMENT_SIZE // 4) if positions else 0
+    fragment = plat[start:start + FRAGMENT_SIZE]
+    if start > 0:
+        fragment = "…" + fragment
+    if start + FRAGMENT_SIZE < len(plat):
+        fragment += "…"
+    return fragment
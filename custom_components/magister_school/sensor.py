@@ -1,15 +1,194 @@
 # sensor.py
 import logging
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.core import HomeAssistant
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from homeassistant.components.sensor import SensorEntity, SensorEntityDescription, SensorStateClass
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.config_entries import ConfigEntry
 
 from .const import DOMAIN, DEFAULT_NAME
 from .coordinator import MagisterDataUpdateCoordinator
+from .attributes import SUMMARY_ITEMS, apply_budget
+from .records import ACCOUNT_SECTIONS, SECTIONS
+from .views import KIND_SECTIONS, KindView
 
 _LOGGER = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True, kw_only=True)
+class MagisterSensorEntityDescription(SensorEntityDescription):
+    """Beschrijving van een per-kind sensor."""
+
+    # Achter "Magister {kind}" in de naam; leeg voor de overview sensor
+    name_suffix: str = ""
+    value_fn: Callable[[KindView], Any]
+    attrs_fn: Callable[[KindView], dict]
+    # Alleen beschikbaar als het kind in de snapshot staat
+    needs_kind_data: bool = True
+    # Onderdelen die een handmatige refresh van deze sensor ophaalt
+    sections: tuple[str, ...] = ("rooster",)
+
+
+def _overview_attrs(kind: KindView):
+    """ALLE data voor templates."""
+    if not kind.data:
+        return {}
+
+    attributes = {
+        "naam": kind.get("naam"),
+        "stamnummer": kind.get("stamnummer"),
+        "geboortedatum": kind.get("geboortedatum"),
+        "aanmeldingen": kind.aanmeldingen,
+        "afspraken": kind.afspraken,
+        "wijzigingen": kind.wijzigingen,
+        "aantal_afspraken_vandaag": kind.get("aantal_afspraken_vandaag", 0),
+        "aantal_huiswerk": kind.get("aantal_huiswerk", 0),
+        "aantal_huiswerk_afgerond": kind.get("aantal_huiswerk_afgerond", 0),
+        "aantal_uitval": kind.get("aantal_uitval", 0),
+        "volgende_afspraak": kind.get("volgende_afspraak", "Geen"),
+        "volgende_vak": kind.get("volgende_vak", ""),
+    }
+
+    # Voeg extra data toe
+    for data_type in KIND_SECTIONS:
+        if kind.has_section(data_type):
+            attributes[data_type] = getattr(kind, data_type)
+            attributes[f"aantal_{data_type}"] = len(attributes[data_type])
+    attributes["laatste_cijfers"] = kind.cijfers[:SUMMARY_ITEMS]
+    return attributes
+
+
+KIND_SENSORS: tuple[MagisterSensorEntityDescription, ...] = (
+    # Overview sensor voor templates (deze moet erbij!)
+    MagisterSensorEntityDescription(
+        key="overview",
+        icon="mdi:school",
+        value_fn=lambda kind: kind.get("aantal_afspraken_vandaag", 0),
+        attrs_fn=_overview_attrs,
+        sections=tuple(s for s in SECTIONS if s not in ACCOUNT_SECTIONS),
+    ),
+
+    # Basis info sensors
+    MagisterSensorEntityDescription(
+        key="afspraken_vandaag",
+        name_suffix="Afspraken Vandaag",
+        icon="mdi:calendar-today",
+        value_fn=lambda kind: kind.get("aantal_afspraken_vandaag", 0),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "afspraken_vandaag": kind.afspraken},
+    ),
+    MagisterSensorEntityDescription(
+        key="huiswerk",
+        name_suffix="Huiswerk",
+        icon="mdi:book-education",
+        value_fn=lambda kind: kind.get("aantal_huiswerk", 0),
+        attrs_fn=lambda kind: {
+            "kind_naam": kind.naam,
+            "huiswerk_items": kind.opdrachten,
+            "aantal_afgerond": kind.get("aantal_huiswerk_afgerond", 0),
+        },
+        sections=("rooster", "opdrachten"),
+    ),
+    MagisterSensorEntityDescription(
+        key="volgende_afspraak",
+        name_suffix="Volgende Afspraak",
+        icon="mdi:clock-outline",
+        value_fn=lambda kind: kind.get("volgende_afspraak", "Geen"),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "volgende_vak": kind.get("volgende_vak", "")},
+    ),
+
+    # Detail sensors
+    MagisterSensorEntityDescription(
+        key="cijfers",
+        name_suffix="Cijfers",
+        icon="mdi:certificate",
+        value_fn=lambda kind: len(kind.cijfers),
+        attrs_fn=lambda kind: {
+            "kind_naam": kind.naam,
+            "cijfers": kind.cijfers,
+            "laatste_3_cijfers": kind.cijfers[-3:],
+            "analyse": kind.analyse,
+        },
+        needs_kind_data=False,
+        sections=("cijfers",),
+    ),
+    MagisterSensorEntityDescription(
+        key="afspraken",
+        name_suffix="Afspraken",
+        icon="mdi:calendar",
+        value_fn=lambda kind: len(kind.afspraken),
+        attrs_fn=lambda kind: {
+            "kind_naam": kind.naam,
+            "afspraken": kind.afspraken,
+            "afspraken_vandaag": kind.get("aantal_afspraken_vandaag", 0),
+            "uitval": kind.uitval,
+            "aantal_uitval": kind.get("aantal_uitval", 0),
+        },
+    ),
+    MagisterSensorEntityDescription(
+        key="wijzigingen",
+        name_suffix="Roosterwijzigingen",
+        icon="mdi:calendar-alert",
+        value_fn=lambda kind: len(kind.wijzigingen),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "wijzigingen": kind.wijzigingen},
+    ),
+    MagisterSensorEntityDescription(
+        key="opdrachten",
+        name_suffix="Opdrachten",
+        icon="mdi:clipboard-list",
+        value_fn=lambda kind: len(kind.opdrachten),
+        attrs_fn=lambda kind: {
+            "kind_naam": kind.naam,
+            "opdrachten": kind.opdrachten,
+            "open_opdrachten": kind.open_opdrachten,
+            "aantal_open": len(kind.open_opdrachten),
+        },
+        needs_kind_data=False,
+        sections=("opdrachten",),
+    ),
+    MagisterSensorEntityDescription(
+        key="absenties",
+        name_suffix="Absenties",
+        icon="mdi:account-clock",
+        value_fn=lambda kind: len(kind.absenties),
+        attrs_fn=lambda kind: {
+            "kind_naam": kind.naam,
+            "absenties": kind.absenties,
+            "recente_absenties": kind.absenties[-5:],
+        },
+        needs_kind_data=False,
+        sections=("absenties",),
+    ),
+    MagisterSensorEntityDescription(
+        key="studiewijzers",
+        name_suffix="Studiewijzers",
+        icon="mdi:book-open-variant",
+        value_fn=lambda kind: len(kind.studiewijzers),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "studiewijzers": kind.studiewijzers},
+        needs_kind_data=False,
+        sections=("studiewijzers",),
+    ),
+    MagisterSensorEntityDescription(
+        key="activiteiten",
+        name_suffix="Activiteiten",
+        icon="mdi:calendar-star",
+        value_fn=lambda kind: len(kind.activiteiten),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "activiteiten": kind.activiteiten},
+        needs_kind_data=False,
+        sections=("activiteiten",),
+    ),
+    MagisterSensorEntityDescription(
+        key="aanmeldingen",
+        name_suffix="Aanmeldingen",
+        icon="mdi:school",
+        value_fn=lambda kind: len(kind.aanmeldingen),
+        attrs_fn=lambda kind: {"kind_naam": kind.naam, "aanmeldingen": kind.aanmeldingen},
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     config_entry: ConfigEntry,
@@ -17,651 +196,189 @@ async def async_setup_entry(
 ):
     """Set up Magister sensor from config entry."""
     coordinator = hass.data[DOMAIN][config_entry.entry_id]
-    
+
     # Wacht op eerste data update VOOR we sensors maken
     if not coordinator.data:
         await coordinator.async_config_entry_first_refresh()
-    
-    sensors = [MagisterMainSensor(coordinator, DEFAULT_NAME)]
-    
+
+    sensors = [MagisterMainSensor(coordinator, DEFAULT_NAME), MagisterBerichtenSensor(coordinator)]
+
     # Create individuele sensors voor elk kind
     if coordinator.data and "kinderen" in coordinator.data:
-        for kind_naam in coordinator.data["kinderen"]:
+        for kind_naam in coordinator.kinderen:
             sensors.extend(create_kind_sensors(coordinator, kind_naam))
-    
+
     async_add_entities(sensors, update_before_add=False)
 
+    # Een gemiddelde-sensor per vak; nieuwe vakken verschijnen na een refresh
+    known_vakken = set()
+
+    @callback
+    def _add_vak_sensors():
+        new = []
+        for kind_naam, store in coordinator.grades.items():
+            for vak in store.vakken:
+                if vak and (kind_naam, vak) not in known_vakken:
+                    known_vakken.add((kind_naam, vak))
+                    new.append(MagisterVakSensor(coordinator, kind_naam, vak))
+        if new:
+            async_add_entities(new)
+
+    _add_vak_sensors()
+    config_entry.async_on_unload(coordinator.async_add_listener(_add_vak_sensors))
+
 def create_kind_sensors(coordinator, kind_naam):
     """Maak alle individuele sensors aan voor een kind."""
     base_id = kind_naam.lower().replace(' ', '_')
-    
     return [
-        # Overview sensor voor templates (deze moet erbij!)
-        KindOverviewSensor(coordinator, kind_naam, base_id),
-        
-        # Basis info sensors
-        KindAantalAfsprakenSensor(coordinator, kind_naam, base_id),
-        KindAantalHuiswerkSensor(coordinator, kind_naam, base_id),
-        KindVolgendeAfspraakSensor(coordinator, kind_naam, base_id),
-        
-        # Detail sensors
-        KindCijfersSensor(coordinator, kind_naam, base_id),
-        KindAfsprakenSensor(coordinator, kind_naam, base_id),
-        KindRoosterWijzigingenSensor(coordinator, kind_naam, base_id),
-        KindOpdrachtenSensor(coordinator, kind_naam, base_id),
-        KindAbsentiesSensor(coordinator, kind_naam, base_id),
-        KindStudiewijzersSensor(coordinator, kind_naam, base_id),
-        KindActiviteitenSensor(coordinator, kind_naam, base_id),
-        KindAanmeldingenSensor(coordinator, kind_naam, base_id),
+        MagisterKindSensor(coordinator, kind_naam, base_id, description)
+        for description in KIND_SENSORS
     ]
 
-class KindOverviewSensor(SensorEntity):
-    """Sensor met overzicht van alle data voor templates."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_overview"
-        self._attr_name = f"Magister {kind_naam}"
-        self._attr_icon = "mdi:school"
-
-    @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        return kind_data.get("aantal_afspraken_vandaag", 0) if kind_data else 0
-
-    @property
-    def extra_state_attributes(self):
-        """Return ALLE data voor templates."""
-        kind_data = self._get_kind_data()
-        if not kind_data:
-            return {}
-
-        attributes = {
-            "naam": kind_data.get("naam"),
-            "stamnummer": kind_data.get("stamnummer"),
-            "geboortedatum": kind_data.get("geboortedatum"),
-            "aanmeldingen": kind_data.get("aanmeldingen", []),
-            "afspraken": kind_data.get("afspraken", []),
-            "wijzigingen": kind_data.get("wijzigingen", []),
-            "aantal_afspraken_vandaag": kind_data.get("aantal_afspraken_vandaag", 0),
-            "aantal_huiswerk": kind_data.get("aantal_huiswerk", 0),
-            "aantal_uitval": kind_data.get("aantal_uitval", 0),
-            "volgende_afspraak": kind_data.get("volgende_afspraak", "Geen"),
-            "volgende_vak": kind_data.get("volgende_vak", ""),
-        }
-
-        # Voeg extra data toe
-        for data_type in ["cijfers", "opdrachten", "absenties", "studiewijzers", "activiteiten"]:
-            if data_type in self._coordinator.data and self._kind_naam in self._coordinator.data[data_type]:
-                attributes[data_type] = self._coordinator.data[data_type][self._kind_naam]
-
-        return attributes
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
 
-class MagisterMainSensor(SensorEntity):
+class MagisterMainSensor(CoordinatorEntity[MagisterDataUpdateCoordinator], SensorEntity):
     """Hoofd sensor met alle Magister data."""
 
+    # Alleen last_update en de samenvatting gaan de recorder in
+    _unrecorded_attributes = frozenset({
+        "kinderen", "cijfers", "absenties", "opdrachten", "studiewijzers", "activiteiten", "berichten",
+    })
+
     def __init__(self, coordinator, name):
-        self._coordinator = coordinator
-        self._name = name
+        super().__init__(coordinator)
+        self._attr_name = name
         self._attr_unique_id = "magister_main_data"
 
     @property
-    def name(self):
-        return self._name
-
-    @property
-    def state(self):
+    def native_value(self):
         """Return de laatste update tijd."""
-        if self._coordinator.data:
-            return self._coordinator.data.get("last_update", "unknown")
+        if self.coordinator.data:
+            return self.coordinator.data.get("last_update", "unknown")
         return "unavailable"
 
-    @property
-    def extra_state_attributes(self):
-        """Return alle data als attributes."""
-        return self._coordinator.data or {}
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success
-
     async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        """When entity is added to hass."""
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-# Basis Kind Sensors
-class KindAantalAfsprakenSensor(SensorEntity):
-    """Sensor voor aantal afspraken vandaag."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_afspraken_vandaag"
-        self._attr_name = f"Magister {kind_naam} Afspraken Vandaag"
-        self._attr_icon = "mdi:calendar-today"
-
-    @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        return kind_data.get("aantal_afspraken_vandaag", 0) if kind_data else 0
+        await self.coordinator.async_request_sections(SECTIONS)
 
     @property
     def extra_state_attributes(self):
-        kind_data = self._get_kind_data()
-        return {
-            "kind_naam": self._kind_naam,
-            "afspraken_vandaag": kind_data.get("afspraken", []) if kind_data else []
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
+        """Return alle data als attributes."""
+        view = self.coordinator.view
+        return apply_budget(
+            {**view.as_dict, "samenvatting": view.samenvatting},
+            self.coordinator.attribute_budget,
         )
 
 
-class KindAantalHuiswerkSensor(SensorEntity):
-    """Sensor voor aantal huiswerk items."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_huiswerk"
-        self._attr_name = f"Magister {kind_naam} Huiswerk"
-        self._attr_icon = "mdi:book-education"
+class MagisterBerichtenSensor(CoordinatorEntity[MagisterDataUpdateCoordinator], SensorEntity):
+    """Aantal ongelezen berichten in het postvak in van het account."""
 
-    @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        return kind_data.get("aantal_huiswerk", 0) if kind_data else 0
+    _attr_icon = "mdi:email"
+    _unrecorded_attributes = frozenset({"berichten"})
 
-    @property
-    def extra_state_attributes(self):
-        return {
-            "kind_naam": self._kind_naam,
-            "huiswerk_items": self._coordinator.data.get("opdrachten", {}).get(self._kind_naam, []) if self._coordinator.data else []
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        base_id = coordinator.api.user.lower().replace(' ', '_')
+        self._attr_unique_id = f"magister_{base_id}_berichten"
+        self._attr_name = "Magister Berichten"
 
     async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-class KindVolgendeAfspraakSensor(SensorEntity):
-    """Sensor voor volgende afspraak."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_volgende_afspraak"
-        self._attr_name = f"Magister {kind_naam} Volgende Afspraak"
-        self._attr_icon = "mdi:clock-outline"
+        await self.coordinator.async_request_sections(ACCOUNT_SECTIONS)
 
     @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        return kind_data.get("volgende_afspraak", "Geen") if kind_data else "Geen"
+    def native_value(self):
+        return self.coordinator.inbox.aantal_ongelezen() if self.coordinator.inbox else None
 
     @property
     def extra_state_attributes(self):
-        kind_data = self._get_kind_data()
-        return {
-            "kind_naam": self._kind_naam,
-            "volgende_vak": kind_data.get("volgende_vak", "") if kind_data else ""
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
+        berichten = self.coordinator.view.berichten
+        return apply_budget(
+            {"laatste_berichten": berichten[:SUMMARY_ITEMS], "berichten": berichten},
+            self.coordinator.attribute_budget,
         )
 
-
-# Detail Sensors
-class KindCijfersSensor(SensorEntity):
-    """Sensor voor cijfers overzicht."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_cijfers"
-        self._attr_name = f"Magister {kind_naam} Cijfers"
-        self._attr_icon = "mdi:certificate"
-
-    @property
-    def state(self):
-        if not self._coordinator.data:
-            return 0
-        cijfers = self._coordinator.data.get("cijfers", {}).get(self._kind_naam, [])
-        return len(cijfers)
-
-    @property
-    def extra_state_attributes(self):
-        if not self._coordinator.data:
-            return {"kind_naam": self._kind_naam, "cijfers": [], "laatste_3_cijfers": []}
-        
-        cijfers = self._coordinator.data.get("cijfers", {}).get(self._kind_naam, [])
-        return {
-            "kind_naam": self._kind_naam,
-            "cijfers": cijfers,
-            "laatste_3_cijfers": cijfers[-3:] if cijfers else []
-        }
-
-    @property
-    def should_poll(self):
-        return False
-
     @property
     def available(self):
-        return self._coordinator.last_update_success
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
+        return super().available and "berichten" in (self.coordinator.data or {})
 
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-class KindAfsprakenSensor(SensorEntity):
-    """Sensor voor alle afspraken."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_afspraken"
-        self._attr_name = f"Magister {kind_naam} Afspraken"
-        self._attr_icon = "mdi:calendar"
-
-    @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        afspraken = kind_data.get("afspraken", []) if kind_data else []
-        return len(afspraken)
 
-    @property
-    def extra_state_attributes(self):
-        kind_data = self._get_kind_data()
-        afspraken = kind_data.get("afspraken", []) if kind_data else []
-        return {
-            "kind_naam": self._kind_naam,
-            "afspraken": afspraken,
-            "afspraken_vandaag": kind_data.get("aantal_afspraken_vandaag", 0) if kind_data else 0,
-            "uitval": [a for a in afspraken if a.get("is_uitval")],
-            "aantal_uitval": kind_data.get("aantal_uitval", 0) if kind_data else 0
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
+class MagisterKindSensor(CoordinatorEntity[MagisterDataUpdateCoordinator], SensorEntity):
+    """Sensor voor één kind, gedefinieerd door een MagisterSensorEntityDescription."""
 
-    @property
-    def should_poll(self):
-        return False
+    entity_description: MagisterSensorEntityDescription
 
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
+    # Volledige lijsten niet in de recorder; aantallen en laatste items wel.
+    # Dit is per klasse, dus de vereniging over alle beschrijvingen.
+    _unrecorded_attributes = frozenset({
+        "aanmeldingen", "afspraken", "afspraken_vandaag", "wijzigingen", "uitval",
+        "cijfers", "opdrachten", "open_opdrachten", "huiswerk_items",
+        "absenties", "studiewijzers", "activiteiten",
+    })
 
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-class KindRoosterWijzigingenSensor(SensorEntity):
-    """Sensor voor roosterwijzigingen."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
+    def __init__(self, coordinator, kind_naam, base_id, description: MagisterSensorEntityDescription):
+        super().__init__(coordinator)
+        self.entity_description = description
         self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_wijzigingen"
-        self._attr_name = f"Magister {kind_naam} Roosterwijzigingen"
-        self._attr_icon = "mdi:calendar-alert"
-
-    @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        wijzigingen = kind_data.get("wijzigingen", []) if kind_data else []
-        return len(wijzigingen)
-
-    @property
-    def extra_state_attributes(self):
-        kind_data = self._get_kind_data()
-        return {
-            "kind_naam": self._kind_naam,
-            "wijzigingen": kind_data.get("wijzigingen", []) if kind_data else []
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
+        self._attr_unique_id = f"magister_{base_id}_{description.key}"
+        self._attr_name = " ".join(filter(None, ["Magister", kind_naam, description.name_suffix]))
 
     async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-class KindOpdrachtenSensor(SensorEntity):
-    """Sensor voor opdrachten."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_opdrachten"
-        self._attr_name = f"Magister {kind_naam} Opdrachten"
-        self._attr_icon = "mdi:clipboard-list"
+        # Alleen de onderdelen die deze sensor toont, samengevoegd met andere verzoeken
+        await self.coordinator.async_request_sections(self.entity_description.sections)
 
     @property
-    def state(self):
-        if not self._coordinator.data:
-            return 0
-        opdrachten = self._coordinator.data.get("opdrachten", {}).get(self._kind_naam, [])
-        return len(opdrachten)
-
-    @property
-    def extra_state_attributes(self):
-        if not self._coordinator.data:
-            return {"kind_naam": self._kind_naam, "opdrachten": [], "open_opdrachten": []}
-        
-        opdrachten = self._coordinator.data.get("opdrachten", {}).get(self._kind_naam, [])
-        return {
-            "kind_naam": self._kind_naam,
-            "opdrachten": opdrachten,
-            "open_opdrachten": [o for o in opdrachten if not o.get("ingeleverd_op")]
-        }
+    def _kind(self) -> KindView:
+        return self.coordinator.view.kind(self._kind_naam)
 
     @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
-
-class KindAbsentiesSensor(SensorEntity):
-    """Sensor voor absenties."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_absenties"
-        self._attr_name = f"Magister {kind_naam} Absenties"
-        self._attr_icon = "mdi:account-clock"
-
-    @property
-    def state(self):
-        if not self._coordinator.data:
-            return 0
-        absenties = self._coordinator.data.get("absenties", {}).get(self._kind_naam, [])
-        return len(absenties)
+    def native_value(self):
+        return self.entity_description.value_fn(self._kind)
 
     @property
     def extra_state_attributes(self):
-        if not self._coordinator.data:
-            return {"kind_naam": self._kind_naam, "absenties": [], "recente_absenties": []}
-        
-        absenties = self._coordinator.data.get("absenties", {}).get(self._kind_naam, [])
-        return {
-            "kind_naam": self._kind_naam,
-            "absenties": absenties,
-            "recente_absenties": absenties[-5:] if absenties else []
-        }
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
+        return apply_budget(
+            self.entity_description.attrs_fn(self._kind),
+            self.coordinator.attribute_budget,
         )
 
-
-class KindStudiewijzersSensor(SensorEntity):
-    """Sensor voor studiewijzers."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_studiewijzers"
-        self._attr_name = f"Magister {kind_naam} Studiewijzers"
-        self._attr_icon = "mdi:book-open-variant"
-
-    @property
-    def state(self):
-        if not self._coordinator.data:
-            return 0
-        studiewijzers = self._coordinator.data.get("studiewijzers", {}).get(self._kind_naam, [])
-        return len(studiewijzers)
-
-    @property
-    def extra_state_attributes(self):
-        if not self._coordinator.data:
-            return {"kind_naam": self._kind_naam, "studiewijzers": []}
-        
-        studiewijzers = self._coordinator.data.get("studiewijzers", {}).get(self._kind_naam, [])
-        return {
-            "kind_naam": self._kind_naam,
-            "studiewijzers": studiewijzers
-        }
-
-    @property
-    def should_poll(self):
-        return False
-
     @property
     def available(self):
-        return self._coordinator.last_update_success
+        if not super().available:
+            return False
+        return not self.entity_description.needs_kind_data or self._kind.data is not None
 
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
 
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
+class MagisterVakSensor(CoordinatorEntity[MagisterDataUpdateCoordinator], SensorEntity):
+    """Gewogen gemiddelde van één vak voor één kind."""
 
+    _attr_icon = "mdi:chart-line"
+    _attr_state_class = SensorStateClass.MEASUREMENT
 
-class KindActiviteitenSensor(SensorEntity):
-    """Sensor voor activiteiten."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
+    def __init__(self, coordinator, kind_naam, vak):
+        super().__init__(coordinator)
         self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_activiteiten"
-        self._attr_name = f"Magister {kind_naam} Activiteiten"
-        self._attr_icon = "mdi:calendar-star"
-
-    @property
-    def state(self):
-        if not self._coordinator.data:
-            return 0
-        activiteiten = self._coordinator.data.get("activiteiten", {}).get(self._kind_naam, [])
-        return len(activiteiten)
-
-    @property
-    def extra_state_attributes(self):
-        if not self._coordinator.data:
-            return {"kind_naam": self._kind_naam, "activiteiten": []}
-        
-        activiteiten = self._coordinator.data.get("activiteiten", {}).get(self._kind_naam, [])
-        return {
-            "kind_naam": self._kind_naam,
-            "activiteiten": activiteiten
-        }
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success
+        self._vak = vak
+        base_id = kind_naam.lower().replace(' ', '_')
+        vak_id = vak.lower().replace(' ', '_')
+        self._attr_unique_id = f"magister_{base_id}_gemiddelde_{vak_id}"
+        self._attr_name = f"Magister {kind_naam} Gemiddelde {vak}"
 
     async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
-
+        await self.coordinator.async_request_sections(("cijfers",))
 
-class KindAanmeldingenSensor(SensorEntity):
-    """Sensor voor aanmeldingen."""
-    
-    def __init__(self, coordinator, kind_naam, base_id):
-        self._coordinator = coordinator
-        self._kind_naam = kind_naam
-        self._attr_unique_id = f"magister_{base_id}_aanmeldingen"
-        self._attr_name = f"Magister {kind_naam} Aanmeldingen"
-        self._attr_icon = "mdi:school"
+    def _stats(self):
+        store = self.coordinator.grades.get(self._kind_naam)
+        return store.vakken.get(self._vak) if store else None
 
     @property
-    def state(self):
-        kind_data = self._get_kind_data()
-        aanmeldingen = kind_data.get("aanmeldingen", []) if kind_data else []
-        return len(aanmeldingen)
+    def native_value(self):
+        stats = self._stats()
+        return stats.totaal.gemiddelde if stats else None
 
     @property
     def extra_state_attributes(self):
-        kind_data = self._get_kind_data()
-        return {
-            "kind_naam": self._kind_naam,
-            "aanmeldingen": kind_data.get("aanmeldingen", []) if kind_data else []
-        }
-
-    def _get_kind_data(self):
-        if not self._coordinator.data:
-            return None
-        return self._coordinator.data.get("kinderen", {}).get(self._kind_naam)
-
-    @property
-    def should_poll(self):
-        return False
-
-    @property
-    def available(self):
-        return self._coordinator.last_update_success and self._get_kind_data() is not None
-
-    async def async_update(self):
-        await self._coordinator.async_request_refresh()
-
-    async def async_added_to_hass(self):
-        self.async_on_remove(
-            self._coordinator.async_add_listener(self.async_write_ha_state)
-        )
+        stats = self._stats()
+        if not stats:
+            return {"kind_naam": self._kind_naam, "vak": self._vak}
+        attributes = stats.as_dict()
+        del attributes["gemiddelde"]
+        return {"kind_naam": self._kind_naam, "vak": self._vak, **attributes}
@@ -0,0 +1,56 @@
+"""Welke kinderen / leerlingen per poll opgehaald worden.
+
+Een ouderaccount met een paar kinderen haalt ze elke poll allemaal op. Een
+account met veel leerlingen (mentor, groot gezin) kan dat niet binnen het
+tijdsbudget: daar worden alleen de in de opties gekozen leerlingen gevolgd,
+en per poll maar een schijf (`shard_size`) daarvan, om de beurt. Zonder
+keuze wordt bij zo'n account alleen de lijst opgehaald, behalve bij entries
+die al bestonden voor die grens (`max_kinderen=None`): die halen alles op.
+
+Geen Home Assistant imports.
+"""
+
+# Tot zoveel kinderen worden zonder keuze in de opties allemaal opgehaald
+AUTO_KINDEREN = 6
+
+DEFAULT_SHARD_SIZE = 10
+
+
+class Shards:
+    """Round-robin over de gekozen kind-ids."""
+
+    def __init__(self, kind_ids=None, shard_size=DEFAULT_SHARD_SIZE, max_kinderen=AUTO_KINDEREN):
+        # None: geen keuze gemaakt, alle kinderen (tot max_kinderen)
+        self.kind_ids = [str(i) for i in kind_ids] if kind_ids else None
+        self.shard_size = max(1, shard_size)
+        # Zonder keuze: boven dit aantal alleen de lijst; None is geen grens
+        self.max_kinderen = max_kinderen
+        self._pos = 0
+
+    @property
+    def sharded(self):
+        """Of een poll maar een deel van de kinderen ophaalt."""
+        return self.kind_ids is not None and len(self.kind_ids) > self.shard_size
+
+    def next(self):
+        """kwargs voor get_data: de kinderen voor deze poll."""
+        if self.kind_ids is None:
+            return {"kind_ids": None, "max_kinderen": self.max_kinderen}
+        if not self.sharded:
+            return {"kind_ids": list(self.kind_ids), "max_kinderen": None}
+        start = self._pos % len(self.kind_ids)
+        self._pos = start + self.shard_size
+        return {
+            "kind_ids": [self.kind_ids[(start + i) % len(self.kind_ids)] for i in range(self.shard_size)],
+            "max_kinderen": None,
+        }
+
+    def current(self):
+        """kwargs voor een tussentijdse refresh: de laatst opgehaalde schijf, niet verder draaien."""
+        if not self.sharded:
+            return self.next()
+        start = (self._pos - self.shard_size) % len(self.kind_ids)
+        return {
+            "kind_ids": [self.kind_ids[(start + i) % len(self.kind_ids)] for i in range(self.shard_size)],
+            "max_kinderen": None,
+        }
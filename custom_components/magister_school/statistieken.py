@@ -0,0 +1,172 @@
+"""Cijfergemiddelden en absenties als lange-termijn statistieken.
+
+Per kind en vak een externe statistiek `magister_school:<kind>_gemiddelde_<vak>`
+(het lopende gewogen gemiddelde, plus `<kind>_gemiddelde` over alle vakken)
+en per kind `magister_school:<kind>_absenties` (cumulatief aantal). Van de
+gemiddelden worden na elke refresh alleen de uren na het laatst geïmporteerde
+uur toegevoegd; cijfers komen in volgorde van invoer binnen.
+
+Absenties niet: een absentie kan later geregistreerd worden dan hij begint,
+of al vooruit (tot een week). Die reeks wordt daarom elke keer opnieuw
+opgebouwd uit de hele lijst (het ophaalvenster van een jaar) en alleen de
+uren die anders zijn dan wat er al staat worden overschreven. Uren in de
+toekomst komen pas als ze voorbij zijn.
+"""
+import logging
+from datetime import datetime, timezone
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics, get_last_statistics, statistics_during_period,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DOMAIN
+from .grades import gemiddelde_reeks
+from .schedule import parse_local
+
+_LOGGER = logging.getLogger(__name__)
+
+# Begin van de opgevraagde bestaande absentie-reeks
+REEKS_BEGIN = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def aantal_per_uur(tijden):
+    """[(uur, aantal), ...] oud -> nieuw voor 'YYYY-MM-DD HH:MM:SS' tijden."""
+    per_uur = {}
+    for tijd in tijden:
+        uur = (tijd or "")[:13]
+        if len(uur) == 13:
+            per_uur[uur] = per_uur.get(uur, 0) + 1
+    return sorted(per_uur.items())
+
+
+class StatisticsImporter:
+    """Houdt per statistiek het laatst geïmporteerde uur (en de som) bij."""
+
+    def __init__(self, hass: HomeAssistant):
+        self.hass = hass
+        # statistic_id -> (start timestamp of None, laatste gemiddelde)
+        self._last = {}
+        # statistic_id -> {start timestamp: som} zoals in de recorder
+        self._sommen = {}
+
+    async def async_import(self, data, kinderen_gemiddelden):
+        """
+        Importeer de nieuwe punten uit een snapshot. Gemiddelden alleen voor
+        `kinderen_gemiddelden`: kinderen van wie het hele schooljaar al binnen
+        is, anders zou een later aangevuld cijfer niet meer meetellen.
+        """
+        added = 0
+        for kind_naam, cijfers in (data.get("cijfers") or {}).items():
+            if kind_naam not in kinderen_gemiddelden:
+                continue
+            for vak, punten in gemiddelde_reeks(cijfers).items():
+                if vak == "":
+                    continue
+                naam = f"{kind_naam} gemiddelde {vak}" if vak else f"{kind_naam} gemiddelde"
+                added += await self._async_add(naam, punten)
+        for kind_naam, absenties in (data.get("absenties") or {}).items():
+            punten = aantal_per_uur(a.start for a in absenties)
+            added += await self._async_add_som(f"{kind_naam} absenties", punten)
+        return added
+
+    async def _async_last(self, statistic_id):
+        if statistic_id not in self._last:
+            result = await get_instance(self.hass).async_add_executor_job(
+                get_last_statistics, self.hass, 1, statistic_id, True, {"mean"}
+            )
+            last = (None, 0.0)
+            if rows := result.get(statistic_id):
+                last = (_timestamp(rows[0]["start"]), rows[0].get("mean") or 0.0)
+            self._last[statistic_id] = last
+        return self._last[statistic_id]
+
+    async def _async_sommen(self, statistic_id):
+        if statistic_id not in self._sommen:
+            result = await get_instance(self.hass).async_add_executor_job(
+                statistics_during_period, self.hass, REEKS_BEGIN, None,
+                {statistic_id}, "hour", None, {"sum"},
+            )
+            self._sommen[statistic_id] = {
+                _timestamp(row["start"]): row.get("sum") or 0.0 for row in result.get(statistic_id, [])
+            }
+        return self._sommen[statistic_id]
+
+    def _metadata(self, naam, statistic_id, som):
+        return StatisticMetaData(
+            has_mean=not som,
+            has_sum=som,
+            name=f"Magister {naam}",
+            source=DOMAIN,
+            statistic_id=statistic_id,
+            unit_of_measurement=None,
+        )
+
+    async def _async_add(self, naam, punten):
+        """Voeg de gemiddelden na het laatst geïmporteerde uur toe; geeft het aantal."""
+        statistic_id = f"{DOMAIN}:{slugify(naam)}"
+        last_start, laatste = await self._async_last(statistic_id)
+        tz = dt_util.get_default_time_zone()
+        statistics = []
+        for uur, waarde in punten:
+            start = parse_local(f"{uur}:00:00", tz)
+            if start is None or (last_start is not None and start.timestamp() < last_start):
+                continue
+            if start.timestamp() == last_start and waarde == laatste:
+                # al geïmporteerd; een gewijzigd gemiddelde van dat uur wel opnieuw (upsert)
+                continue
+            statistics.append(StatisticData(start=start, state=waarde, mean=waarde, min=waarde, max=waarde))
+        if not statistics:
+            return 0
+
+        async_add_external_statistics(self.hass, self._metadata(naam, statistic_id, False), statistics)
+        self._last[statistic_id] = (statistics[-1]["start"].timestamp(), statistics[-1]["mean"])
+        _LOGGER.debug("Magister statistiek %s: %d punten", statistic_id, len(statistics))
+        return len(statistics)
+
+    async def _async_add_som(self, naam, punten):
+        """
+        Bouw de cumulatieve reeks opnieuw op uit alle `punten` en overschrijf
+        de uren die anders zijn dan in de recorder; geeft het aantal.
+        """
+        statistic_id = f"{DOMAIN}:{slugify(naam)}"
+        bestaand = await self._async_sommen(statistic_id)
+        tz = dt_util.get_default_time_zone()
+        nu = dt_util.utcnow().timestamp()
+        aantallen = {}
+        for uur, waarde in punten:
+            start = parse_local(f"{uur}:00:00", tz)
+            if start is not None and start.timestamp() <= nu:
+                aantallen[start.timestamp()] = aantallen.get(start.timestamp(), 0) + waarde
+        if not aantallen:
+            return 0
+
+        # Wat voor het ophaalvenster ligt telt mee als beginstand
+        begin = min(aantallen)
+        totaal = max(
+            ((start, som) for start, som in bestaand.items() if start < begin), default=(None, 0.0)
+        )[1]
+        statistics = []
+        # Ook uren die niet meer in de lijst staan (absentie verplaatst of
+        # verwijderd) krijgen de juiste stand, anders springt de som terug
+        for start in sorted(set(aantallen) | {s for s in bestaand if s >= begin}):
+            aantal = aantallen.get(start, 0)
+            totaal += aantal
+            if bestaand.get(start) != totaal:
+                statistics.append(StatisticData(
+                    start=dt_util.utc_from_timestamp(start), state=aantal, sum=totaal
+                ))
+                bestaand[start] = totaal
+        if not statistics:
+            return 0
+
+        async_add_external_statistics(self.hass, self._metadata(naam, statistic_id, True), statistics)
+        _LOGGER.debug("Magister statistiek %s: %d punten", statistic_id, len(statistics))
+        return len(statistics)
+
+
+def _timestamp(start):
+    return start.timestamp() if isinstance(start, datetime) else start
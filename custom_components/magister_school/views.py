@@ -0,0 +1,170 @@
+"""Afgeleide waarden van één snapshot, gedeeld door alle entities.
+
+De coordinator maakt per nieuwe snapshot één `SnapshotView`. Elke afgeleide
+waarde (dict-lijsten voor attributes, uitval, open opdrachten, ...) wordt
+pas bij het eerste gebruik berekend en daarna door alle sensors gedeeld,
+tot de volgende refresh een nieuwe snapshot oplevert.
+
+Geen Home Assistant imports.
+"""
+from functools import cached_property
+
+from .attachments import bijlage_key
+from .records import as_dicts, snapshot_as_dict
+
+# Secties die per kind naast 'kinderen' in de snapshot staan
+KIND_SECTIONS = ["cijfers", "opdrachten", "absenties", "studiewijzers", "activiteiten"]
+
+# Kind-velden die met het rooster meekomen
+ROOSTER_FIELDS = (
+    "rooster_van", "rooster_tot", "aantal_afspraken_vandaag", "aantal_huiswerk",
+    "aantal_huiswerk_afgerond", "aantal_uitval", "volgende_afspraak", "volgende_vak",
+)
+
+
+class KindView:
+    """Eén kind binnen een snapshot."""
+
+    def __init__(self, snapshot, naam, grades=None):
+        self._snapshot = snapshot
+        self.naam = naam
+        # GradeStore van dit kind (over alle snapshots heen), of None
+        self.grades = grades
+        # None als het kind niet (meer) in de snapshot staat
+        self.data = snapshot.get("kinderen", {}).get(naam)
+
+    def get(self, key, default=None):
+        return self.data.get(key, default) if self.data else default
+
+    def section(self, name):
+        """Records van dit kind in een van de KIND_SECTIONS."""
+        return self._snapshot.get(name, {}).get(self.naam, [])
+
+    def has_section(self, name):
+        return self.naam in self._snapshot.get(name, {})
+
+    @cached_property
+    def aanmeldingen(self):
+        return as_dicts(self.get("aanmeldingen", []))
+
+    @cached_property
+    def afspraken(self):
+        return as_dicts(self.get("afspraken", []))
+
+    @cached_property
+    def wijzigingen(self):
+        return as_dicts(self.get("wijzigingen", []))
+
+    @cached_property
+    def uitval(self):
+        return as_dicts([a for a in self.get("afspraken", []) if a.is_uitval])
+
+    @cached_property
+    def cijfers(self):
+        return as_dicts(self.section("cijfers"))
+
+    @cached_property
+    def opdrachten(self):
+        return as_dicts(self.section("opdrachten"))
+
+    @cached_property
+    def open_opdrachten(self):
+        return as_dicts([o for o in self.section("opdrachten") if not o.ingeleverd_op])
+
+    @cached_property
+    def absenties(self):
+        return as_dicts(self.section("absenties"))
+
+    @cached_property
+    def studiewijzers(self):
+        return as_dicts(self.section("studiewijzers"))
+
+    @cached_property
+    def activiteiten(self):
+        return as_dicts(self.section("activiteiten"))
+
+    @cached_property
+    def bijlagen(self):
+        """[(context, Bijlage)] uit opdrachten en studiewijzer-onderdelen."""
+        result = []
+        for opdracht in self.section("opdrachten"):
+            result.extend((opdracht.titel, b) for b in opdracht.bijlagen)
+        for studiewijzer in self.section("studiewijzers"):
+            for onderdeel in studiewijzer.onderdelen:
+                context = f"{studiewijzer.titel} / {onderdeel.titel}"
+                result.extend((context, b) for b in onderdeel.bijlagen)
+        return result
+
+    @cached_property
+    def analyse(self):
+        """Gemiddelden per vak uit de GradeStore."""
+        return self.grades.analytics() if self.grades is not None else {}
+
+    @cached_property
+    def samenvatting(self):
+        """Aantallen per soort, voor de hoofd sensor."""
+        return {
+            "afspraken": len(self.get("afspraken", [])),
+            "wijzigingen": len(self.get("wijzigingen", [])),
+            **{name: len(self.section(name)) for name in KIND_SECTIONS},
+        }
+
+
+class SnapshotView:
+    """Alle afgeleide waarden van één coordinator-snapshot."""
+
+    def __init__(self, data, grades=None):
+        self.data = data or {}
+        self._grades = grades if grades is not None else {}
+        self._kinderen = {}
+
+    def kind(self, naam):
+        if (view := self._kinderen.get(naam)) is None:
+            view = self._kinderen[naam] = KindView(self.data, naam, self._grades.get(naam))
+        return view
+
+    @cached_property
+    def as_dict(self):
+        return snapshot_as_dict(self.data)
+
+    @cached_property
+    def bijlagen(self):
+        """{bijlage_key: (kind_naam, context, Bijlage)} van alle downloadbare bijlagen."""
+        return {
+            bijlage_key(bijlage): (naam, context, bijlage)
+            for naam in self.data.get("kinderen", {})
+            for context, bijlage in self.kind(naam).bijlagen
+            if bijlage.href and bijlage.id is not None
+        }
+
+    def bijlage(self, key):
+        """(kind_naam, context, Bijlage) voor een bijlage_key, of None."""
+        return self.bijlagen.get(str(key))
+
+    @cached_property
+    def samenvatting(self):
+        return {naam: self.kind(naam).samenvatting for naam in self.data.get("kinderen", {})}
+
+    def subscription(self, naam, sections):
+        """Data van één kind voor de websocket: alleen de gevraagde SECTIONS, als dicts."""
+        kind = self.kind(naam)
+        data = {"kind": naam, "last_update": self.data.get("last_update")}
+        if kind.data is not None and "rooster" in sections:
+            data["afspraken"] = kind.afspraken
+            data["wijzigingen"] = kind.wijzigingen
+            data.update({field: kind.get(field) for field in ROOSTER_FIELDS})
+        for name in KIND_SECTIONS:
+            if name in sections and kind.has_section(name):
+                data[name] = getattr(kind, name)
+        if "berichten" in sections and "berichten" in self.data:
+            data["berichten"] = self.berichten
+            data["ongelezen"] = self.data["berichten"].get("ongelezen")
+        return data
+
+    @cached_property
+    def berichten(self):
+        """Bewaarde berichten zonder inhoud, nieuwste eerst."""
+        return [
+            {k: v for k, v in bericht.items() if k != "inhoud"}
+            for bericht in as_dicts((self.data.get("berichten") or {}).get("items"))
+        ]
@@ -0,0 +1,80 @@
+"""Websocket API voor dashboard-kaarten.
+
+`magister_school/subscribe` stuurt eenmalig de data van één kind (alleen de
+gevraagde onderdelen) en daarna na elke refresh alleen een JSON-patch met de
+verschillen, in plaats van telkens alle attributes van een sensor. Wordt de
+entry herladen of verwijderd, dan eindigt het abonnement met een fout en moet
+de kaart opnieuw abonneren.
+"""
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+from .coordinator import MagisterDataUpdateCoordinator
+from .patch import json_patch
+from .records import SECTIONS
+
+
+@callback
+def async_setup_websocket(hass: HomeAssistant):
+    websocket_api.async_register_command(hass, websocket_subscribe)
+
+
+def _find_coordinator(hass, entry_id, kind_naam):
+    for key, coordinator in hass.data.get(DOMAIN, {}).items():
+        if not isinstance(coordinator, MagisterDataUpdateCoordinator):
+            continue
+        if (entry_id is None or key == entry_id) and kind_naam in coordinator.kinderen:
+            return coordinator
+    return None
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): "magister_school/subscribe",
+    vol.Required("kind"): str,
+    vol.Optional("entry_id"): str,
+    vol.Optional("sections", default=list(SECTIONS)): [vol.In(SECTIONS)],
+})
+@callback
+def websocket_subscribe(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict):
+    """Abonneer op één kind; events bevatten `snapshot` (eerste) of `patch`."""
+    kind_naam = msg["kind"]
+    coordinator = _find_coordinator(hass, msg.get("entry_id"), kind_naam)
+    if coordinator is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, f"Onbekend kind: {kind_naam}")
+        return
+
+    sections = set(msg["sections"])
+    last = coordinator.view.subscription(kind_naam, sections)
+
+    @callback
+    def _async_send_patch():
+        nonlocal last
+        data = coordinator.view.subscription(kind_naam, sections)
+        if ops := json_patch(last, data):
+            connection.send_message(websocket_api.event_message(msg["id"], {"patch": ops}))
+        last = data
+
+    remove_listener = coordinator.async_add_listener(_async_send_patch)
+
+    @callback
+    def _async_shutdown():
+        # Deze coordinator stuurt niets meer; de herladen entry heeft een nieuwe
+        connection.subscriptions.pop(msg["id"], None)
+        remove_listener()
+        connection.send_error(
+            msg["id"], websocket_api.ERR_HOME_ASSISTANT_ERROR, "Magister entry gestopt; opnieuw abonneren",
+        )
+
+    remove_shutdown = coordinator.async_on_shutdown(_async_shutdown)
+
+    @callback
+    def _async_unsubscribe():
+        remove_listener()
+        remove_shutdown()
+
+    connection.subscriptions[msg["id"]] = _async_unsubscribe
+    connection.send_result(msg["id"])
+    connection.send_message(websocket_api.event_message(msg["id"], {"snapshot": last}))
@@ -0,0 +1,206 @@
+#!/usr/bin/python3 -P
+"""
+Long-lived Magister worker process.
+
+Home Assistant starts this script once and talks to it over stdin/stdout,
+one JSON object per line:
+
+    > {"id": 1, "op": "fetch", "account": {...}, "metadata": {...}}
+    < {"id": 1, "ok": true, "result": {...}}
+
+Per account the logged-in Magister object (cookie jar, access token,
+keep-alive connections) stays in memory between requests, so a poll
+normally needs no login at all.
+
+Errors are answered with {"ok": false, "error": "auth" | "error", "message": ...}.
+"""
+import os
+import sys
+if not __package__:
+    # Als script of los module ("python3 -P worker.py"): de zusjes (records, ...)
+    # als package laden, zonder __init__.py (dat Home Assistant importeert).
+    # De map zelf hoort niet vooraan op sys.path: calendar.py (HA platform)
+    # zou dan de stdlib 'calendar' overschaduwen, vandaar -P.
+    if __name__ == "__main__" and os.path.abspath(sys.path[0] or os.curdir) == os.path.dirname(os.path.abspath(__file__)):
+        sys.exit("Start met: python3 -P worker.py")
+    import types
+    if "magister_school" not in sys.modules:
+        _package = types.ModuleType("magister_school")
+        _package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules["magister_school"] = _package
+    __package__ = "magister_school"
+import json
+import traceback
+from datetime import datetime, timezone, timedelta
+
+from .magister import (
+    Magister, LoginError, make_parser, prepare_args, authenticate,
+    get_account, check_info, collect, schedule_range, fetch_cijfers, fetch_bericht, bijlage_location, token_expiry,
+    markeer_huiswerk,
+)
+from .records import json_default
+
+
+class AuthFailed(Exception):
+    pass
+
+
+class Session:
+    """
+    Logged-in state for one Magister account.
+    """
+    def __init__(self, account):
+        self.account = account
+        argv = [
+            "--json", "--keepalive",
+            "--schoolserver", f"{account['school']}.magister.net",
+            "--username", account["user"],
+            "--password", account["password"],
+            "--authcode", account.get("authcode") or "00000000000000000000000000000000",
+        ]
+        if account.get("totp_secret"):
+            argv += ["--totp-secret", account["totp_secret"]]
+        if account.get("session_file"):
+            argv += ["--session", account["session_file"]]
+        self.args = make_parser().parse_args(argv)
+        prepare_args(self.args)
+        self.mg = Magister(self.args)
+
+    def matches(self, account):
+        return all(self.account.get(k) == account.get(k) for k in ("password", "totp_secret", "session_file"))
+
+    def ensure_login(self, access_token=None):
+        """
+        Make sure there is an access token that is valid for a few more minutes.
+        """
+        mg = self.mg
+        if access_token and not mg.access_token:
+            mg.access_token = access_token
+            mg.token_expires = token_expiry(access_token)
+        if mg.access_token and mg.token_expires > datetime.now(timezone.utc) + timedelta(minutes=5):
+            return
+        if not authenticate(mg, self.args):
+            raise AuthFailed("Login failed")
+
+    def close(self):
+        for handler in self.mg.opener.handlers:
+            if hasattr(handler, "connections"):
+                handler.close()
+
+
+def _key(account):
+    return f"{account['school']}|{account['user']}"
+
+
+class Worker:
+    def __init__(self):
+        self.sessions = {}
+
+    def session(self, account):
+        key = _key(account)
+        s = self.sessions.get(key)
+        if s is None or not s.matches(account):
+            if s:
+                s.close()
+            s = self.sessions[key] = Session(account)
+        return s
+
+    def run_logged_in(self, s, func, access_token=None):
+        """
+        Run func with a valid token; when the token turns out to be rejected
+        (no account info) log in once more and retry.
+        """
+        s.ensure_login(access_token)
+        try:
+            return func()
+        except LoginError:
+            s.mg.access_token = None
+            s.ensure_login()
+            try:
+                return func()
+            except LoginError as e:
+                raise AuthFailed(str(e))
+
+    def handle(self, req):
+        op = req.get("op")
+        if op == "ping":
+            return "pong"
+        if op == "forget":
+            if s := self.sessions.pop(_key(req["account"]), None):
+                s.close()
+            return None
+
+        s = self.session(req["account"])
+        metadata = req.get("metadata") or {}
+        token = req.get("access_token")
+
+        if op == "check":
+            # Echt inloggen: een bewaard token of sessie zegt niets over het wachtwoord
+            if not authenticate(s.mg, s.args, silent=False):
+                # onjuiste gegevens niet in het geheugen houden
+                self.sessions.pop(_key(req["account"]), None)
+                raise AuthFailed("Login failed")
+            return self.run_logged_in(s, lambda: check_info(s.mg, get_account(s.mg, s.args, {})))
+        if op == "fetch":
+            return self.run_logged_in(
+                s,
+                lambda: collect(
+                    s.mg, s.args, metadata,
+                    cijfer_cursors=req.get("cijfer_cursors"),
+                    sections=req.get("sections"),
+                    budget=req.get("budget"),
+                    priority=req.get("priority"),
+                    schedule_weeks=req.get("schedule_weeks"),
+                    berichten_cursor=req.get("berichten_cursor"),
+                    kind_ids=req.get("kind_ids"),
+                    max_kinderen=req.get("max_kinderen"),
+                ),
+                token,
+            )
+        if op == "schedule":
+            return self.run_logged_in(
+                s, lambda: schedule_range(s.mg, metadata, req["kind_id"], req["van"], req["tot"]), token
+            )
+        if op == "cijfers":
+            return self.run_logged_in(
+                s, lambda: fetch_cijfers(s.mg, req["kind_id"], req.get("top", 50), req.get("skip", 0)), token
+            )
+        if op == "bericht":
+            return self.run_logged_in(s, lambda: fetch_bericht(s.mg, req["bericht_id"]), token)
+        if op == "huiswerk":
+            return self.run_logged_in(
+                s, lambda: markeer_huiswerk(s.mg, req["kind_id"], req["afspraak_id"], req.get("afgerond", True)), token
+            )
+        if op == "bijlage_location":
+            # Alleen de opslaglocatie: het bestand zelf haalt Home Assistant op
+            return self.run_logged_in(s, lambda: bijlage_location(s.mg, req["href"]), token)
+        raise ValueError(f"unknown op {op!r}")
+
+
+def main():
+    # stdout is exclusief voor het protocol; alle andere uitvoer naar stderr
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    worker = Worker()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+        except ValueError:
+            continue
+        resp = {"id": req.get("id")}
+        try:
+            resp["result"] = worker.handle(req)
+            resp["ok"] = True
+        except AuthFailed as e:
+            resp.update(ok=False, error="auth", message=str(e))
+        except Exception as e:
+            resp.update(ok=False, error="error", message=f"{e}\n{traceback.format_exc()}")
+        out.write(json.dumps(resp, ensure_ascii=False, separators=(',', ':'), default=json_default) + "\n")
+        out.flush()
+
+
+if __name__ == '__main__':
+    main()
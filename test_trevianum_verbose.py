@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 import sys
-sys.path.insert(0, 'custom_components/magister_school')
+sys.path.append('custom_components/magister_school')
 
 # Patch sys.argv
 sys.argv = [
@@ -0,0 +1,17 @@
+"""
+De HA-vrije modules van de integratie testen zonder Home Assistant.
+
+`custom_components/magister_school/__init__.py` importeert Home Assistant;
+daarom wordt de map hier als kaal package `magister_school` geregistreerd,
+zodat `from magister_school.grades import ...` alleen die module laadt.
+"""
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = Path(__file__).resolve().parent.parent / "custom_components" / "magister_school"
+
+if "magister_school" not in sys.modules:
+    package = types.ModuleType("magister_school")
+    package.__path__ = [str(PACKAGE)]
+    sys.modules["magister_school"] = package
@@ -0,0 +1,33 @@
+import hashlib
+import io
+
+import pytest
+
+from magister_school.attachments import inline_type, write_stream
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("image/png", "image/png"),
+    ("IMAGE/JPEG; charset=binary", "image/jpeg"),
+    ("audio/mpeg", "audio/mpeg"),
+    ("video/mp4", "video/mp4"),
+    ("application/pdf", "application/pdf"),
+    ("image/svg+xml", None),
+    ("text/html", None),
+    ("application/xhtml+xml", None),
+    ("text/xml", None),
+    ("application/octet-stream", None),
+    ("image/", None),
+    ("", None),
+    (None, None),
+])
+def test_only_passive_types_are_inline(content_type, expected):
+    assert inline_type(content_type) == expected
+
+
+def test_write_stream_names_file_by_content(tmp_path):
+    data = b"x" * 100_000
+    result = write_stream(io.BytesIO(data), str(tmp_path), chunk_size=4096)
+    assert result == {"sha256": hashlib.sha256(data).hexdigest(), "size": len(data)}
+    assert (tmp_path / result["sha256"]).read_bytes() == data
+    assert not list(tmp_path.glob("*.part"))
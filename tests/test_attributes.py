@@ -0,0 +1,59 @@
+import copy
+import json
+
+import pytest
+
+from magister_school.attributes import MORE_AVAILABLE, _size, apply_budget
+
+
+def attributes(n_cijfers=200, n_afspraken=3):
+    return {
+        "gemiddelde": 7.1,
+        "cijfers": [{"vak": "wi", "waarde": f"{i % 10},0", "omschrijving": "toets " * 5} for i in range(n_cijfers)],
+        "kinderen": {"Anna": {"afspraken": [{"start": f"2026-10-{i + 1:02d}"} for i in range(n_afspraken)]}},
+    }
+
+
+@pytest.mark.parametrize("budget", [None, 0, -1])
+def test_no_budget_means_unlimited(budget):
+    data = attributes()
+    assert apply_budget(data, budget) is data
+
+
+def test_within_budget_is_unchanged():
+    data = attributes(n_cijfers=2)
+    assert apply_budget(data, 16384) is data
+
+
+@pytest.mark.parametrize("budget", [1024, 4096, 8192])
+def test_trims_to_budget_and_marks_what_was_dropped(budget):
+    data = attributes()
+    origineel = copy.deepcopy(data)
+    result = apply_budget(data, budget)
+
+    assert _size(result) <= budget
+    assert json.loads(json.dumps(result))
+    # De eerste items blijven staan; de kleine lijst blijft heel
+    assert result["cijfers"] == data["cijfers"][:len(result["cijfers"])]
+    assert result["kinderen"]["Anna"]["afspraken"] == data["kinderen"]["Anna"]["afspraken"]
+    assert result[MORE_AVAILABLE] == {"cijfers": 200 - len(result["cijfers"])}
+    # De invoer (gedeeld met de cache) is niet gewijzigd
+    assert data == origineel
+    assert MORE_AVAILABLE not in data
+
+
+def test_nested_list_gets_a_dotted_path():
+    data = attributes(n_cijfers=0, n_afspraken=500)
+    del data["cijfers"]
+    result = apply_budget(data, 2048)
+    assert _size(result) <= 2048
+    assert result[MORE_AVAILABLE] == {
+        "kinderen.Anna.afspraken": 500 - len(result["kinderen"]["Anna"]["afspraken"])
+    }
+
+
+def test_tiny_budget_keeps_fixed_fields():
+    result = apply_budget(attributes(), 10)
+    assert result["gemiddelde"] == 7.1
+    assert result["cijfers"] == []
+    assert result[MORE_AVAILABLE]["cijfers"] == 200
@@ -0,0 +1,31 @@
+from magister_school.berichten import Inbox
+from magister_school.records import Bericht
+
+
+def bericht(id, is_gelezen=False, verzonden_op="2026-10-19 08:00:00"):
+    return Bericht(
+        onderwerp=f"bericht {id}", afzender="mentor", verzonden_op=verzonden_op,
+        is_gelezen=is_gelezen, heeft_bijlagen=False, id=id,
+    )
+
+
+def test_set_ongelezen_refreshes_read_state():
+    inbox = Inbox()
+    inbox.merge([bericht(1), bericht(2), bericht(3, is_gelezen=True)])
+    oud = inbox.get(1)
+    assert inbox.set_ongelezen([2, 3])
+    assert [b.is_gelezen for b in sorted(inbox.berichten(), key=lambda b: b.id)] == [True, False, False]
+    # Het record in een eerdere snapshot blijft ongewijzigd
+    assert oud.is_gelezen is False
+    assert not inbox.set_ongelezen([2, 3])
+
+
+def test_merge_keeps_inhoud_and_advances_cursor():
+    inbox = Inbox()
+    inbox.merge([bericht(1)])
+    inbox.set_inhoud(Bericht(**{**bericht(1).as_dict(), "inhoud": "tekst"}))
+    assert inbox.merge([bericht(1), bericht(2, verzonden_op="2026-10-19 09:00:00")]) == [
+        bericht(2, verzonden_op="2026-10-19 09:00:00")
+    ]
+    assert inbox.get(1).inhoud == "tekst"
+    assert inbox.cursor == {"id": 2, "verzonden_op": "2026-10-19 09:00:00"}
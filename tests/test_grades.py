@@ -0,0 +1,76 @@
+from magister_school.grades import GradeArchive, GradeStore
+from magister_school.records import Cijfer
+
+
+def cijfer(id, waarde="7,0", ingevoerd_op="2026-10-01 10:00:00", vak="wi", weegfactor=1):
+    return Cijfer(vak=vak, omschrijving="", waarde=waarde, weegfactor=weegfactor, ingevoerd_op=ingevoerd_op, id=id)
+
+
+def test_archive_cursor_follows_newest():
+    archive = GradeArchive()
+    assert archive.merge("Anna", [cijfer(1), cijfer(2, ingevoerd_op="2026-10-05 09:00:00")]) != []
+    assert archive.cursor("Anna") == "2026-10-05 09:00:00"
+    archive.merge("Anna", [cijfer(3, ingevoerd_op="2026-09-01 09:00:00")])
+    assert archive.cursor("Anna") == "2026-10-05 09:00:00"
+
+
+def test_archive_cursor_ignores_undated():
+    archive = GradeArchive()
+    archive.merge("Anna", [cijfer(1), cijfer(2, ingevoerd_op="?"), cijfer(3, ingevoerd_op="")])
+    assert archive.cursor("Anna") == "2026-10-01 10:00:00"
+
+
+def test_archive_merge_returns_only_new_and_replaces_updated():
+    archive = GradeArchive()
+    archive.merge("Anna", [cijfer(1)])
+    assert archive.merge("Anna", [cijfer(1, waarde="8,0"), cijfer(2)]) == [cijfer(2)]
+    assert [c.waarde for c in archive.cijfers("Anna") if c.id == 1] == ["8,0"]
+
+
+def test_archive_json_roundtrip_drops_unknown_cursor():
+    archive = GradeArchive()
+    archive.set_kind_id("Anna", 12)
+    archive.merge("Anna", [cijfer(1)])
+    data = archive.as_json()
+    assert GradeArchive.from_json(data).cursors() == {"12": "2026-10-01 10:00:00"}
+    data["kinderen"]["Anna"]["cursor"] = "?"
+    assert GradeArchive.from_json(data).cursor("Anna") is None
+
+
+def test_store_weighted_average_and_trend():
+    store = GradeStore()
+    assert len(store.ingest([cijfer(1, "6,0", weegfactor=1), cijfer(2, "9,0", "2026-10-02 10:00:00", weegfactor=2)])) == 2
+    stats = store.vakken["wi"]
+    assert stats.totaal.gemiddelde == 8.0
+    assert stats.trend == 2.0
+    assert store.ingest([cijfer(1, "6,0"), cijfer(2, "9,0", "2026-10-02 10:00:00", weegfactor=2)]) == []
+
+
+def test_store_replaces_corrected_grade():
+    store = GradeStore()
+    store.ingest([cijfer(1, "6,0"), cijfer(2, "8,0", "2026-10-02 10:00:00")])
+    gecorrigeerd = cijfer(2, "9,0", "2026-10-02 10:00:00")
+    assert store.ingest([cijfer(1, "6,0"), gecorrigeerd]) == [gecorrigeerd]
+    assert store.vakken["wi"].totaal.gemiddelde == 7.5
+    assert store.vakken["wi"].totaal.aantal == 2
+    assert store.vakken["wi"].laatste == 9.0
+    assert store.analytics()["gemiddelde"] == 7.5
+    assert store.vakken["wi"].as_dict()["per_periode"] == {"2026-10": 7.5}
+
+
+def test_store_correction_to_non_numeric():
+    store = GradeStore()
+    store.ingest([cijfer(1, "6,0")])
+    store.ingest([cijfer(1, "V")])
+    stats = store.vakken["wi"]
+    assert stats.totaal.aantal == 0
+    assert stats.totaal.gemiddelde is None
+    assert stats.niet_numeriek == 1
+    assert stats.as_dict()["per_periode"] == {}
+
+
+def test_store_undated_grade_is_not_latest():
+    store = GradeStore()
+    store.ingest([cijfer(1, "6,0", "?"), cijfer(2, "8,0")])
+    assert store.vakken["wi"].laatste == 8.0
+    assert set(store.vakken["wi"].as_dict()["per_periode"]) == {"onbekend", "2026-10"}
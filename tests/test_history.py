@@ -0,0 +1,57 @@
+import json
+import sqlite3
+
+from magister_school.history import SNIPPET_SIZE, History
+from magister_school.records import Afspraak, Cijfer
+
+
+def cijfer(id, ingevoerd_op):
+    return Cijfer(vak="wi", omschrijving="", waarde="7,0", weegfactor=1, ingevoerd_op=ingevoerd_op, id=id)
+
+
+def test_undated_rows_sort_last_and_are_not_purged(tmp_path):
+    history = History(str(tmp_path / "historie.db"), retention_days=30)
+    history.store({"cijfers": {"Anna": [cijfer(1, "?"), cijfer(2, "2026-10-01 10:00:00"), cijfer(3, "")]}})
+    rows = history.query("cijfers")
+    assert [r["id"] for r in rows][0] == 2
+    assert {r["id"] for r in rows} == {1, 2, 3}
+    assert [r["id"] for r in history.query("cijfers", van="2026-01-01")] == [2]
+    history.close()
+
+
+def test_inhoud_is_kept_as_snippet(tmp_path):
+    history = History(str(tmp_path / "historie.db"))
+    afspraak = Afspraak(
+        start="2026-10-19 08:30:00", einde="2026-10-19 09:20:00", type="les", lokaal="101",
+        omschrijving="wi", inhoud="Maak  opgave\n1 t/m 5. " * 50, vak="wiskunde",
+        is_huiswerk=True, is_uitval=False, id=1,
+    )
+    history.store({"kinderen": {"Anna": {"afspraken": [afspraak]}}})
+    [row] = history.query("afspraken")
+    assert row["inhoud"].startswith("Maak opgave 1 t/m 5.")
+    assert len(row["inhoud"]) == SNIPPET_SIZE + 1
+    history.close()
+
+
+def test_migrates_version_0_dates(tmp_path):
+    path = str(tmp_path / "historie.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE cijfers (kind TEXT NOT NULL, sleutel TEXT NOT NULL, datum TEXT NOT NULL, vak TEXT,"
+        " data TEXT NOT NULL, bijgewerkt REAL NOT NULL, PRIMARY KEY (kind, sleutel))"
+    )
+    conn.execute("CREATE INDEX cijfers_datum ON cijfers (kind, datum)")
+    for id, datum in ((1, "?"), (2, "2026-10-01 10:00:00")):
+        conn.execute(
+            "INSERT INTO cijfers VALUES ('Anna', ?, ?, 'wi', ?, 0)",
+            (str(id), datum, json.dumps({"id": id, "ingevoerd_op": datum})),
+        )
+    conn.commit()
+    conn.close()
+
+    history = History(path)
+    assert [r["id"] for r in history.query("cijfers")] == [2, 1]
+    conn = history._connect()
+    assert conn.execute("SELECT datum FROM cijfers WHERE sleutel = '1'").fetchone() == (None,)
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'cijfers_datum'").fetchone()
+    history.close()
@@ -0,0 +1,40 @@
+import io
+import json
+
+import pytest
+
+from magister_school.magister import iter_json_items
+
+DOCUMENTS = [
+    '{"Items": [1, 22, 333]}',
+    '{"Items": [1.5, 2]}',
+    '{"Items": [-0.25, 1e3, 2.5E-2, -7e+10]}',
+    '{"Items": [{"a":1}], "TotalCount": 1.5e3}',
+    '{"TotalCount": 12345, "Items": [true, false, null, "x"], "Links": []}',
+    '{"Items": [{"Id": 1, "Omschrijving": "één"}, {"Id": 2, "Cijfer": 7.25}]}',
+    '{ "Items" : [ 10 , 20.5 ] , "Skip" : 0.0 }',
+    '{"Items": []}',
+    '{}',
+    '[1, 2]',
+]
+
+
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_every_chunk_size(text):
+    raw = text.encode("utf-8")
+    parsed = json.loads(text)
+    expected = parsed.get("Items", []) if isinstance(parsed, dict) else []
+    for chunk_size in range(1, len(raw) + 2):
+        items = list(iter_json_items(io.BytesIO(raw), chunk_size=chunk_size))
+        assert items == expected, chunk_size
+        assert [type(i) for i in items] == [type(i) for i in expected], chunk_size
+
+
+def test_other_key():
+    raw = b'{"Items": [1], "Rooster": [{"Start": "2026-10-19"}]}'
+    assert list(iter_json_items(io.BytesIO(raw), key="Rooster", chunk_size=3)) == [{"Start": "2026-10-19"}]
+
+
+def test_invalid_document():
+    with pytest.raises(ValueError):
+        list(iter_json_items(io.BytesIO(b'{"Items": [1 2]}'), chunk_size=4))
@@ -0,0 +1,97 @@
+import http.client
+import urllib.error
+import urllib.request
+
+import pytest
+
+from magister_school.magister import KeepAliveHTTPSHandler
+
+
+class FakeConnection:
+    """HTTPSConnection met vooraf bepaalde uitkomsten per verzoek."""
+
+    outcomes = []
+    created = []
+
+    def __init__(self, host, timeout=None, context=None):
+        self.host = host
+        self.timeout = timeout
+        self.sock = None
+        self.requests = 0
+        FakeConnection.created.append(self)
+
+    def set_debuglevel(self, level):
+        pass
+
+    def request(self, method, selector, data, headers):
+        self.requests += 1
+        outcome = FakeConnection.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        self.sock = object()
+
+    def getresponse(self):
+        return FakeResponse()
+
+    def close(self):
+        self.sock = None
+
+
+class FakeResponse:
+    reason = "OK"
+    status = 200
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setattr(http.client, "HTTPSConnection", FakeConnection)
+    FakeConnection.outcomes = []
+    FakeConnection.created = []
+    return KeepAliveHTTPSHandler()
+
+
+def request(handler, method="GET"):
+    req = urllib.request.Request("https://school.magister.net/api/x", data=b"{}" if method != "GET" else None,
+                                 method=method)
+    req.timeout = 5
+    return handler.https_open(req)
+
+
+def test_connection_is_reused(handler):
+    FakeConnection.outcomes = [None, None]
+    request(handler)
+    request(handler)
+    assert len(FakeConnection.created) == 1
+
+
+@pytest.mark.parametrize("error", [
+    http.client.RemoteDisconnected("closed"), BrokenPipeError(), ConnectionResetError(),
+])
+def test_stale_reused_connection_is_retried_once(handler, error):
+    FakeConnection.outcomes = [None, error, None]
+    request(handler)
+    assert request(handler, "PUT").status == 200
+    assert len(FakeConnection.created) == 2
+
+
+def test_fresh_connection_is_not_retried(handler):
+    FakeConnection.outcomes = [http.client.RemoteDisconnected("closed"), None]
+    with pytest.raises(urllib.error.URLError):
+        request(handler, "POST")
+    assert len(FakeConnection.created) == 1
+
+
+def test_timeout_is_not_retried(handler):
+    FakeConnection.outcomes = [None, TimeoutError("timed out"), None]
+    request(handler)
+    with pytest.raises(urllib.error.URLError):
+        request(handler)
+    assert len(FakeConnection.created) == 1
+
+
+def test_failing_retry_is_not_retried_again(handler):
+    FakeConnection.outcomes = [None, ConnectionResetError(), ConnectionResetError(), None]
+    request(handler)
+    with pytest.raises(urllib.error.URLError):
+        request(handler)
+    assert len(FakeConnection.created) == 2
@@ -0,0 +1,61 @@
+import copy
+
+import pytest
+
+from magister_school.patch import json_patch
+
+
+def apply(doc, ops):
+    """Minimale RFC 6902 toepassing (add/remove/replace) om de patch te controleren."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        parts = [p.replace("~1", "/").replace("~0", "~") for p in op["path"].split("/")[1:]]
+        if not parts:
+            doc = op["value"]
+            continue
+        parent = doc
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        last = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+        if op["op"] == "remove":
+            del parent[last]
+        elif op["op"] == "add" and isinstance(parent, list):
+            parent.insert(last, op["value"])
+        else:
+            parent[last] = op["value"]
+    return doc
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1}, {"a": 1}),
+    ({"cijfers": [{"id": 1}, {"id": 2}]}, {"cijfers": [{"id": 1}, {"id": 2}]}),
+])
+def test_equal_gives_no_ops(old, new):
+    assert json_patch(old, new) == []
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1}, {"a": True}),
+    ({"a": True}, {"a": 1}),
+    ({"a": 1}, {"a": 1.0}),
+    ({"a": [0, 1]}, {"a": [False, True]}),
+    ([{"x": 1}], [{"x": True}]),
+])
+def test_type_change_is_a_change(old, new):
+    ops = json_patch(old, new)
+    assert ops
+    result = apply(old, ops)
+    assert result == new
+    assert repr(result) == repr(new)
+
+
+def test_new_item_at_top_is_one_add():
+    old = {"cijfers": [{"id": 2}, {"id": 1}]}
+    new = {"cijfers": [{"id": 3}, {"id": 2}, {"id": 1}]}
+    assert json_patch(old, new) == [{"op": "add", "path": "/cijfers/0", "value": {"id": 3}}]
+
+
+def test_roundtrip_with_escaped_keys_and_removals():
+    old = {"a/b": {"~x": 1, "weg": 2}, "lijst": [1, 2, 3, 4], "oud": None}
+    new = {"a/b": {"~x": 5}, "lijst": [1, 4], "nieuw": [True]}
+    assert apply(old, json_patch(old, new)) == new
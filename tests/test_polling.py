@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+from magister_school.polling import next_interval, school_days
+from magister_school.records import Afspraak
+
+TZ = timezone(timedelta(hours=2))
+MIN = timedelta(minutes=15)
+MAX = timedelta(hours=3)
+
+
+def les(start, einde, is_uitval=False):
+    return Afspraak(
+        start=start, einde=einde, type="les", lokaal="101", omschrijving="wi", inhoud=None,
+        vak="wiskunde", is_huiswerk=False, is_uitval=is_uitval,
+    )
+
+
+DAYS = school_days([
+    [les("2026-10-19 08:30:00", "2026-10-19 09:20:00"), les("2026-10-19 14:00:00", "2026-10-19 15:00:00")],
+    [les("2026-10-20 10:00:00", "2026-10-20 11:00:00"), les("2026-10-21 08:30:00", "2026-10-21 09:20:00", True)],
+], TZ)
+
+
+def at(ts):
+    return datetime.strptime(ts, "%Y-%m-%d %H:%M").replace(tzinfo=TZ)
+
+
+def test_school_days_span_all_kinderen_and_skip_uitval():
+    assert DAYS == {
+        at("2026-10-19 08:30").date(): (at("2026-10-19 08:30"), at("2026-10-19 15:00")),
+        at("2026-10-20 10:00").date(): (at("2026-10-20 10:00"), at("2026-10-20 11:00")),
+    }
+
+
+def test_min_interval_around_school_time():
+    assert next_interval(at("2026-10-19 07:30"), DAYS, MIN, MAX) == MIN
+    assert next_interval(at("2026-10-19 12:00"), DAYS, MIN, MAX) == MIN
+    assert next_interval(at("2026-10-19 16:00"), DAYS, MIN, MAX) == MIN
+
+
+def test_outside_school_time_at_most_max_interval():
+    assert next_interval(at("2026-10-19 16:01"), DAYS, MIN, MAX) == MAX
+
+
+def test_on_time_for_next_school_day():
+    # Volgende dag om 10:00, dicht pollen vanaf 9:00
+    assert next_interval(at("2026-10-20 07:00"), DAYS, MIN, MAX) == timedelta(hours=2)
+    # Nooit korter dan het minimale interval
+    assert next_interval(at("2026-10-20 08:55"), DAYS, MIN, MAX) == MIN
+
+
+def test_no_lessons_left_is_holiday():
+    assert next_interval(at("2026-10-21 08:30"), DAYS, MIN, MAX) == MAX
+    assert next_interval(at("2026-10-21 08:30"), {}, MIN, MAX) == MAX
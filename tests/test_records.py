@@ -0,0 +1,49 @@
+import json
+
+from magister_school.records import (
+    Afspraak, Bericht, Cijfer, Onderdeel, Opdracht, Studiewijzer, loads_snapshot, record_hook, snapshot_as_dict,
+)
+
+AFSPRAAK = {
+    "start": "2026-10-19 08:30:00", "einde": "2026-10-19 09:20:00", "type": "les", "lokaal": "101",
+    "omschrijving": "wi", "inhoud": None, "vak": "wiskunde", "is_huiswerk": False, "is_uitval": False,
+}
+
+
+def test_hook_accepts_all_or_only_required_fields():
+    assert record_hook({**AFSPRAAK, "id": 1, "is_afgerond": True}) == Afspraak(**AFSPRAAK, id=1, is_afgerond=True)
+    # Oudere snapshot: zonder id en is_afgerond
+    assert record_hook(dict(AFSPRAAK)) == Afspraak(**AFSPRAAK)
+    assert record_hook({**AFSPRAAK, "is_afgerond": True}) == Afspraak(**AFSPRAAK, is_afgerond=True)
+
+
+def test_hook_leaves_other_dicts_alone():
+    assert record_hook({"start": "x", "einde": "y"}) == {"start": "x", "einde": "y"}
+    # Een onbekende sleutel erbij: geen record
+    assert isinstance(record_hook({**AFSPRAAK, "extra": 1}), dict)
+
+
+def test_loads_snapshot_roundtrip():
+    data = {
+        "kinderen": {"Anna": {"afspraken": [AFSPRAAK]}},
+        "cijfers": {"Anna": [{"vak": "wi", "omschrijving": "", "waarde": "7,0", "weegfactor": 1,
+                              "ingevoerd_op": "2026-10-01 10:00:00"}]},
+        "opdrachten": {"Anna": [{"titel": "t", "vak": "bi", "inleveren_voor": "", "ingeleverd_op": "",
+                                 "omschrijving": None}]},
+        "studiewijzers": {"Anna": [{"titel": "sw", "van": "", "tot_en_met": "",
+                                    "onderdelen": [{"titel": "week 1", "omschrijving": "lezen"}]}]},
+        "berichten": {"ongelezen": 1, "items": [{"onderwerp": "o", "afzender": "a", "verzonden_op": "",
+                                                 "is_gelezen": False, "heeft_bijlagen": False, "id": 3}]},
+    }
+    snapshot = loads_snapshot(json.dumps(data))
+    assert isinstance(snapshot["kinderen"]["Anna"]["afspraken"][0], Afspraak)
+    assert isinstance(snapshot["cijfers"]["Anna"][0], Cijfer)
+    assert isinstance(snapshot["opdrachten"]["Anna"][0], Opdracht)
+    studiewijzer = snapshot["studiewijzers"]["Anna"][0]
+    assert isinstance(studiewijzer, Studiewijzer)
+    assert isinstance(studiewijzer.onderdelen[0], Onderdeel)
+    assert isinstance(snapshot["berichten"]["items"][0], Bericht)
+    # Terug naar dicts: nu met de velden die een default hebben
+    assert snapshot_as_dict(snapshot)["kinderen"]["Anna"]["afspraken"][0] == {
+        **AFSPRAAK, "id": None, "is_afgerond": False,
+    }
@@ -0,0 +1,34 @@
+from magister_school.magister import REDACTED, redact_json, redact_url
+
+
+def test_redact_url_blanks_secret_query_values_and_fragment():
+    url = "https://accounts.magister.net/connect/authorize?client_id=M6&code=abc&id_token_hint=xyz&state=1#access_token=t"
+    assert redact_url(url) == (
+        "https://accounts.magister.net/connect/authorize?client_id=M6&code=REDACTED&id_token_hint=REDACTED&state=1"
+    )
+
+
+def test_redact_url_without_query():
+    url = "https://opslag.example.net/bijlage/1.pdf?sig=geheim&se=2026-10-19"
+    assert redact_url(url, keep_query=False) == "https://opslag.example.net/bijlage/1.pdf"
+
+
+def test_redact_json_is_recursive_and_does_not_modify_input():
+    body = {
+        "access_token": "a", "Password": "p",
+        "items": [{"location": "https://opslag.example.net/x?sig=s", "naam": "x"}],
+        "Persoon": {"Id": 1, "authCode": "123"},
+        "Location": 5,
+    }
+    assert redact_json(body) == {
+        "access_token": REDACTED, "Password": REDACTED,
+        "items": [{"location": "https://opslag.example.net/x", "naam": "x"}],
+        "Persoon": {"Id": 1, "authCode": REDACTED},
+        # Alleen tekst is een url
+        "Location": 5,
+    }
+    assert body["items"][0]["location"].endswith("?sig=s")
+
+
+def test_redact_json_leaves_plain_values():
+    assert redact_json([1, "token", None]) == [1, "token", None]
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+from magister_school.magister import SCHEDULE_FAR_MAX_AGE, ScheduleCache
+from magister_school.records import Afspraak, Wijziging
+from magister_school.schedule import merge_rooster
+
+
+def afspraak(id, start="2026-10-19 08:30:00"):
+    return Afspraak(
+        start=start, einde="2026-10-19 09:20:00", type="les", lokaal="101", omschrijving="wi",
+        inhoud=None, vak="wiskunde", is_huiswerk=False, is_uitval=False, id=id,
+    )
+
+
+def wijziging(id, start="2026-10-19 08:30:00"):
+    return Wijziging(
+        start=start, einde="2026-10-19 09:20:00", type="uitval", lokaal="", omschrijving="wi",
+        inhoud=None, id=id,
+    )
+
+
+def test_merge_rooster_prefers_id_match():
+    w = wijziging(2)
+    paren = list(merge_rooster([afspraak(1), afspraak(2)], [w]))
+    assert paren == [(afspraak(1), None), (afspraak(2), w)]
+
+
+def test_merge_rooster_uses_each_wijziging_once():
+    w = wijziging(None)
+    paren = list(merge_rooster([afspraak(1), afspraak(2)], [w]))
+    assert paren == [(afspraak(1), w), (afspraak(2), None)]
+
+
+def test_merge_rooster_keeps_unmatched_wijzigingen():
+    w = wijziging(9, start="2026-10-19 10:00:00")
+    assert list(merge_rooster([afspraak(1)], [w])) == [(afspraak(1), None), (None, w)]
+
+
+DAYS = [date(2026, 10, 19) + timedelta(days=i) for i in range(14)]
+
+
+def test_schedule_cache_empty_is_one_run():
+    assert ScheduleCache().stale_runs(1, DAYS, now=0) == [(DAYS[0], DAYS[-1])]
+
+
+def test_schedule_cache_refreshes_near_days_only():
+    cache = ScheduleCache()
+    cache.store(1, DAYS[0], DAYS[-1], [afspraak(1, start="2026-10-20 08:30:00")], [], now=0)
+    # Vandaag en morgen altijd, de week erna na een uur, de rest later
+    assert cache.stale_runs(1, DAYS, now=10) == [(DAYS[0], DAYS[1])]
+    assert cache.stale_runs(1, DAYS, now=3600) == [(DAYS[0], DAYS[6])]
+    assert cache.stale_runs(1, DAYS, now=SCHEDULE_FAR_MAX_AGE) == [(DAYS[0], DAYS[-1])]
+
+
+def test_schedule_cache_window_and_sliding_days():
+    cache = ScheduleCache()
+    a, b = afspraak(1, start="2026-10-19 08:30:00"), afspraak(2, start="2026-10-21 08:30:00")
+    w = wijziging(2, start="2026-10-21 08:30:00")
+    cache.store(1, DAYS[0], DAYS[-1], [a, b], [w], now=0)
+    assert cache.window(1, DAYS) == ([a, b], [w])
+
+    # Een dag later: de eerste dag valt weg, de nieuwe laatste dag ontbreekt nog
+    later = DAYS[1:] + [DAYS[-1] + timedelta(days=1)]
+    assert cache.stale_runs(1, later, now=10) == [(later[0], later[1]), (later[-1], later[-1])]
+    assert cache.window(1, later) == ([b], [w])
+
+
+def test_schedule_cache_update_replaces_afspraak():
+    cache = ScheduleCache()
+    cache.store(1, DAYS[0], DAYS[0], [afspraak(1)], [], now=0)
+    afgerond = Afspraak(**{**afspraak(1).as_dict(), "is_afgerond": True})
+    cache.update(1, afgerond)
+    assert cache.window(1, DAYS[:1]) == ([afgerond], [])
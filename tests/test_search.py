@@ -0,0 +1,103 @@
+from magister_school.records import Afspraak, Onderdeel, Opdracht, Studiewijzer
+from magister_school.search import SearchIndex, tokens
+
+
+def afspraak(id, inhoud, vak="wiskunde", start="2026-10-19 08:30:00"):
+    return Afspraak(
+        start=start, einde=start, type="les", lokaal="101", omschrijving=vak[:2],
+        inhoud=inhoud, vak=vak, is_huiswerk=True, is_uitval=False, id=id,
+    )
+
+
+def opdracht(id, titel, omschrijving, vak="biologie"):
+    return Opdracht(
+        titel=titel, vak=vak, inleveren_voor="2026-10-30 00:00:00", ingeleverd_op="",
+        omschrijving=omschrijving, id=id,
+    )
+
+
+def snapshot(afspraken=(), opdrachten=(), studiewijzers=(), kind="Anna"):
+    return {
+        "kinderen": {kind: {"afspraken": list(afspraken)}},
+        "opdrachten": {kind: list(opdrachten)},
+        "studiewijzers": {kind: list(studiewijzers)},
+    }
+
+
+def ids(results):
+    return [r["id"] for r in results]
+
+
+def test_tokens_fold_case_accents_and_stopwords():
+    assert tokens("Lees de Première van H4") == ["lees", "premiere", "4"]
+
+
+def test_more_occurrences_rank_higher():
+    index = SearchIndex()
+    index.update(snapshot([
+        afspraak(1, "paragraaf 3 lezen en oefenen"),
+        afspraak(2, "paragraaf 3 oefenen, paragraaf 4 oefenen, oefenen"),
+        afspraak(3, "woordjes leren"),
+    ]))
+    assert ids(index.search("oefenen")) == [2, 1]
+
+
+def test_rare_term_outweighs_common_term():
+    index = SearchIndex()
+    index.update(snapshot([
+        afspraak(1, "opgaven maken"),
+        afspraak(2, "opgaven maken"),
+        afspraak(3, "opgaven maken"),
+        afspraak(4, "grafieken tekenen"),
+    ]))
+    assert ids(index.search("opgaven grafieken"))[0] == 4
+
+
+def test_prefix_matches_with_lower_weight():
+    index = SearchIndex()
+    index.update(snapshot(
+        [afspraak(1, "bio toets")],
+        [opdracht(2, "Verslag", "biologie practicum")],
+    ))
+    results = index.search("bio")
+    assert ids(results) == [1, 2]
+    assert results[0]["score"] > results[1]["score"]
+    # Korter dan PREFIX_MIN: alleen hele woorden
+    assert index.search("bi") == []
+
+
+def test_equal_score_newest_first():
+    index = SearchIndex()
+    index.update(snapshot([
+        afspraak(1, "samenvatting", start="2026-10-12 08:30:00"),
+        afspraak(2, "samenvatting", start="2026-10-19 08:30:00"),
+    ]))
+    assert ids(index.search("samenvatting")) == [2, 1]
+
+
+def test_filters_and_fragment():
+    index = SearchIndex()
+    studiewijzer = Studiewijzer(
+        titel="Biologie periode 1", van="2026-09-01", tot_en_met="2026-11-01",
+        onderdelen=[Onderdeel(titel="Cellen", omschrijving="Hoofdstuk cellen en weefsels")],
+    )
+    index.update(snapshot(
+        [afspraak(1, "cellen tekenen", vak="biologie"), afspraak(2, "cellen rekenen")],
+        studiewijzers=[studiewijzer],
+    ))
+    assert len(index.search("cellen")) == 3
+    assert ids(index.search("cellen", vak="BIO", onderdeel="afspraken")) == [1]
+    [result] = index.search("weefsels", onderdeel="studiewijzers")
+    assert result["titel"] == "Biologie periode 1 / Cellen"
+    assert "weefsels" in result["fragment"]
+    assert index.search("cellen", kind="Bram") == []
+
+
+def test_update_reindexes_only_changes():
+    index = SearchIndex()
+    assert index.update(snapshot([afspraak(1, "lezen"), afspraak(2, "schrijven")])) == (2, 0)
+    assert index.update(snapshot([afspraak(1, "lezen"), afspraak(2, "rekenen")])) == (1, 0)
+    assert index.search("schrijven") == []
+    assert index.update(snapshot([afspraak(2, "rekenen")])) == (0, 1)
+    assert index.search("lezen") == []
+    assert len(index) == 1
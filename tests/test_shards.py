@@ -0,0 +1,16 @@
+from magister_school.shards import AUTO_KINDEREN, Shards
+
+
+def test_new_entry_without_choice_is_limited():
+    assert Shards().next() == {"kind_ids": None, "max_kinderen": AUTO_KINDEREN}
+
+
+def test_existing_entry_without_choice_fetches_all():
+    assert Shards(max_kinderen=None).next() == {"kind_ids": None, "max_kinderen": None}
+
+
+def test_choice_rotates_over_shards():
+    shards = Shards([1, 2, 3], shard_size=2)
+    assert shards.next()["kind_ids"] == ["1", "2"]
+    assert shards.current()["kind_ids"] == ["1", "2"]
+    assert shards.next()["kind_ids"] == ["3", "1"]